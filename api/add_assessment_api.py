@@ -1,76 +1,111 @@
 """API endpoints for managing property assessments and owner details in the Real Property Tax Assessment System."""
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import func, insert, or_, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from authentication.user_auth import verify_token
-from database.database import get_db
+from api.auth import get_current_user
+from api.conditional import etag_matches, make_etag, not_modified, set_etag
+from api.fieldsets import parse_fields
+from api.pagination import decode_cursor, encode_cursor
+from authentication.token_cache import CachedUser
+from database.database import get_async_db
+from database.table_versions import bump_table_version_async, get_table_version_async
 from models import ApprovalSectionModel, OwnerDetailsModel
-from schemas.assessment_schemas import CompleteAssessmentRequest, OwnerDetails
+from schemas.assessment_schemas import (
+    BatchAssessmentResponse,
+    BatchAssessmentResult,
+    CompleteAssessmentRequest,
+    PaginatedOwnersResponse,
+)
+from services.typeahead import typeahead
+from services.valuation import VALUATION_MODE, ValuationMode, check_requests
 
 router = APIRouter()
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl='token')
 
+# Forms per batch request; each batch is valued and inserted in one transaction
+MAX_ASSESSMENT_BATCH = 1000
+
+# API field names of OwnerDetails and the owner_details columns they are read from
+OWNER_FIELD_COLUMNS = {
+    'owner': OwnerDetailsModel.owner,
+    'ownerAddress': OwnerDetailsModel.owner_address,
+    'admin_ben_user': OwnerDetailsModel.admin_ben_user,
+    'transactionCode': OwnerDetailsModel.transaction_code,
+    'pin': OwnerDetailsModel.pin,
+    'tin': OwnerDetailsModel.tin,
+    'telNo': OwnerDetailsModel.tel_no,
+    'td': OwnerDetailsModel.td,
+}
+
+
+def owner_values(request: CompleteAssessmentRequest) -> Dict:
+    """Map the owner section of a request to ``OwnerDetailsModel`` columns."""
+    return {
+        'owner': request.ownerDetails.owner,
+        'owner_address': request.ownerDetails.ownerAddress,
+        'admin_ben_user': request.ownerDetails.admin_ben_user,
+        'transaction_code': request.ownerDetails.transactionCode,
+        'pin': request.ownerDetails.pin,
+        'tin': request.ownerDetails.tin,
+        'tel_no': request.ownerDetails.telNo,
+        'td': request.ownerDetails.td,
+    }
+
+
+def approval_values(request: CompleteAssessmentRequest, owner_id: Optional[int]) -> Dict:
+    """Map the approval section of a request to ``ApprovalSectionModel`` columns."""
+    return {
+        'owner_id': owner_id,
+        'tdn': request.ownerDetails.td,
+        'appraised_by': request.approvalSection.appraisedBy,
+        'appraised_date': request.approvalSection.appraisedDate,
+        'recommending_approval': request.approvalSection.recommendingApproval,
+        'municipality_assessor_date': request.approvalSection.municipalityAssessorDate,
+        'approved_by_province': request.approvalSection.approvedByProvince,
+        'provincial_assessor_date': request.approvalSection.provincialAssessorDate,
+    }
+
+
+async def bump_assessment_versions(db: AsyncSession) -> int:
+    """Bump the change versions of the tables written by the add endpoints.
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-) -> str:
-    """Verify and return the current user from the JWT token.
-    
-    Args:
-        token: The JWT token to verify.
-        db: Database session.
-    
     Returns:
-        str: The username from the token.
-        
-    Raises:
-        HTTPException: If the token is invalid.
+        int: The new owner_details version.
     """
-    username = verify_token(token)
-    if username is None:
-        raise HTTPException(status_code=401, detail='Invalid token')
-    return username
+    version = await bump_table_version_async(db, OwnerDetailsModel.__tablename__)
+    await bump_table_version_async(db, ApprovalSectionModel.__tablename__)
+    return version
 
 
 @router.post('/add/', response_model=Dict)
 async def create_property_assessment(
     request: CompleteAssessmentRequest,
-    db: Session = Depends(get_db),
-    current_user: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CachedUser = Depends(get_current_user),
 ) -> Dict:
+    [discrepancies] = check_requests([request])
+    if discrepancies and VALUATION_MODE == ValuationMode.enforce:
+        raise HTTPException(
+            status_code=422,
+            detail={'message': 'Submitted figures differ from the valuation', 'errors': discrepancies},
+        )
     try:
         # Create owner details
-        owner = OwnerDetailsModel(
-            owner=request.ownerDetails.owner,
-            owner_address=request.ownerDetails.ownerAddress,
-            admin_ben_user=request.ownerDetails.admin_ben_user,
-            transaction_code=request.ownerDetails.transactionCode,
-            pin=request.ownerDetails.pin,
-            tin=request.ownerDetails.tin,
-            tel_no=request.ownerDetails.telNo,
-            td=request.ownerDetails.td,
-        )
+        owner = OwnerDetailsModel(**owner_values(request))
         db.add(owner)
-        db.flush()
+        await db.flush()
 
         # Create approval section
-        assessment = ApprovalSectionModel(
-            owner_id=owner.id,
-            tdn=request.ownerDetails.td,
-            appraised_by=request.approvalSection.appraisedBy,
-            appraised_date=request.approvalSection.appraisedDate,
-            recommending_approval=request.approvalSection.recommendingApproval,
-            municipality_assessor_date=request.approvalSection.municipalityAssessorDate,
-            approved_by_province=request.approvalSection.approvedByProvince,
-            provincial_assessor_date=request.approvalSection.provincialAssessorDate,
-        )
+        assessment = ApprovalSectionModel(**approval_values(request, owner.id))
         db.add(assessment)
-        db.commit()
+        version = await bump_assessment_versions(db)
+        await db.commit()
+        typeahead.note_owners_added([(owner.id, owner.owner, owner.pin)], version)
         
         return {
             "status": "success",
@@ -78,28 +113,234 @@ async def create_property_assessment(
             "data": {
                 "assessment_id": assessment.id,
                 "owner_id": owner.id,
-            }
+            },
+            "warnings": discrepancies,
         }
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail={'message': 'An unexpected error occurred', 'error': str(e)},
         )
 
 
-@router.get('/owners/', response_model=List[OwnerDetails])
-async def get_all_owners(db: Session = Depends(get_db)) -> List[OwnerDetails]:
-    """Get all owners with their IDs in sequence.
-    
+async def find_batch_conflicts(db: AsyncSession, requests: List[CompleteAssessmentRequest]) -> Dict[int, str]:
+    """Find the requests of a batch that would violate a unique constraint.
+
+    Owner ``pin`` and ``tin`` and the approval ``tdn`` are unique. They are checked
+    against existing rows with one query per table, and against earlier requests of
+    the same batch.
+
     Args:
         db: Database session.
+        requests: The batch.
+
+    Returns:
+        Dict[int, str]: Error message by index of each conflicting request.
+    """
+    pins = {r.ownerDetails.pin for r in requests if r.ownerDetails.pin is not None}
+    tins = {r.ownerDetails.tin for r in requests if r.ownerDetails.tin is not None}
+    tdns = {r.ownerDetails.td for r in requests if r.ownerDetails.td is not None}
+    taken = {'pin': set(), 'tin': set(), 'tdn': set()}
+    if pins or tins:
+        rows = (await db.execute(
+            select(OwnerDetailsModel.pin, OwnerDetailsModel.tin).where(
+                or_(OwnerDetailsModel.pin.in_(pins), OwnerDetailsModel.tin.in_(tins))
+            )
+        )).all()
+        taken['pin'].update(row.pin for row in rows)
+        taken['tin'].update(row.tin for row in rows)
+    if tdns:
+        taken['tdn'].update(
+            (await db.execute(select(ApprovalSectionModel.tdn).where(ApprovalSectionModel.tdn.in_(tdns)))).scalars()
+        )
+
+    conflicts = {}
+    for index, request in enumerate(requests):
+        keys = {'pin': request.ownerDetails.pin, 'tin': request.ownerDetails.tin, 'tdn': request.ownerDetails.td}
+        clashes = [name for name, value in keys.items() if value is not None and value in taken[name]]
+        if clashes:
+            conflicts[index] = f"Duplicate {', '.join(clashes)}"
+            continue
+        for name, value in keys.items():
+            if value is not None:
+                taken[name].add(value)
+    return conflicts
+
+
+async def insert_batch(db: AsyncSession, requests: List[CompleteAssessmentRequest]) -> List[Tuple[int, int]]:
+    """Insert owners and approval sections with one multi-row statement each.
+
+    Returns:
+        List[Tuple[int, int]]: ``(owner_id, assessment_id)`` for each request, in order.
+    """
+    owner_ids = (await db.execute(
+        insert(OwnerDetailsModel).returning(OwnerDetailsModel.id, sort_by_parameter_order=True),
+        [owner_values(request) for request in requests],
+    )).scalars().all()
+    assessment_ids = (await db.execute(
+        insert(ApprovalSectionModel).returning(ApprovalSectionModel.id, sort_by_parameter_order=True),
+        [approval_values(request, owner_id) for request, owner_id in zip(requests, owner_ids)],
+    )).scalars().all()
+    return list(zip(owner_ids, assessment_ids))
+
+
+@router.post('/add/batch/', response_model=BatchAssessmentResponse)
+async def create_property_assessments_batch(
+    requests: List[CompleteAssessmentRequest],
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CachedUser = Depends(get_current_user),
+) -> BatchAssessmentResponse:
+    """Create many building assessments in one transaction.
+
+    Requests that conflict with existing records or with each other, or whose figures
+    differ from the server-side valuation when ``VALUATION_MODE=enforce``, are reported
+    and skipped; the others are inserted with multi-row ``INSERT ... RETURNING``. If the
+    bulk insert still fails, for example because of a concurrent insert, each request
+    is retried in its own savepoint so that one bad form does not reject the batch.
+
+    Args:
+        requests: The assessments to create.
+        db: Database session.
+        current_user: The authenticated user.
+
+    Returns:
+        BatchAssessmentResponse: One result per request, in request order.
+
+    Raises:
+        HTTPException: 413 if the batch has more than :data:`MAX_ASSESSMENT_BATCH` forms.
+    """
+    if len(requests) > MAX_ASSESSMENT_BATCH:
+        raise HTTPException(status_code=413, detail=f'At most {MAX_ASSESSMENT_BATCH} assessments per batch')
+    results = [BatchAssessmentResult(index=index, status='error') for index in range(len(requests))]
+    # Every form of the batch is valued in one vectorized pass
+    discrepancies = check_requests(requests)
+    conflicts = {}
+    if VALUATION_MODE == ValuationMode.enforce:
+        conflicts = {
+            index: 'Submitted figures differ from the valuation: ' + '; '.join(issues)
+            for index, issues in enumerate(discrepancies) if issues
+        }
+    valued = [index for index in range(len(requests)) if index not in conflicts]
+    duplicates = await find_batch_conflicts(db, [requests[index] for index in valued])
+    conflicts.update((valued[position], error) for position, error in duplicates.items())
+    for index, error in conflicts.items():
+        results[index].error = error
+    pending = [index for index in range(len(requests)) if index not in conflicts]
+
+    try:
+        if pending:
+            ids = await insert_batch(db, [requests[index] for index in pending])
+            for index, (owner_id, assessment_id) in zip(pending, ids):
+                results[index] = BatchAssessmentResult(
+                    index=index, status='success', owner_id=owner_id, assessment_id=assessment_id,
+                )
+            version = await bump_assessment_versions(db)
+        await db.commit()
+    except SQLAlchemyError:
+        await db.rollback()
+        for index in pending:
+            try:
+                async with db.begin_nested():
+                    [(owner_id, assessment_id)] = await insert_batch(db, [requests[index]])
+                results[index] = BatchAssessmentResult(
+                    index=index, status='success', owner_id=owner_id, assessment_id=assessment_id,
+                )
+            except SQLAlchemyError as e:
+                results[index] = BatchAssessmentResult(
+                    index=index, status='error', error=str(getattr(e, 'orig', None) or e),
+                )
+        if any(result.status == 'success' for result in results):
+            version = await bump_assessment_versions(db)
+        await db.commit()
+
+    for result in results:
+        result.warnings = discrepancies[result.index]
+    created = [
+        (result.owner_id, requests[result.index].ownerDetails) for result in results if result.status == 'success'
+    ]
+    if created:
+        typeahead.note_owners_added([(owner_id, owner.owner, owner.pin) for owner_id, owner in created], version)
+    return BatchAssessmentResponse(
+        status='success' if len(created) == len(requests) else 'partial' if created else 'error',
+        message=f'{len(created)} of {len(requests)} assessments created',
+        results=results,
+    )
+
+
+def escape_like(value: str) -> str:
+    """Escape the ``LIKE`` wildcards of ``value`` for use with ``escape='\\'``."""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+@router.get('/owners/', response_model=PaginatedOwnersResponse)
+async def get_owners(
+    request: Request,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description='Opaque next_cursor from the previous page'),
+    pin: Optional[str] = Query(None, description='Exact PIN'),
+    tin: Optional[str] = Query(None, description='Exact TIN'),
+    td: Optional[str] = Query(None, description='Exact tax declaration number'),
+    owner: Optional[str] = Query(None, description='Case-insensitive owner name prefix'),
+    fields: Optional[str] = Query(None, description='Comma-separated fields to return, all by default'),
+    db: AsyncSession = Depends(get_async_db),
+) -> Response:
+    """Get a page of owners in ID order, optionally filtered.
+
+    Pages are keyed on the owner ID: pass ``next_cursor`` back as ``cursor`` for the
+    next page, which stays cheap however deep the client pages. pin, tin and td are
+    exact lookups; owner matches names starting with the given text. Every filter is
+    served by an index (see the add_owner_search_indexes migration).
+
+    Only the requested fields are selected from the database and returned. The
+    response carries an ETag derived from the owner_details change version, and a
+    request whose ``If-None-Match`` still matches gets ``304 Not Modified``.
+
+    Args:
+        request: The incoming request.
+        limit: Maximum number of owners in the page.
+        cursor: Cursor returned with the previous page.
+        pin: PIN to look up.
+        tin: TIN to look up.
+        td: Tax declaration number to look up.
+        owner: Owner name prefix.
+        fields: Comma-separated OwnerDetails field names.
+        db: Database session.
     
     Returns:
-        List[OwnerDetails]: List of all owners ordered by ID.
+        Response: The page of owners and the cursor of the next one, or an empty 304.
+
+    Raises:
+        HTTPException: If an unknown field is requested or the cursor is invalid.
     """
-    owners = db.query(OwnerDetailsModel).order_by(OwnerDetailsModel.id).all()
-    return owners
+    names = parse_fields(fields, list(OWNER_FIELD_COLUMNS))
+    after = decode_cursor(cursor, 'id', 1)[0] if cursor else None
+    table_name = OwnerDetailsModel.__tablename__
+    etag = make_etag(request, table_name, await get_table_version_async(db, table_name))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    query = select(OwnerDetailsModel.id, *(OWNER_FIELD_COLUMNS[name] for name in names))
+    if pin:
+        query = query.where(OwnerDetailsModel.pin == pin)
+    if tin:
+        query = query.where(OwnerDetailsModel.tin == tin)
+    if td:
+        query = query.where(OwnerDetailsModel.td == td)
+    if owner:
+        # The pattern is built here rather than concatenated in SQL so that it is a
+        # plain constant the planner can match against the text_pattern_ops index
+        query = query.where(func.lower(OwnerDetailsModel.owner).like(escape_like(owner.lower()) + '%', escape='\\'))
+    if after is not None:
+        query = query.where(OwnerDetailsModel.id > after)
+    rows = (await db.execute(query.order_by(OwnerDetailsModel.id).limit(limit))).all()
+
+    next_cursor = encode_cursor('id', [rows[-1].id]) if len(rows) == limit else None
+    return set_etag(ORJSONResponse({
+        'data': [dict(zip(names, row[1:])) for row in rows],
+        'limit': limit,
+        'next_cursor': next_cursor,
+    }), etag)
 
 
 # Example request for testing in your .rest file:
@@ -0,0 +1,173 @@
+"""Distribution queries over property_assessment_clean answered from the columnar snapshot.
+
+Every route reads the NumPy arrays of ``services/assessment_snapshot.py`` instead of
+querying the table. The snapshot is brought up to the current table version first, and
+the response carries an ETag for that version, like the list endpoints.
+"""
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.orm import Session
+
+from api.auth import get_current_user
+from api.conditional import etag_matches, make_etag, not_modified, set_etag
+from authentication.token_cache import CachedUser
+from database.database import get_db
+from models.property_assessment_model import PropertyAssessmentClean
+from schemas.analytics_schema import (
+    AggregateResponse,
+    AnalyticsColumn,
+    AnalyticsDimension,
+    AnalyticsFilterResponse,
+    HistogramResponse,
+    PercentileResponse,
+    ValueBandResponse,
+)
+from services.assessment_snapshot import Snapshot, assessment_snapshot
+
+router = APIRouter(prefix='/analytics/assessments')
+
+
+class SnapshotFilterParams:
+    """Exact category filters and an inclusive range on the queried column."""
+
+    def __init__(
+        self,
+        mun_code: Optional[str] = Query(None, description='Exact municipality code'),
+        barangay_code: Optional[str] = Query(None, description='Exact barangay code'),
+        classification: Optional[str] = Query(None, description='Exact classification'),
+        taxability: Optional[str] = Query(None, description='Exact taxability'),
+        min_value: Optional[float] = Query(None, description='Lowest value of the queried column'),
+        max_value: Optional[float] = Query(None, description='Highest value of the queried column'),
+    ):
+        self.filters = {
+            'mun_code': mun_code,
+            'barangay_code': barangay_code,
+            'classification': classification,
+            'taxability': taxability,
+        }
+        self.min_value = min_value
+        self.max_value = max_value
+
+    def mask(self, snapshot: Snapshot, column: AnalyticsColumn):
+        return snapshot.mask(self.filters, column.value, self.min_value, self.max_value)
+
+
+def current_snapshot(db: Session = Depends(get_db)) -> Snapshot:
+    """Return the snapshot at the current table version, or 503 when it is unavailable."""
+    if not assessment_snapshot.available():
+        raise HTTPException(status_code=503, detail='The analytics snapshot is disabled or NumPy is not installed')
+    return assessment_snapshot.get(db)
+
+
+def snapshot_response(request: Request, snapshot: Snapshot, build) -> ORJSONResponse:
+    etag = make_etag(request, PropertyAssessmentClean.__tablename__, snapshot.version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return set_etag(ORJSONResponse(build()), etag)
+
+
+def dimension_name(by: Optional[AnalyticsDimension]) -> Optional[str]:
+    return by.value if by else None
+
+
+@router.get('/percentiles', response_model=PercentileResponse)
+def get_percentiles(
+    request: Request,
+    column: AnalyticsColumn = Query(AnalyticsColumn.market_val),
+    by: Optional[AnalyticsDimension] = Query(None, description='Dimension to group by'),
+    q: List[float] = Query([25, 50, 75], description='Percentiles to compute, between 0 and 100'),
+    params: SnapshotFilterParams = Depends(),
+    current_user: CachedUser = Depends(get_current_user),
+    snapshot: Snapshot = Depends(current_snapshot),
+):
+    """Return percentiles of a numeric column, optionally per group."""
+    if any(not 0 <= value <= 100 for value in q):
+        raise HTTPException(status_code=400, detail='Percentiles must be between 0 and 100')
+    return snapshot_response(request, snapshot, lambda: {
+        'column': column,
+        'by': by,
+        'groups': snapshot.percentiles(column.value, dimension_name(by), q, params.mask(snapshot, column)),
+    })
+
+
+@router.get('/aggregate', response_model=AggregateResponse)
+def get_aggregate(
+    request: Request,
+    column: AnalyticsColumn = Query(AnalyticsColumn.market_val),
+    by: Optional[AnalyticsDimension] = Query(None, description='Dimension to group by'),
+    params: SnapshotFilterParams = Depends(),
+    current_user: CachedUser = Depends(get_current_user),
+    snapshot: Snapshot = Depends(current_snapshot),
+):
+    """Return the count, sum, mean, minimum and maximum of a numeric column, optionally per group."""
+    return snapshot_response(request, snapshot, lambda: {
+        'column': column,
+        'by': by,
+        'groups': snapshot.aggregate(column.value, dimension_name(by), params.mask(snapshot, column)),
+    })
+
+
+@router.get('/histogram', response_model=HistogramResponse)
+def get_histogram(
+    request: Request,
+    column: AnalyticsColumn = Query(AnalyticsColumn.ass_level),
+    bins: int = Query(10, ge=1, le=1000),
+    params: SnapshotFilterParams = Depends(),
+    current_user: CachedUser = Depends(get_current_user),
+    snapshot: Snapshot = Depends(current_snapshot),
+):
+    """Return equal-width bin counts of a numeric column.
+
+    The bins span ``min_value`` to ``max_value`` when both are given, the range of the
+    selected values otherwise.
+    """
+    value_range = None
+    if params.min_value is not None and params.max_value is not None:
+        if params.min_value >= params.max_value:
+            raise HTTPException(status_code=400, detail='min_value must be lower than max_value')
+        value_range = (params.min_value, params.max_value)
+    return snapshot_response(request, snapshot, lambda: {
+        'column': column,
+        **snapshot.histogram(column.value, bins, value_range, params.mask(snapshot, column)),
+    })
+
+
+@router.get('/bands', response_model=ValueBandResponse)
+def get_value_bands(
+    request: Request,
+    edges: List[float] = Query(..., description='Ascending lower bounds of the bands; the last band is open-ended'),
+    column: AnalyticsColumn = Query(AnalyticsColumn.market_val),
+    by: Optional[AnalyticsDimension] = Query(None, description='Dimension to group by'),
+    params: SnapshotFilterParams = Depends(),
+    current_user: CachedUser = Depends(get_current_user),
+    snapshot: Snapshot = Depends(current_snapshot),
+):
+    """Return the parcel count and total of a numeric column per value band, optionally per group."""
+    if len(edges) > 1000 or any(lower >= upper for lower, upper in zip(edges, edges[1:])):
+        raise HTTPException(status_code=400, detail='edges must be strictly ascending, at most 1000')
+    return snapshot_response(request, snapshot, lambda: {
+        'column': column,
+        'by': by,
+        'bands': snapshot.bands(column.value, edges, dimension_name(by), params.mask(snapshot, column)),
+    })
+
+
+@router.get('/filter', response_model=AnalyticsFilterResponse)
+def filter_assessments(
+    request: Request,
+    column: AnalyticsColumn = Query(AnalyticsColumn.market_val, description='Column min_value and max_value apply to'),
+    limit: int = Query(100, ge=0, le=10000, description='Maximum TDNs to return'),
+    params: SnapshotFilterParams = Depends(),
+    current_user: CachedUser = Depends(get_current_user),
+    snapshot: Snapshot = Depends(current_snapshot),
+):
+    """Return how many assessments match the filters and up to ``limit`` of their TDNs."""
+    def build():
+        # Rows missing the column only drop out when a range is requested on it
+        ranged = params.min_value is not None or params.max_value is not None
+        selected = snapshot.mask(params.filters, column.value if ranged else None, params.min_value, params.max_value)
+        return {'count': int(selected.sum()), 'tdns': snapshot.tdns(selected, limit)}
+
+    return snapshot_response(request, snapshot, build)
@@ -0,0 +1,242 @@
+"""API endpoints for bulk export of property_assessment_clean in the Real Property Tax Assessment System."""
+import glob
+import hashlib
+import os
+import tempfile
+import time
+from typing import Iterator, List, Union
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import Date, Numeric, select
+from sqlalchemy.orm import Session
+
+from api.auth import get_current_user
+from api.property_assessment_api import AssessmentFilterParams
+from authentication.token_cache import CachedUser
+from api.serialization import csv_chunk, csv_header, ndjson_chunk
+from database.database import SessionLocal, get_db
+from database.table_versions import get_table_version
+from models import property_assessment_model as models
+from schemas import property_assessment_schema as schemas
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - columnar exports are optional
+    pa = None
+    pq = None
+
+router = APIRouter()
+
+EXPORT_CACHE_DIR = os.getenv('EXPORT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'assessment_exports'))
+# Least recently used exports are removed once the cache grows past this size
+EXPORT_CACHE_MAX_BYTES = int(os.getenv('EXPORT_CACHE_MAX_BYTES', str(1024 ** 3)))
+# Partial files older than this were left behind by a crashed export
+EXPORT_PARTIAL_MAX_AGE_SECONDS = 3600
+# Exports written or served within this many seconds may be about to be sent and are kept
+EXPORT_IN_USE_SECONDS = 300
+
+EXPORT_MEDIA_TYPES = {
+    schemas.ExportFormat.ndjson: 'application/x-ndjson',
+    schemas.ExportFormat.csv: 'text/csv',
+    schemas.ExportFormat.arrow: 'application/vnd.apache.arrow.file',
+    schemas.ExportFormat.parquet: 'application/vnd.apache.parquet',
+}
+COLUMNAR_FORMATS = (schemas.ExportFormat.arrow, schemas.ExportFormat.parquet)
+
+
+def iter_assessment_rows(filters: List, chunk_size: int) -> Iterator[list]:
+    """Yield filtered ``property_assessment_clean`` rows in partitions of ``chunk_size``.
+
+    The rows are read through a server-side cursor as plain tuples, so memory use is
+    bounded by one partition regardless of the size of the result. The generator owns
+    its session because a streamed response outlives the request's ``get_db`` session.
+
+    Args:
+        filters: Filter clauses from :class:`AssessmentFilterParams`.
+        chunk_size: Number of rows fetched per round trip.
+
+    Yields:
+        list: A partition of result rows.
+    """
+    table = models.PropertyAssessmentClean.__table__
+    statement = select(table).where(*filters).execution_options(yield_per=chunk_size)
+    db = SessionLocal()
+    try:
+        for partition in db.execute(statement).partitions():
+            yield partition
+    finally:
+        db.close()
+
+
+def assessment_arrow_schema() -> 'pa.Schema':
+    """Build the Arrow schema of ``property_assessment_clean``.
+
+    Numeric columns keep their precision and scale as ``decimal128`` and dates map to
+    ``date32``, so values round-trip without float or string conversion.
+    """
+    fields = []
+    for column in models.PropertyAssessmentClean.__table__.columns:
+        if isinstance(column.type, Numeric):
+            arrow_type = pa.decimal128(column.type.precision, column.type.scale)
+        elif isinstance(column.type, Date):
+            arrow_type = pa.date32()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type, nullable=not column.primary_key))
+    return pa.schema(fields)
+
+
+def write_columnar_export(path: str, format: schemas.ExportFormat, filters: List, chunk_size: int) -> None:
+    """Write the filtered assessments to ``path`` as Arrow IPC or Parquet.
+
+    Each database partition becomes one record batch (one row group for Parquet), so
+    at most ``chunk_size`` rows are held in memory. The file is written under a
+    temporary name unique to the call and moved into place once complete, so
+    concurrent exports of the same file never write to the same one.
+
+    Args:
+        path: Destination file.
+        format: ``arrow`` or ``parquet``.
+        filters: Filter clauses from :class:`AssessmentFilterParams`.
+        chunk_size: Number of rows per batch.
+    """
+    schema = assessment_arrow_schema()
+    descriptor, partial_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix=os.path.basename(path) + '.', suffix='.partial'
+    )
+    try:
+        with os.fdopen(descriptor, 'wb') as sink:
+            if format == schemas.ExportFormat.parquet:
+                writer = pq.ParquetWriter(sink, schema)
+            else:
+                writer = pa.ipc.new_file(sink, schema)
+            try:
+                for partition in iter_assessment_rows(filters, chunk_size):
+                    columns = zip(*partition)
+                    arrays = [pa.array(values, type=field.type) for values, field in zip(columns, schema)]
+                    writer.write_batch(pa.record_batch(arrays, schema=schema))
+            finally:
+                writer.close()
+        os.replace(partial_path, path)
+    except BaseException:
+        try:
+            os.remove(partial_path)
+        except OSError:
+            pass
+        raise
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def evict_exports(keep: str) -> None:
+    """Remove the least recently used exports until the cache fits its size limit.
+
+    Files in use by concurrent exports (``.partial``) are not counted nor removed, and
+    ``keep``, the export just written, always stays, as do exports used within the last
+    ``EXPORT_IN_USE_SECONDS`` that another request may be about to send.
+    """
+    in_use = time.time() - EXPORT_IN_USE_SECONDS
+    files = []
+    for path in glob.glob(os.path.join(EXPORT_CACHE_DIR, 'assessments-v*')):
+        if path.endswith('.partial') or path == keep:
+            continue
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in files) + os.path.getsize(keep)
+    for mtime, size, path in sorted(files):
+        if total <= EXPORT_CACHE_MAX_BYTES or mtime >= in_use:
+            break
+        _remove(path)
+        total -= size
+
+
+def columnar_export_path(format: schemas.ExportFormat, params: AssessmentFilterParams, version: int) -> str:
+    """Return the cache file for an export of ``params`` at a given table version.
+
+    Files cached for older versions of the table are removed once they have not been
+    used for ``EXPORT_IN_USE_SECONDS``. Partial files are left to the export writing
+    them, unless they are old enough to have been abandoned.
+    """
+    os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+    digest = hashlib.sha256(repr((format.value,) + params.cache_key()).encode()).hexdigest()[:24]
+    now = time.time()
+    for stale in glob.glob(os.path.join(EXPORT_CACHE_DIR, 'assessments-v*')):
+        if stale.endswith('.partial'):
+            max_age = EXPORT_PARTIAL_MAX_AGE_SECONDS
+        elif not os.path.basename(stale).startswith(f'assessments-v{version}-'):
+            max_age = EXPORT_IN_USE_SECONDS
+        else:
+            continue
+        try:
+            if os.path.getmtime(stale) < now - max_age:
+                _remove(stale)
+        except OSError:
+            pass
+    return os.path.join(EXPORT_CACHE_DIR, f'assessments-v{version}-{digest}.{format.value}')
+
+
+@router.get('/assessments/export', response_model=None)
+def export_assessments(
+    params: AssessmentFilterParams = Depends(),
+    format: schemas.ExportFormat = Query(schemas.ExportFormat.ndjson),
+    chunk_size: int = Query(5000, ge=100, le=50000),
+    current_user: CachedUser = Depends(get_current_user),
+    db: Session = Depends(get_db),
+) -> Union[StreamingResponse, FileResponse]:
+    """Export every assessment matching the list filters.
+
+    NDJSON and CSV are streamed as they are read. Arrow IPC and Parquet are written to
+    a file cached per (format, filters, table version), so repeated pulls of unchanged
+    data are served from disk.
+
+    Args:
+        params: The same filters accepted by ``GET /assessments``.
+        format: Output format.
+        chunk_size: Rows fetched from the database and written per chunk.
+        current_user: The authenticated user.
+        db: Database session.
+
+    Returns:
+        Union[StreamingResponse, FileResponse]: The export.
+    """
+    keys = [column.name for column in models.PropertyAssessmentClean.__table__.columns]
+    filters = params.clauses()
+    filename = f'assessments.{format.value}'
+
+    if format in COLUMNAR_FORMATS:
+        if pa is None:
+            raise HTTPException(status_code=501, detail='Columnar exports require pyarrow')
+        version = get_table_version(db, models.PropertyAssessmentClean.__tablename__)
+        path = columnar_export_path(format, params, version)
+        try:
+            # Mark the export as recently used for the size limit of the cache
+            os.utime(path)
+        except FileNotFoundError:
+            write_columnar_export(path, format, filters, chunk_size)
+            evict_exports(keep=path)
+        return FileResponse(path, media_type=EXPORT_MEDIA_TYPES[format], filename=filename)
+
+    def body() -> Iterator[bytes]:
+        if format == schemas.ExportFormat.csv:
+            yield csv_header(keys)
+            for partition in iter_assessment_rows(filters, chunk_size):
+                yield csv_chunk(partition)
+        else:
+            for partition in iter_assessment_rows(filters, chunk_size):
+                yield ndjson_chunk(keys, partition)
+
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
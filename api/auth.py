@@ -1,55 +1,80 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from database.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.database import get_async_db
 from models import user_model as models
 from schemas import user_schema as schemas
 from authentication import user_auth as auth
+from authentication.token_cache import CachedUser, token_cache
 
 router = APIRouter()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 @router.post("/register", response_model=schemas.User)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
-    if db_user:
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(models.User).where(models.User.username == user.username))
+    if result.scalars().first():
         raise HTTPException(status_code=400, detail="Username already registered")
      # Check if email already exists
-    db_email = db.query(models.User).filter(models.User.email == user.email).first()
-    if db_email:
+    result = await db.execute(select(models.User).where(models.User.email == user.email))
+    if result.scalars().first():
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_password = auth.get_password_hash(user.password)
+    hashed_password = await auth.get_password_hash_async(user.password)
     new_user = models.User(username=user.username, email=user.email, hashed_password=hashed_password)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 @router.post("/token", response_model=schemas.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.username == form_data.username).first()
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
+async def login_for_access_token(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+):
+    result = await db.execute(select(models.User).where(models.User.username == form_data.username))
+    user = result.scalars().first()
+    valid, new_hash = (False, None)
+    if user:
+        valid, new_hash = await auth.verify_password_async(form_data.password, user.hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # The bcrypt cost changed since this password was hashed
+        user.hashed_password = new_hash
+        await db.commit()
+        token_cache.invalidate_user(user.username)
     access_token = auth.create_access_token(data={"sub": user.username})
     return {"access_token": access_token, "token_type": "bearer"}
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    username = auth.verify_token(token)
-    if username is None:
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> CachedUser:
+    """Resolve the user of a bearer token, shared by every protected route.
+
+    Verified tokens are served from ``token_cache`` until they expire, so the JWT is
+    decoded and the user loaded once per token rather than once per request.
+    """
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+    payload = auth.decode_token(token)
+    if payload is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    user = db.query(models.User).filter(models.User.username == username).first()
+    result = await db.execute(select(models.User).where(models.User.username == payload["sub"]))
+    user = result.scalars().first()
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    cached = CachedUser(id=user.id, username=user.username, email=user.email)
+    token_cache.put(token, cached, payload.get("exp", float("inf")))
+    return cached
 
 @router.get("/verify-token")
 async def verify_token_route(token: str = Depends(oauth2_scheme)):
@@ -59,5 +84,5 @@ async def verify_token_route(token: str = Depends(oauth2_scheme)):
     return {"token": token}
 
 @router.get("/users/me", response_model=schemas.User)
-async def read_users_me(current_user: models.User = Depends(get_current_user)):
+async def read_users_me(current_user: CachedUser = Depends(get_current_user)):
     return current_user
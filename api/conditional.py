@@ -0,0 +1,61 @@
+"""Conditional GET support for the list endpoints of the Real Property Tax Assessment System.
+
+A response is identified by the change version of the table it reads
+(``database/table_versions.py``) and by the request's path and query parameters. Every
+write through the API bumps the version, so the ETag changes exactly when a poll could
+see different rows, and an unchanged poll is answered with ``304 Not Modified`` after
+a single primary-key lookup of the version.
+"""
+import hashlib
+from typing import Optional
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+
+# Clients may keep the response but must revalidate it before every reuse
+CACHE_CONTROL = 'private, no-cache'
+
+
+def make_etag(request: Request, table_name: str, version: int) -> str:
+    """Build a strong ETag for a GET of ``table_name`` at ``version``.
+
+    Query parameters are sorted so that their order in the URL does not matter, and
+    re-encoded so that values containing ``&`` or ``=`` cannot collide with others.
+
+    Args:
+        request: The incoming request.
+        table_name: Table the response is read from.
+        version: Current change version of that table.
+
+    Returns:
+        str: A quoted entity tag.
+    """
+    query = urlencode(sorted(request.query_params.multi_items()))
+    identity = f'{table_name}:{version}:{request.url.path}?{query}'
+    return '"' + hashlib.sha256(identity.encode()).hexdigest()[:32] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Return whether the request's ``If-None-Match`` header matches ``etag``.
+
+    ``If-None-Match`` uses the weak comparison, so a ``W/`` prefix is ignored.
+    """
+    header: Optional[str] = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    candidates = (candidate.strip() for candidate in header.split(','))
+    return etag in (candidate[2:] if candidate.startswith('W/') else candidate for candidate in candidates)
+
+
+def not_modified(etag: str) -> Response:
+    """Return an empty ``304 Not Modified`` response for ``etag``."""
+    return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': CACHE_CONTROL})
+
+
+def set_etag(response: Response, etag: str) -> Response:
+    """Attach ``etag`` and the revalidation policy to a full response."""
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    return response
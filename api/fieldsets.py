@@ -0,0 +1,30 @@
+"""Sparse fieldsets (``fields=``) shared by the list endpoints of the Real Property Tax Assessment System."""
+from typing import List, Optional, Sequence
+
+from fastapi import HTTPException
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str]) -> List[str]:
+    """Parse a comma-separated ``fields`` query parameter.
+
+    Args:
+        fields: The raw parameter, e.g. ``"tdn,market_val"``.
+        allowed: Every field the endpoint can return, in response order.
+
+    Returns:
+        List[str]: The requested fields without duplicates, in the order given, or all
+        of ``allowed`` when no field is requested.
+
+    Raises:
+        HTTPException: If a requested field is not one of ``allowed``.
+    """
+    requested = list(dict.fromkeys(name.strip() for name in (fields or '').split(',') if name.strip()))
+    if not requested:
+        return list(allowed)
+    unknown = [name for name in requested if name not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed fields: {', '.join(allowed)}",
+        )
+    return requested
@@ -0,0 +1,44 @@
+"""Internal operational endpoints of the Real Property Tax Assessment System.
+
+These routes are meant for monitoring from inside the deployment, are left out of
+the public OpenAPI schema and require a signed-in user like every data route.
+"""
+from typing import Dict
+
+from fastapi import APIRouter, Depends
+
+from api.auth import get_current_user
+from authentication.user_auth import hashing_status
+from database.database import async_engine, engine
+from database.pool_metrics import pool_status
+from services.assessment_snapshot import assessment_snapshot
+from services.typeahead import typeahead
+
+router = APIRouter(prefix='/internal', include_in_schema=False, dependencies=[Depends(get_current_user)])
+
+
+@router.get('/pool')
+def get_pool_status() -> Dict:
+    """Return live statistics of the sync and async connection pools of this worker."""
+    return {
+        'sync': pool_status(engine),
+        'async': pool_status(async_engine.sync_engine),
+    }
+
+
+@router.get('/hashing')
+def get_hashing_status() -> Dict:
+    """Return the concurrency, backlog and timing histograms of password hashing."""
+    return hashing_status()
+
+
+@router.get('/typeahead')
+def get_typeahead_status() -> Dict:
+    """Return the number of keys held by each suggestion index of this worker."""
+    return typeahead.size()
+
+
+@router.get('/snapshot')
+def get_snapshot_status() -> Dict:
+    """Return the version, row count and memory use of the analytics snapshot of this worker."""
+    return assessment_snapshot.stats()
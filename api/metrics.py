@@ -0,0 +1,227 @@
+"""Request metrics and the Prometheus ``/metrics`` endpoint.
+
+:class:`MetricsMiddleware` records, per route template, the latency of each request,
+the database time and statement count attributed to it, the response status and the
+number of requests in flight. ``/metrics`` renders these together with the connection
+pool and password hashing statistics in the Prometheus text format. Metrics are kept
+per worker process.
+
+``/metrics`` requires a bearer token: the access token of a signed-in user, or the
+value of ``METRICS_SCRAPE_TOKEN`` when it is set, for Prometheus to send with
+``authorization: {credentials: ...}`` in its scrape config.
+"""
+import hmac
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.auth import get_current_user, oauth2_scheme
+from authentication.user_auth import hashing_status
+from database.database import async_engine, engine, get_async_db
+from database.pool_metrics import Histogram, pool_status
+from database.query_stats import QueryStats, current_query_stats
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 500)
+# Static bearer token accepted from the Prometheus scraper, unset to accept users only
+METRICS_SCRAPE_TOKEN = os.getenv('METRICS_SCRAPE_TOKEN')
+
+router = APIRouter(include_in_schema=False)
+
+
+class LabeledHistogram:
+    """A family of histograms keyed by label values."""
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._children: Dict[Tuple[str, ...], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        child = self._children.get(labels)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(labels, Histogram(self.buckets))
+        child.observe(value)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for labels, child in sorted(self._children.items()):
+            lines.extend(histogram_lines(self.name, dict(zip(self.label_names, labels)), child.snapshot()))
+        return lines
+
+
+class LabeledCounter:
+    """A family of monotonically increasing counters keyed by label values."""
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str]):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...], amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for labels, value in sorted(self._values.items()):
+            lines.append(sample(self.name, dict(zip(self.label_names, labels)), value))
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def sample(name: str, labels: Dict[str, str], value: float) -> str:
+    """Format one sample line of the Prometheus text format."""
+    if labels:
+        rendered = ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+        return f'{name}{{{rendered}}} {value}'
+    return f'{name} {value}'
+
+
+def histogram_lines(name: str, labels: Dict[str, str], snapshot: Dict) -> List[str]:
+    """Format a :meth:`Histogram.snapshot` as ``_bucket``, ``_sum`` and ``_count`` samples."""
+    lines = [sample(f'{name}_bucket', {**labels, 'le': bound}, count) for bound, count in snapshot['buckets'].items()]
+    lines.append(sample(f'{name}_sum', labels, snapshot['sum']))
+    lines.append(sample(f'{name}_count', labels, snapshot['count']))
+    return lines
+
+
+request_duration = LabeledHistogram(
+    'http_request_duration_seconds', 'Time spent handling a request.', ('method', 'route'), LATENCY_BUCKETS,
+)
+request_db_duration = LabeledHistogram(
+    'http_request_db_seconds', 'Database time spent on behalf of a request.', ('method', 'route'), LATENCY_BUCKETS,
+)
+request_db_statements = LabeledHistogram(
+    'http_request_db_statements', 'Database statements executed for a request.', ('method', 'route'),
+    STATEMENT_BUCKETS,
+)
+responses_total = LabeledCounter(
+    'http_responses_total', 'Responses sent, by status code.', ('method', 'route', 'status'),
+)
+_in_flight = 0
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, database time and status of each HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _in_flight
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                elapsed = (time.perf_counter() - started) * 1000
+                headers = list(message.get('headers', []))
+                headers.append((
+                    b'server-timing',
+                    f'db;dur={stats.seconds * 1000:.1f};desc="{stats.statements} statements", '
+                    f'app;dur={elapsed:.1f}'.encode(),
+                ))
+                message = {**message, 'headers': headers}
+            await send(message)
+
+        _in_flight += 1
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _in_flight -= 1
+            current_query_stats.reset(token)
+            route = scope.get('route')
+            labels = (scope['method'], route.path if route is not None else 'unmatched')
+            request_duration.observe(labels, time.perf_counter() - started)
+            request_db_duration.observe(labels, stats.seconds)
+            request_db_statements.observe(labels, stats.statements)
+            responses_total.inc(labels + (str(status_code),))
+
+
+def _pool_lines(pools: Iterable[Tuple[str, Dict]]) -> List[str]:
+    gauges = {
+        'db_pool_size': ('size', 'Configured size of the connection pool.'),
+        'db_pool_checked_out': ('checked_out', 'Connections currently checked out.'),
+        'db_pool_checked_in': ('checked_in', 'Idle connections held by the pool.'),
+        'db_pool_overflow': ('overflow', 'Connections open beyond the pool size.'),
+    }
+    pools = list(pools)
+    lines: List[str] = []
+    for name, (key, help) in gauges.items():
+        lines += [f'# HELP {name} {help}', f'# TYPE {name} gauge']
+        lines += [sample(name, {'engine': engine_name}, status[key]) for engine_name, status in pools]
+    lines += ['# HELP db_pool_checkout_timeouts_total Checkouts that timed out.',
+              '# TYPE db_pool_checkout_timeouts_total counter']
+    lines += [sample('db_pool_checkout_timeouts_total', {'engine': engine_name}, status['checkout_timeouts'])
+              for engine_name, status in pools]
+    lines += ['# HELP db_pool_checkout_wait_seconds Time spent checking a connection out of the pool.',
+              '# TYPE db_pool_checkout_wait_seconds histogram']
+    for engine_name, status in pools:
+        lines += histogram_lines('db_pool_checkout_wait_seconds', {'engine': engine_name},
+                                 status['checkout_wait_seconds'])
+    return lines
+
+
+def _hashing_lines() -> List[str]:
+    status = hashing_status()
+    lines = ['# HELP password_hash_pending Password hashing jobs queued or running.',
+             '# TYPE password_hash_pending gauge',
+             sample('password_hash_pending', {}, status['pending'])]
+    for name, key, help in (
+        ('password_hash_queue_wait_seconds', 'queue_wait_seconds', 'Time a hashing job waited for a worker.'),
+        ('password_hash_seconds', 'hash_seconds', 'Time spent computing a password hash.'),
+    ):
+        lines += [f'# HELP {name} {help}', f'# TYPE {name} histogram']
+        lines += histogram_lines(name, {}, status[key])
+    return lines
+
+
+def render_metrics() -> str:
+    """Render every metric of this worker in the Prometheus text format."""
+    lines = ['# HELP http_requests_in_flight Requests currently being handled.',
+             '# TYPE http_requests_in_flight gauge',
+             sample('http_requests_in_flight', {}, _in_flight)]
+    for family in (request_duration, request_db_duration, request_db_statements, responses_total):
+        lines += family.render()
+    lines += _pool_lines([('sync', pool_status(engine)), ('async', pool_status(async_engine.sync_engine))])
+    lines += _hashing_lines()
+    return '\n'.join(lines) + '\n'
+
+
+async def require_metrics_access(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+) -> None:
+    """Accept the scrape token, or else the access token of a signed-in user."""
+    if METRICS_SCRAPE_TOKEN and hmac.compare_digest(token.encode(), METRICS_SCRAPE_TOKEN.encode()):
+        return
+    await get_current_user(token, db)
+
+
+@router.get('/metrics', response_class=PlainTextResponse, dependencies=[Depends(require_metrics_access)])
+def get_metrics() -> PlainTextResponse:
+    """Expose the metrics of this worker for Prometheus to scrape."""
+    return PlainTextResponse(render_metrics(), media_type='text/plain; version=0.0.4')
@@ -0,0 +1,169 @@
+"""Pagination helpers shared by the list endpoints of the Real Property Tax Assessment System."""
+import base64
+import binascii
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import Table, and_, or_, text
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql.elements import ColumnElement
+
+from schemas.pagination_schema import CountStrategy
+
+COUNT_CACHE_TTL_SECONDS = float(os.getenv('COUNT_CACHE_TTL_SECONDS', '30'))
+COUNT_CACHE_MAX_ENTRIES = int(os.getenv('COUNT_CACHE_MAX_ENTRIES', '1024'))
+
+_count_cache: Dict[Hashable, Tuple[float, int]] = {}
+_count_cache_lock = threading.Lock()
+
+
+def encode_cursor(sort: str, values: Sequence[Any]) -> str:
+    """Encode the sort key of the last row of a page into an opaque cursor.
+
+    Args:
+        sort: Name of the sort order the cursor belongs to.
+        values: Sort key values of the last row, in key order.
+
+    Returns:
+        str: URL-safe cursor string.
+    """
+    payload = json.dumps({'s': sort, 'k': list(values)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, sort: str, key_length: int) -> List[Any]:
+    """Decode a cursor produced by :func:`encode_cursor`.
+
+    Args:
+        cursor: The opaque cursor sent by the client.
+        sort: Sort order of the current request.
+        key_length: Number of values expected in the sort key.
+
+    Returns:
+        List[Any]: The sort key values stored in the cursor.
+
+    Raises:
+        HTTPException: If the cursor is malformed or belongs to another sort order.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = payload['k']
+        cursor_sort = payload['s']
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail='Invalid cursor')
+    if cursor_sort != sort:
+        raise HTTPException(status_code=400, detail='Cursor does not match the requested sort order')
+    if not isinstance(values, list) or len(values) != key_length:
+        raise HTTPException(status_code=400, detail='Invalid cursor')
+    return values
+
+
+def keyset_after(columns: Sequence[ColumnElement], values: Sequence[Any]) -> ColumnElement:
+    """Build a predicate selecting rows strictly after ``values`` in ``columns`` order.
+
+    The predicate is expanded into ``a > x OR (a = x AND b > y) ...`` rather than a row
+    value comparison so that it works on any backend and still matches a composite index.
+
+    Args:
+        columns: Sort key columns, all ascending.
+        values: Sort key values of the last row already returned.
+
+    Returns:
+        ColumnElement: Filter expression for the next page.
+    """
+    clauses = []
+    for position, column in enumerate(columns):
+        equal_prefix = [columns[i] == values[i] for i in range(position)]
+        clauses.append(and_(*equal_prefix, column > values[position]))
+    return or_(*clauses)
+
+
+def _cached_count(key: Hashable) -> Optional[int]:
+    with _count_cache_lock:
+        entry = _count_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, total = entry
+        if expires_at < time.monotonic():
+            del _count_cache[key]
+            return None
+        return total
+
+
+def _store_count(key: Hashable, total: int) -> None:
+    with _count_cache_lock:
+        if len(_count_cache) >= COUNT_CACHE_MAX_ENTRIES:
+            now = time.monotonic()
+            for stale in [k for k, (expires_at, _) in _count_cache.items() if expires_at < now]:
+                del _count_cache[stale]
+            if len(_count_cache) >= COUNT_CACHE_MAX_ENTRIES:
+                _count_cache.pop(next(iter(_count_cache)))
+        _count_cache[key] = (time.monotonic() + COUNT_CACHE_TTL_SECONDS, total)
+
+
+def estimate_table_rows(db: Session, table: Table) -> Optional[int]:
+    """Return the planner's row estimate for a whole table, if the backend keeps one.
+
+    Args:
+        db: Database session.
+        table: The table to estimate.
+
+    Returns:
+        Optional[int]: ``pg_class.reltuples`` for PostgreSQL once the table has been
+        analyzed, otherwise ``None``.
+    """
+    if db.get_bind().dialect.name != 'postgresql':
+        return None
+    estimate = db.execute(
+        text(
+            'SELECT c.reltuples FROM pg_class c '
+            'JOIN pg_namespace n ON n.oid = c.relnamespace '
+            'WHERE n.nspname = :schema AND c.relname = :name'
+        ),
+        {'schema': db.connection().schema_for_object(table) or 'public', 'name': table.name},
+    ).scalar()
+    if estimate is None or estimate < 0:
+        return None
+    return int(estimate)
+
+
+def count_rows(
+    query: Query,
+    strategy: CountStrategy,
+    cache_key: Hashable,
+    table: Optional[Table] = None,
+) -> Optional[int]:
+    """Count the rows of a list query according to the requested strategy.
+
+    ``exact`` always runs ``COUNT(*)`` and refreshes the cache. ``estimated`` answers an
+    unfiltered request (``table`` given) from planner statistics, and otherwise serves a
+    count cached for ``COUNT_CACHE_TTL_SECONDS`` under ``cache_key``, counting on a miss.
+    ``none`` skips counting.
+
+    Args:
+        query: The filtered, unordered and unpaginated list query.
+        strategy: The count strategy requested by the client.
+        cache_key: Hashable identity of the filters applied to ``query``.
+        table: The queried table when no filter is applied.
+
+    Returns:
+        Optional[int]: The total, or ``None`` for the ``none`` strategy.
+    """
+    if strategy == CountStrategy.none:
+        return None
+    if strategy == CountStrategy.estimated:
+        if table is not None:
+            estimate = estimate_table_rows(query.session, table)
+            if estimate is not None:
+                return estimate
+        total = _cached_count(cache_key)
+        if total is not None:
+            return total
+    total = query.count()
+    _store_count(cache_key, total)
+    return total
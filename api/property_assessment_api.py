@@ -1,107 +1,408 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from collections import Counter
+from typing import List
+from sqlalchemy import BigInteger, Float, Numeric, and_, cast, column, delete, func, select, update
+from sqlalchemy import values as values_clause
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from api.conditional import etag_matches, make_etag, not_modified, set_etag
+from api.fieldsets import parse_fields
+from api.pagination import count_rows, decode_cursor, encode_cursor, keyset_after
 from database.database import get_db
+from database.table_versions import bump_table_version, get_table_version
 from models import property_assessment_model as models
+from models.assessment_rollup_model import AssessmentRollup
 from schemas import property_assessment_schema as schemas
-from authentication.user_auth import verify_token
-from fastapi.security import OAuth2PasswordBearer
+from schemas.pagination_schema import CountStrategy
+from api.auth import get_current_user
+from authentication.token_cache import CachedUser
+from services.assessment_ingest import ingest_assessments
+from services.assessment_rollup import (
+    MEASURE_COLUMNS,
+    ROLLUP_COLUMNS,
+    apply_changes,
+    locked_previous,
+    previous_columns,
+)
+from schemas.suggest_schema import SuggestSource
+from services.typeahead import typeahead
 
 router = APIRouter()
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    username = verify_token(token)
-    if username is None:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    return username
+MAX_PATCH_BATCH = 10000
+
+class AssessmentFilterParams:
+    """Query parameters filtering ``property_assessment_clean``, shared by list and export routes.
+
+    Name filters are substring matches served by the trigram indexes of the
+    ``add_assessment_search_indexes`` migration; code filters are exact matches.
+    """
+
+    def __init__(
+        self,
+        municipality: str | None = Query(None),
+        barangay: str | None = Query(None),
+        classification: str | None = Query(None),
+        gr: str | None = Query(None),
+        mun_code: str | None = Query(None, description="Exact municipality code"),
+        barangay_code: str | None = Query(None, description="Exact barangay code"),
+    ):
+        self.municipality = municipality
+        self.barangay = barangay
+        self.classification = classification
+        self.gr = gr
+        self.mun_code = mun_code
+        self.barangay_code = barangay_code
+
+    def clauses(self):
+        table = models.PropertyAssessmentClean
+        filters = []
+        if self.municipality:
+            filters.append(table.municipality.ilike(f"%{self.municipality}%"))
+        if self.barangay:
+            filters.append(table.barangay.ilike(f"%{self.barangay}%"))
+        if self.classification:
+            filters.append(table.classification.ilike(f"%{self.classification}%"))
+        if self.gr:
+            filters.append(table.gr.ilike(f"%{self.gr}%"))
+        if self.mun_code:
+            filters.append(table.mun_code == self.mun_code)
+        if self.barangay_code:
+            filters.append(table.barangay_code == self.barangay_code)
+        return filters
+
+    def cache_key(self):
+        return (
+            self.municipality,
+            self.barangay,
+            self.classification,
+            self.gr,
+            self.mun_code,
+            self.barangay_code,
+        )
+
+def assessment_sort_columns(sort: schemas.AssessmentSort):
+    """Return the keyset columns for a sort order, ending with the unique ``tdn``.
+
+    Nullable name columns are coalesced to an empty string so that every row has a
+    comparable key; the matching expression indexes are created by the
+    ``add_assessment_keyset_indexes`` migration.
+    """
+    table = models.PropertyAssessmentClean
+    columns = []
+    if sort in (schemas.AssessmentSort.municipality, schemas.AssessmentSort.barangay):
+        columns.append(func.coalesce(table.municipality, ""))
+    if sort == schemas.AssessmentSort.barangay:
+        columns.append(func.coalesce(table.barangay, ""))
+    columns.append(table.tdn)
+    return columns
+
+ASSESSMENT_FIELDS = [column.name for column in models.PropertyAssessmentClean.__table__.columns]
+
+def assessment_list_columns(names):
+    """Return the named columns of ``schemas.PropertyAssessment`` as plain, JSON-ready values.
+
+    Numeric columns are cast to double precision in the query, so rows come back with
+    floats instead of ``Decimal`` objects; dates are serialized by orjson as ISO strings.
+    """
+    columns = models.PropertyAssessmentClean.__table__.columns
+    return [
+        cast(columns[name], Float).label(name) if isinstance(columns[name].type, Numeric) else columns[name]
+        for name in names
+    ]
 
 @router.get("/assessments", response_model=schemas.PaginatedAssessmentResponse)
 def get_assessments(
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(0, le=300000),
-    municipality: str | None = Query(None),
-    barangay: str | None = Query(None),
-    classification: str | None = Query(None),
-    current_user: str = Depends(get_current_user),
+    params: AssessmentFilterParams = Depends(),
+    sort: schemas.AssessmentSort = Query(schemas.AssessmentSort.tdn),
+    cursor: str | None = Query(None, description="Opaque next_cursor from the previous page"),
+    count: CountStrategy = Query(CountStrategy.exact, description="How to compute total: exact, estimated or none"),
+    fields: str | None = Query(
+        None, description="Comma-separated fields to return, all by default. Other fields are left out of each item"
+    ),
+    current_user: CachedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    query = db.query(models.PropertyAssessmentClean)
+    # Rows are selected as tuples and encoded with orjson, skipping ORM instances and
+    # response_model validation, which dominate the cost of large pages
+    if cursor and skip:
+        raise HTTPException(status_code=400, detail="skip cannot be combined with cursor")
+
+    # Only the requested fields are selected, plus the sort key needed for next_cursor
+    names = parse_fields(fields, ASSESSMENT_FIELDS)
+    key_names = ["tdn"]
+    if sort != schemas.AssessmentSort.tdn:
+        key_names.append("municipality")
+    if sort == schemas.AssessmentSort.barangay:
+        key_names.append("barangay")
+    selected = names + [name for name in key_names if name not in names]
+
+    # Unchanged polls are answered from the table version alone
+    table_name = models.PropertyAssessmentClean.__tablename__
+    etag = make_etag(request, table_name, get_table_version(db, table_name))
+    if etag_matches(request, etag):
+        return not_modified(etag)
 
-    filters = []
-    if municipality:
-        filters.append(models.PropertyAssessmentClean.municipality.ilike(f"%{municipality}%"))
-    if barangay:
-        filters.append(models.PropertyAssessmentClean.barangay.ilike(f"%{barangay}%"))
-    if classification:
-        filters.append(models.PropertyAssessmentClean.classification.ilike(f"%{classification}%"))
+    query = db.query(*assessment_list_columns(selected))
 
+    filters = params.clauses()
     if filters:
         query = query.filter(and_(*filters))
 
-    total = query.count()
-    assessments = query.offset(skip).limit(limit).all()
+    total = count_rows(
+        query,
+        count,
+        cache_key=("assessments",) + params.cache_key(),
+        table=None if filters else models.PropertyAssessmentClean.__table__,
+    )
+
+    sort_columns = assessment_sort_columns(sort)
+    query = query.order_by(*sort_columns)
+    if cursor:
+        after = decode_cursor(cursor, sort.value, len(sort_columns))
+        query = query.filter(keyset_after(sort_columns, after))
+    else:
+        query = query.offset(skip)
+    rows = query.limit(limit).all()
+
+    next_cursor = None
+    if limit and len(rows) == limit:
+        last = rows[-1]
+        key = [last.tdn]
+        if sort == schemas.AssessmentSort.barangay:
+            key.insert(0, last.barangay or "")
+        if sort != schemas.AssessmentSort.tdn:
+            key.insert(0, last.municipality or "")
+        next_cursor = encode_cursor(sort.value, key)
 
-    return {
-        "data": assessments,
+    return set_etag(ORJSONResponse({
+        "data": [dict(zip(names, row)) for row in rows],
         "total": total,
+        "count": count,
         "skip": skip,
-        "limit": limit
+        "limit": limit,
+        "sort": sort,
+        "next_cursor": next_cursor
+    }), etag)
+
+@router.get("/assessments/summary", response_model=schemas.AssessmentSummaryResponse)
+def get_assessment_summary(
+    request: Request,
+    group_by: List[schemas.SummaryDimension] = Query(
+        [], description="Dimensions to group by, none for province-wide totals"
+    ),
+    mun_code: str | None = Query(None, description="Exact municipality code"),
+    barangay_code: str | None = Query(None, description="Exact barangay code"),
+    classification: str | None = Query(None, description="Exact classification"),
+    taxability: str | None = Query(None, description="Exact taxability"),
+    current_user: CachedUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Return parcel counts and totals of market value, assessed value and area.
+
+    Totals are read from the assessment_rollup table maintained by the write
+    endpoints, never from property_assessment_clean, so they cost a scan of a few
+    thousand groups whatever the size of the roll.
+    """
+    table_name = models.PropertyAssessmentClean.__tablename__
+    etag = make_etag(request, table_name, get_table_version(db, table_name))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    rollup = AssessmentRollup.__table__
+    dimensions = list(dict.fromkeys(dimension.value for dimension in group_by))
+    query = select(
+        *(rollup.c[name] for name in dimensions),
+        cast(func.sum(rollup.c.parcels), BigInteger).label("parcels"),
+        *(cast(func.sum(rollup.c[name]), Float).label(name) for name in MEASURE_COLUMNS),
+    )
+    filters = {
+        "mun_code": mun_code,
+        "barangay_code": barangay_code,
+        "classification": classification,
+        "taxability": taxability,
     }
+    for name, value in filters.items():
+        if value is not None:
+            query = query.where(rollup.c[name] == value)
+    if dimensions:
+        grouped = [rollup.c[name] for name in dimensions]
+        query = query.group_by(*grouped).order_by(*grouped)
+    rows = db.execute(query).mappings().all()
+
+    groups = []
+    totals = dict.fromkeys(("parcels",) + MEASURE_COLUMNS, 0)
+    for row in rows:
+        if not row["parcels"]:
+            continue
+        # Missing codes are stored as empty strings in the rollup
+        group = {name: row[name] or None for name in dimensions}
+        group.update({name: row[name] for name in totals})
+        groups.append(group)
+        for name in totals:
+            totals[name] += row[name]
+    return set_etag(ORJSONResponse({"group_by": dimensions, "groups": groups, "totals": totals}), etag)
 
 @router.post("/assessments", response_model=schemas.PropertyAssessment)
 def create_assessment(
     assessment: schemas.PropertyAssessment,
-    current_user: str = Depends(get_current_user),
+    current_user: CachedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Check if assessment with the same TDN already exists
-    existing_assessment = db.query(models.PropertyAssessmentClean).filter(
-        models.PropertyAssessmentClean.tdn == assessment.tdn
+    # A single INSERT ... ON CONFLICT DO NOTHING both checks and inserts, so two
+    # concurrent creates of the same TDN cannot both pass an existence check
+    table = models.PropertyAssessmentClean.__table__
+    created = db.execute(
+        insert(table)
+        .values(**assessment.dict())
+        .on_conflict_do_nothing(index_elements=[table.c.tdn])
+        .returning(*table.columns)
     ).first()
-    
-    if existing_assessment:
+    if created is None:
+        db.rollback()
         raise HTTPException(
             status_code=400,
             detail="Assessment with this TDN already exists"
         )
-    
-    # Create new assessment
-    db_assessment = models.PropertyAssessmentClean(**assessment.dict())
-    db.add(db_assessment)
+
+    apply_changes(db, added=[created._mapping])
+    version = bump_table_version(db, models.PropertyAssessmentClean.__tablename__, [created.tdn])
+    db.commit()
+    typeahead.note_write(SuggestSource.tdn, version, added=[(created.tdn, created.tdn)])
+    return created
+
+@router.post("/assessments/bulk", response_model=schemas.IngestReport)
+def bulk_ingest_assessments(
+    file: UploadFile = File(...),
+    format: schemas.IngestFormat | None = Query(None, description="Defaults to the file extension"),
+    batch_size: int = Query(5000, ge=1, le=50000),
+    current_user: CachedUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    if format is None:
+        extension = (file.filename or "").rsplit(".", 1)[-1].lower()
+        if extension not in schemas.IngestFormat.__members__:
+            raise HTTPException(
+                status_code=400, detail="Cannot infer the upload format, pass format=csv or format=ndjson"
+            )
+        format = schemas.IngestFormat(extension)
+    try:
+        return ingest_assessments(db, file.file, format, batch_size)
+    finally:
+        # Batches committed before a failure are loaded too
+        typeahead.invalidate(SuggestSource.tdn)
+
+@router.patch("/assessments", response_model=schemas.AssessmentPatchReport)
+def patch_assessments(
+    patches: List[schemas.AssessmentPatch],
+    current_user: CachedUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Apply many partial updates in one transaction.
+
+    Patches setting the same fields share one ``UPDATE ... FROM (VALUES ...)``, so a
+    batch costs one statement per distinct set of fields. TDNs that do not exist are
+    reported and skipped.
+    """
+    if len(patches) > MAX_PATCH_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PATCH_BATCH} patches per request")
+    tdns = [patch.tdn for patch in patches]
+    duplicates = sorted(tdn for tdn, count in Counter(tdns).items() if count > 1)
+    if duplicates:
+        raise HTTPException(status_code=400, detail=f"Duplicate tdn in batch: {', '.join(duplicates)}")
+
+    shapes = {}
+    for patch in patches:
+        values = patch.dict(exclude_unset=True)
+        fields = tuple(name for name in ASSESSMENT_FIELDS if name in values and name != "tdn")
+        shapes.setdefault(fields, []).append(values)
+
+    table = models.PropertyAssessmentClean.__table__
+    updated = set()
+    for fields, rows in shapes.items():
+        if not fields:
+            # Nothing to change, only report whether the TDNs exist
+            found = db.execute(select(table.c.tdn).where(table.c.tdn.in_([row["tdn"] for row in rows]))).scalars()
+            updated.update(found)
+            continue
+        patch_rows = values_clause(
+            *(column(name, table.c[name].type) for name in ("tdn",) + fields), name="patch"
+        ).data([tuple(row[name] for name in ("tdn",) + fields) for row in rows])
+        previous = locked_previous([row["tdn"] for row in rows])
+        statement = (
+            update(table)
+            .where(table.c.tdn == patch_rows.c.tdn, previous.c.tdn == table.c.tdn)
+            # Casts give the VALUES columns their types even when every value is NULL
+            .values({name: cast(patch_rows.c[name], table.c[name].type) for name in fields})
+            .returning(table.c.tdn, *(table.c[name] for name in ROLLUP_COLUMNS), *previous_columns(previous))
+        )
+        changed = db.execute(statement).mappings().all()
+        apply_changes(db, added=changed, removed=changed, removed_prefix="previous_")
+        updated.update(row["tdn"] for row in changed)
+
+    if updated:
+        version = bump_table_version(db, models.PropertyAssessmentClean.__tablename__, updated)
     db.commit()
-    db.refresh(db_assessment)
-    return db_assessment
+    if updated:
+        typeahead.note_write(SuggestSource.tdn, version)
+    return {"updated": len(updated), "not_found": [tdn for tdn in tdns if tdn not in updated]}
 
 @router.put("/assessments/{tdn}", response_model=schemas.PropertyAssessment)
 def update_assessment(
     tdn: str,
     assessment: schemas.PropertyAssessment,
-    current_user: str = Depends(get_current_user),
+    current_user: CachedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    db_assessment = db.query(models.PropertyAssessmentClean).filter(models.PropertyAssessmentClean.tdn == tdn).first()
-    if not db_assessment:
+    table = models.PropertyAssessmentClean.__table__
+    previous = locked_previous([tdn])
+    try:
+        updated = db.execute(
+            update(table)
+            .where(table.c.tdn == previous.c.tdn)
+            .values(**assessment.dict(exclude_unset=True))
+            .returning(*table.columns, *previous_columns(previous))
+        ).first()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Assessment with this TDN already exists")
+    if updated is None:
+        db.rollback()
         raise HTTPException(status_code=404, detail="Assessment not found")
-    
-    # Update all fields from the request
-    for field, value in assessment.dict(exclude_unset=True).items():
-        setattr(db_assessment, field, value)
-    
+
+    apply_changes(db, added=[updated._mapping], removed=[updated._mapping], removed_prefix="previous_")
+    version = bump_table_version(db, models.PropertyAssessmentClean.__tablename__, [tdn, updated.tdn])
     db.commit()
-    db.refresh(db_assessment)
-    return db_assessment
+    renamed = updated.tdn != tdn
+    typeahead.note_write(
+        SuggestSource.tdn,
+        version,
+        added=[(updated.tdn, updated.tdn)] if renamed else [],
+        removed=[(tdn, tdn)] if renamed else [],
+    )
+    return {name: updated._mapping[name] for name in ASSESSMENT_FIELDS}
 
 @router.delete("/assessments/{tdn}")
 def delete_assessment(
     tdn: str,
-    current_user: str = Depends(get_current_user),
+    current_user: CachedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    db_assessment = db.query(models.PropertyAssessmentClean).filter(models.PropertyAssessmentClean.tdn == tdn).first()
-    if not db_assessment:
+    table = models.PropertyAssessmentClean.__table__
+    deleted = db.execute(
+        delete(table).where(table.c.tdn == tdn).returning(*(table.c[name] for name in ROLLUP_COLUMNS))
+    ).first()
+    if deleted is None:
+        db.rollback()
         raise HTTPException(status_code=404, detail="Assessment not found")
-    
-    db.delete(db_assessment)
+
+    apply_changes(db, removed=[deleted._mapping])
+    version = bump_table_version(db, models.PropertyAssessmentClean.__tablename__, [tdn])
     db.commit()
+    typeahead.note_write(SuggestSource.tdn, version, removed=[(tdn, tdn)])
     return {"message": "Assessment deleted successfully"}
@@ -0,0 +1,67 @@
+"""Row serialization helpers for bulk responses in the Real Property Tax Assessment System.
+
+These helpers work on plain result rows rather than ORM instances or Pydantic models,
+so large result sets can be written without per-row object construction or validation.
+"""
+import csv
+import io
+from decimal import Decimal
+from typing import Any, Iterable, Sequence
+
+import orjson
+
+
+def orjson_default(value: Any) -> Any:
+    """Serialize types orjson does not handle natively.
+
+    Args:
+        value: The value orjson could not serialize.
+
+    Returns:
+        Any: A JSON-compatible replacement.
+
+    Raises:
+        TypeError: If the value has no JSON representation.
+    """
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f'Type {type(value).__name__} is not JSON serializable')
+
+
+def ndjson_chunk(keys: Sequence[str], rows: Iterable[Sequence[Any]]) -> bytes:
+    """Encode rows as newline-delimited JSON objects.
+
+    Args:
+        keys: Field names, in the same order as the row values.
+        rows: Result rows.
+
+    Returns:
+        bytes: One JSON object per line, each terminated by a newline.
+    """
+    return b''.join(
+        orjson.dumps(dict(zip(keys, row)), default=orjson_default, option=orjson.OPT_APPEND_NEWLINE)
+        for row in rows
+    )
+
+
+def csv_header(keys: Sequence[str]) -> bytes:
+    """Encode the CSV header line for ``keys``."""
+    return csv_chunk([keys])
+
+
+def csv_chunk(rows: Iterable[Sequence[Any]]) -> bytes:
+    """Encode rows as CSV lines.
+
+    ``None`` is written as an empty field; dates are written in ISO format and
+    decimals without loss of precision.
+
+    Args:
+        rows: Result rows.
+
+    Returns:
+        bytes: UTF-8 encoded CSV lines.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
@@ -0,0 +1,41 @@
+"""Search-as-you-type suggestions for owner names, PINs and TDNs."""
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
+
+from api.auth import get_current_user
+from authentication.token_cache import CachedUser
+from schemas.suggest_schema import SuggestResponse, SuggestSource
+from services.typeahead import typeahead
+
+router = APIRouter()
+
+
+@router.get('/suggest', response_model=SuggestResponse)
+async def suggest(
+    q: str = Query(..., min_length=1, max_length=100, description='Text typed so far'),
+    source: Optional[List[SuggestSource]] = Query(None, description='Kinds of keys to search, all by default'),
+    limit: int = Query(10, ge=1, le=50, description='Maximum matches per source'),
+    current_user: CachedUser = Depends(get_current_user),
+) -> ORJSONResponse:
+    """Return owner names, PINs and TDNs starting with ``q``.
+
+    Matching ignores case, accents and repeated spaces. Suggestions are served from the
+    in-memory index of ``services/typeahead.py`` without a database query, except for
+    the first request of a worker and the periodic staleness check, which run in the
+    threadpool.
+
+    Args:
+        q: Text typed so far.
+        source: Kinds of keys to search.
+        limit: Maximum number of matches per source.
+        current_user: The authenticated user.
+
+    Returns:
+        ORJSONResponse: The matches, grouped by source and in alphabetical order.
+    """
+    if typeahead.due():
+        await run_in_threadpool(typeahead.refresh)
+    return ORJSONResponse({'query': q, 'suggestions': typeahead.suggest(q, source or list(SuggestSource), limit)})
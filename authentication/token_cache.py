@@ -0,0 +1,88 @@
+"""Cache of verified access tokens and the users they resolve to.
+
+An access token is reused for every request made during its lifetime, so decoding it
+and loading its user on each request repeats the same work hundreds of times. Entries
+expire with their token, or after ``TOKEN_CACHE_TTL_SECONDS`` so that changes made
+through another worker are picked up, and are dropped when their user changes.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "300"))
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """The fields of an authenticated user that request handlers rely on."""
+
+    id: int
+    username: str
+    email: str
+
+
+class TokenCache:
+    """A size-bounded LRU mapping of access tokens to their resolved user."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, CachedUser]]" = OrderedDict()
+        self._tokens_by_user: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[CachedUser]:
+        """Return the user of a cached, unexpired token, or ``None``."""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at <= time.time():
+                self._remove(token)
+                return None
+            self._entries.move_to_end(token)
+            return user
+
+    def put(self, token: str, user: CachedUser, token_expires_at: float) -> None:
+        """Cache a verified token until it expires, evicting the least recently used."""
+        expires_at = min(token_expires_at, time.time() + self.ttl)
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+            self._entries[token] = (expires_at, user)
+            self._tokens_by_user.setdefault(user.username, set()).add(token)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, username: str) -> None:
+        """Drop every cached token of a user, e.g. after the user record changed."""
+        with self._lock:
+            for token in list(self._tokens_by_user.get(username, ())):
+                self._remove(token)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, token: str) -> None:
+        _, user = self._entries.pop(token)
+        tokens = self._tokens_by_user.get(user.username)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[user.username]
+
+
+token_cache = TokenCache(TOKEN_CACHE_MAX_ENTRIES, TOKEN_CACHE_TTL_SECONDS)
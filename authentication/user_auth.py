@@ -1,30 +1,81 @@
 from passlib.context import CryptContext
 import jwt
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import os
+from database.pool_metrics import Histogram
 # Load environment variables
 load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost factor; hashes made with another cost are rehashed on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Number of bcrypt computations allowed to run at once in this worker
+PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", "2"))
+HASH_TIME_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+# bcrypt releases the GIL, so a small dedicated pool hashes in parallel without
+# competing with the request threadpool or blocking the event loop
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_CONCURRENCY, thread_name_prefix="password-hash")
+hash_queue_wait = Histogram(HASH_TIME_BUCKETS)
+hash_duration = Histogram(HASH_TIME_BUCKETS)
+_hash_pending = 0
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 def get_password_hash(password):
     return pwd_context.hash(password)
+async def _run_hashing(func, *args):
+    global _hash_pending
+    submitted = time.perf_counter()
+    def task():
+        started = time.perf_counter()
+        hash_queue_wait.observe(started - submitted)
+        try:
+            return func(*args)
+        finally:
+            hash_duration.observe(time.perf_counter() - started)
+    _hash_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, task)
+    finally:
+        _hash_pending -= 1
+async def verify_password_async(plain_password, hashed_password):
+    """Verify a password on the hashing executor.
+
+    Returns a ``(valid, new_hash)`` pair; ``new_hash`` is set when the stored hash
+    was made with another bcrypt cost and should replace it.
+    """
+    return await _run_hashing(pwd_context.verify_and_update, plain_password, hashed_password)
+async def get_password_hash_async(password):
+    return await _run_hashing(pwd_context.hash, password)
+def hashing_status():
+    return {
+        "concurrency": PASSWORD_HASH_CONCURRENCY,
+        "bcrypt_rounds": BCRYPT_ROUNDS,
+        "pending": _hash_pending,
+        "queue_wait_seconds": hash_queue_wait.snapshot(),
+        "hash_seconds": hash_duration.snapshot(),
+    }
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
-def verify_token(token: str):
+def decode_token(token: str):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+        if payload.get("sub") is None:
             return None
-        return username
+        return payload
     except jwt.PyJWTError:
-        return None
\ No newline at end of file
+        return None
+def verify_token(token: str):
+    payload = decode_token(token)
+    if payload is None:
+        return None
+    return payload["sub"]
\ No newline at end of file
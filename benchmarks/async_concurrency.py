@@ -0,0 +1,105 @@
+"""Measure request throughput of async routes on the sync and on the async database path.
+
+Two probe routes run the same owners query from an ``async def`` handler: ``/blocking``
+through the synchronous ``get_db`` session, as the async routes did before, and
+``/async`` through ``get_async_db``. A synchronous query inside an async handler blocks
+the event loop, so concurrent requests on one worker are served one at a time; the
+async session lets them overlap while they wait on the database.
+
+Keep ``--concurrency`` below the size plus overflow of the synchronous pool: with more
+concurrent clients the blocking route waits for a pooled connection on the event loop
+thread, which is also the thread that would release one, and stalls until the pool
+timeout.
+
+Usage:
+    python -m benchmarks.async_concurrency --requests 2000 --concurrency 10 --db-latency-ms 5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database.database import async_engine, engine, get_async_db, get_db
+from models import OwnerDetailsModel
+
+
+def build_probe_app(db_latency: float) -> FastAPI:
+    """Build an app exposing the owners query on both database paths.
+
+    Args:
+        db_latency: Seconds of ``pg_sleep`` added to each query, standing in for the
+            network latency to a remote database.
+    """
+    app = FastAPI()
+    query = select(OwnerDetailsModel.id, OwnerDetailsModel.owner, func.pg_sleep(db_latency)).order_by(
+        OwnerDetailsModel.id
+    ).limit(50)
+
+    @app.get('/blocking')
+    async def blocking(db: Session = Depends(get_db)) -> int:
+        return len(db.execute(query).all())
+
+    @app.get('/async')
+    async def non_blocking(db: AsyncSession = Depends(get_async_db)) -> int:
+        return len((await db.execute(query)).all())
+
+    return app
+
+
+async def drive(app: FastAPI, path: str, requests: int, concurrency: int) -> List[float]:
+    """Send ``requests`` GETs to ``path`` from ``concurrency`` concurrent clients.
+
+    Returns:
+        List[float]: Latency of each request in seconds.
+    """
+    latencies: List[float] = []
+    remaining = iter(range(requests))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+
+        async def worker() -> None:
+            for _ in remaining:
+                started = time.perf_counter()
+                response = await client.get(path)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+def report(label: str, latencies: List[float], elapsed: float) -> None:
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f'{label:<10} {len(latencies) / elapsed:>9.1f} req/s   '
+        f'p50 {quantiles[49] * 1000:>7.1f} ms   p95 {quantiles[94] * 1000:>7.1f} ms'
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--db-latency-ms', type=float, default=5.0)
+    args = parser.parse_args()
+
+    app = build_probe_app(args.db_latency_ms / 1000)
+    for label, path in (('before', '/blocking'), ('after', '/async')):
+        await drive(app, path, args.concurrency, args.concurrency)
+        started = time.perf_counter()
+        latencies = await drive(app, path, args.requests, args.concurrency)
+        report(label, latencies, time.perf_counter() - started)
+
+    await async_engine.dispose()
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
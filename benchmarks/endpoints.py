@@ -0,0 +1,252 @@
+"""Measure latency and throughput of the main API endpoints on a synthetic dataset.
+
+Seeds a scratch schema with synthetic assessments, owners and approval sections,
+points both application engines at it through ``schema_translate_map`` and drives the
+application in-process with concurrent clients:
+
+==================  ==============================================================
+token               ``POST /token``
+list                ``GET /assessments`` first page
+filter              ``GET /assessments`` filtered by municipality and barangay
+deep-offset         ``GET /assessments`` page at ``--deep-offset`` using ``skip``
+deep-cursor         the same page reached with a keyset ``cursor``
+add                 ``POST /assessment/add/`` with a unique owner per request
+owners              ``GET /assessment/owners/``
+summary             ``GET /assessments/summary`` grouped by municipality and classification
+==================  ==============================================================
+
+Each scenario reports requests per second and p50/p95/p99 latency. ``--save`` writes
+the results as JSON; ``--baseline`` compares a run against saved results and, with
+``--max-regression``, exits non-zero when a scenario's p95 grew by more than that
+percentage. Keep ``--concurrency`` below the size plus overflow of the database pools.
+
+The scratch tables carry the indexes declared on the models only; the indexes added by
+``models/migrations`` are compared separately by ``benchmarks.search_index_plans``.
+
+Usage:
+    python -m benchmarks.endpoints --rows 300000 --owners 20000 --save before.json
+    python -m benchmarks.endpoints --reuse --baseline before.json --max-regression 20
+"""
+import argparse
+import asyncio
+import importlib
+import itertools
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+import orjson
+from sqlalchemy import text
+
+from api.pagination import encode_cursor
+from benchmarks.synthetic import (
+    BARANGAYS,
+    MUNICIPALITIES,
+    assessment_request,
+    create_schema,
+    seed_assessments,
+    seed_owners,
+)
+from database.database import SessionLocal, async_engine, engine
+from services.assessment_rollup import rebuild_rollup
+
+BENCH_USER = {'username': 'bench', 'email': 'bench@example.com', 'password': 'bench-password'}
+
+# A scenario builds the keyword arguments of one ``httpx.AsyncClient.request`` call
+Scenario = Tuple[str, str, Callable[[int], dict]]
+
+
+def prepare_database(schema: str, rows: int, owners: int, reuse: bool) -> None:
+    """Seed ``schema`` unless reused, and route both application engines to it."""
+    if not reuse:
+        with engine.begin() as connection:
+            create_schema(connection, schema)
+            seed_assessments(connection, schema, rows)
+            seed_owners(connection, schema, owners)
+    translate = {'schema_translate_map': {'Assessor2025': schema}}
+    engine.update_execution_options(**translate)
+    async_engine.sync_engine.update_execution_options(**translate)
+    if not reuse:
+        db = SessionLocal()
+        try:
+            rebuild_rollup(db)
+        finally:
+            db.close()
+
+
+def deep_cursor(schema: str, offset: int) -> str:
+    """Return the ``sort=tdn`` cursor that resumes after the first ``offset`` rows."""
+    with engine.connect() as connection:
+        tdn = connection.execute(
+            text(f'SELECT tdn FROM "{schema}".property_assessment_clean ORDER BY tdn OFFSET :offset LIMIT 1'),
+            {'offset': offset - 1},
+        ).scalar_one()
+    return encode_cursor('tdn', [tdn])
+
+
+def build_scenarios(headers: Dict[str, str], cursor: str, deep_offset: int, page_size: int) -> List[Scenario]:
+    token_form = {'username': BENCH_USER['username'], 'password': BENCH_USER['password']}
+    serials = itertools.count(int(time.time() * 1000))
+    page = {'limit': page_size, 'count': 'estimated'}
+    return [
+        ('token', 'POST', lambda i: {'url': '/token', 'data': token_form}),
+        ('list', 'GET', lambda i: {'url': '/assessments', 'params': page, 'headers': headers}),
+        ('filter', 'GET', lambda i: {
+            'url': '/assessments',
+            'params': {
+                **page,
+                'municipality': MUNICIPALITIES[i % len(MUNICIPALITIES)],
+                'barangay': BARANGAYS[i % len(BARANGAYS)],
+            },
+            'headers': headers,
+        }),
+        ('deep-offset', 'GET', lambda i: {
+            'url': '/assessments', 'params': {**page, 'skip': deep_offset}, 'headers': headers,
+        }),
+        ('deep-cursor', 'GET', lambda i: {
+            'url': '/assessments', 'params': {**page, 'cursor': cursor}, 'headers': headers,
+        }),
+        ('add', 'POST', lambda i: {
+            'url': '/assessment/add/', 'json': assessment_request(next(serials)), 'headers': headers,
+        }),
+        ('owners', 'GET', lambda i: {'url': '/assessment/owners/', 'headers': headers}),
+        ('summary', 'GET', lambda i: {
+            'url': '/assessments/summary',
+            'params': {'group_by': ['mun_code', 'classification']},
+            'headers': headers,
+        }),
+    ]
+
+
+async def drive(client: httpx.AsyncClient, method: str, build: Callable[[int], dict],
+                requests: int, concurrency: int) -> Tuple[List[float], int]:
+    """Send ``requests`` requests from ``concurrency`` concurrent clients.
+
+    Returns:
+        Tuple[List[float], int]: Latency of each successful request in seconds, and
+        the number of requests that failed.
+    """
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in remaining:
+            started = time.perf_counter()
+            response = await client.request(method, **build(i))
+            elapsed = time.perf_counter() - started
+            if response.is_success:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, float]:
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': len(latencies) + errors,
+        'errors': errors,
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': quantiles[49] * 1000 if quantiles else float('nan'),
+        'p95_ms': quantiles[94] * 1000 if quantiles else float('nan'),
+        'p99_ms': quantiles[98] * 1000 if quantiles else float('nan'),
+    }
+
+
+def change(current: float, previous: Optional[float]) -> str:
+    if not previous:
+        return ''
+    return f' ({(current - previous) / previous * 100:+.0f}%)'
+
+
+def report(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]]) -> None:
+    print(f"{'scenario':<12} {'requests':>8} {'errors':>6} {'req/s':>16} {'p50 ms':>16} {'p95 ms':>16} {'p99 ms':>16}")
+    for name, result in results.items():
+        before = baseline.get(name, {})
+        print(
+            f"{name:<12} {result['requests']:>8} {result['errors']:>6} "
+            + ' '.join(
+                f"{result[key]:>9.1f}{change(result[key], before.get(key)):<7}"
+                for key in ('rps', 'p50_ms', 'p95_ms', 'p99_ms')
+            )
+        )
+
+
+def regressions(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+                max_regression: float) -> List[str]:
+    slower = []
+    for name, result in results.items():
+        previous = baseline.get(name, {}).get('p95_ms')
+        if previous and (result['p95_ms'] - previous) / previous * 100 > max_regression:
+            slower.append(name)
+    return slower
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    prepare_database(args.schema, args.rows, args.owners, args.reuse)
+    # Imported once the engines point at the scratch schema, so that the startup
+    # create_all of main.py runs against it
+    app = importlib.import_module('main').app
+
+    transport = httpx.ASGITransport(app=app)
+    results: Dict[str, Dict[str, float]] = {}
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+        await client.post('/register', json=BENCH_USER)
+        credentials = {'username': BENCH_USER['username'], 'password': BENCH_USER['password']}
+        token = await client.post('/token', data=credentials)
+        token.raise_for_status()
+        headers = {'Authorization': f"Bearer {token.json()['access_token']}"}
+        scenarios = build_scenarios(headers, deep_cursor(args.schema, args.deep_offset), args.deep_offset, args.limit)
+        selected = [scenario for scenario in scenarios if not args.only or scenario[0] in args.only]
+        for name, method, build in selected:
+            await drive(client, method, build, args.concurrency, args.concurrency)
+            started = time.perf_counter()
+            latencies, errors = await drive(client, method, build, args.requests, args.concurrency)
+            results[name] = summarize(latencies, errors, time.perf_counter() - started)
+
+    await async_engine.dispose()
+    engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=300000, help='synthetic assessments to seed')
+    parser.add_argument('--owners', type=int, default=20000, help='synthetic owners, each with an approval section')
+    parser.add_argument('--schema', default='bench_endpoints', help='scratch schema, dropped and recreated')
+    parser.add_argument('--reuse', action='store_true', help='keep the data seeded by a previous run')
+    parser.add_argument('--requests', type=int, default=500, help='requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--limit', type=int, default=100, help='page size of the list scenarios')
+    parser.add_argument('--deep-offset', type=int, default=250000)
+    parser.add_argument('--only', nargs='+', help='run only these scenarios')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare against results saved with --save')
+    parser.add_argument('--max-regression', type=float, help='fail when a p95 grew by more than this percentage')
+    args = parser.parse_args()
+    args.deep_offset = min(args.deep_offset, args.rows)
+
+    results = asyncio.run(run(args))
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, 'rb') as f:
+            baseline = orjson.loads(f.read())
+    report(results, baseline)
+    if args.save:
+        with open(args.save, 'wb') as f:
+            f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+    if baseline and args.max_regression is not None:
+        slower = regressions(results, baseline, args.max_regression)
+        if slower:
+            print(f"p95 regressed by more than {args.max_regression:g}%: {', '.join(slower)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Compare query plans of the assessment filters before and after the search indexes.
+
+Seeds a scratch schema with synthetic assessments, runs ``EXPLAIN ANALYZE`` for the
+count and first-page queries of ``GET /assessments`` with each kind of filter, creates
+the indexes of the ``add_assessment_search_indexes`` migration and runs them again.
+
+Usage:
+    python -m benchmarks.search_index_plans --rows 300000
+"""
+import argparse
+import re
+from typing import Dict, List, Tuple
+
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.engine import Connection
+
+from api.property_assessment_api import AssessmentFilterParams
+from benchmarks.synthetic import create_schema, seed_assessments
+from database.database import SQLALCHEMY_DATABASE_URL
+from models.migrations.add_assessment_search_indexes import index_statements
+from models.property_assessment_model import PropertyAssessmentClean
+
+CASES: Dict[str, dict] = {
+    'municipality substring': {'municipality': 'NIEVES'},
+    'barangay substring': {'barangay': 'TAGCAT'},
+    'classification substring': {'classification': 'COMMER'},
+    'general revision substring': {'gr': '5TH'},
+    'municipality + barangay': {'municipality': 'CARMEN', 'barangay': 'POBLACION'},
+    'mun_code exact': {'mun_code': 'M04'},
+    'barangay_code exact': {'barangay_code': 'M04-B012'},
+}
+
+
+def case_statements(filters: dict) -> List[Tuple[str, object]]:
+    params = AssessmentFilterParams(**{
+        'municipality': None, 'barangay': None, 'classification': None,
+        'gr': None, 'mun_code': None, 'barangay_code': None, **filters,
+    })
+    clauses = params.clauses()
+    table = PropertyAssessmentClean
+    return [
+        ('count', select(func.count()).select_from(table).where(*clauses)),
+        ('page', select(table).where(*clauses).order_by(table.tdn).limit(100)),
+    ]
+
+
+def explain(connection: Connection, statement, schema: str) -> Tuple[float, str]:
+    sql = str(statement.compile(
+        dialect=connection.dialect,
+        compile_kwargs={'literal_binds': True},
+        schema_translate_map={'Assessor2025': schema},
+        render_schema_translate=True,
+    ))
+    plan = '\n'.join(row[0] for row in connection.exec_driver_sql(f'EXPLAIN (ANALYZE, BUFFERS) {sql}'))
+    match = re.search(r'Execution Time: ([\d.]+) ms', plan)
+    return (float(match.group(1)) if match else float('nan')), plan
+
+
+def run_cases(connection: Connection, schema: str, label: str, verbose: bool) -> Dict[Tuple[str, str], float]:
+    timings = {}
+    for name, filters in CASES.items():
+        for kind, statement in case_statements(filters):
+            elapsed, plan = explain(connection, statement, schema)
+            timings[(name, kind)] = elapsed
+            if verbose:
+                print(f'--- {label}: {name} ({kind})\n{plan}\n')
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=300000)
+    parser.add_argument('--schema', default='bench_search')
+    parser.add_argument('--database-url', default=SQLALCHEMY_DATABASE_URL)
+    parser.add_argument('--keep', action='store_true', help='keep the scratch schema afterwards')
+    parser.add_argument('--quiet', action='store_true', help='print only the timing summary')
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    with engine.begin() as connection:
+        create_schema(connection, args.schema)
+        seed_assessments(connection, args.schema, args.rows)
+
+    with engine.begin() as connection:
+        before = run_cases(connection, args.schema, 'before', not args.quiet)
+        for statement in index_statements(args.schema):
+            connection.execute(text(statement))
+        connection.execute(text(f'ANALYZE "{args.schema}".property_assessment_clean'))
+        after = run_cases(connection, args.schema, 'after', not args.quiet)
+
+    print(f'{"case":<32} {"query":<6} {"before ms":>10} {"after ms":>10} {"speedup":>8}')
+    for (name, kind), elapsed in before.items():
+        indexed = after[(name, kind)]
+        print(f'{name:<32} {kind:<6} {elapsed:>10.2f} {indexed:>10.2f} {elapsed / indexed:>7.1f}x')
+
+    if not args.keep:
+        with engine.begin() as connection:
+            connection.execute(text(f'DROP SCHEMA IF EXISTS "{args.schema}" CASCADE'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+"""Synthetic data for the benchmarks of the Real Property Tax Assessment System.
+
+Rows are generated server-side with ``generate_series`` so that seeding a few hundred
+thousand assessments takes seconds rather than minutes of client-side inserts.
+"""
+from typing import Any, Dict
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from database.database import Base
+# Registers every table on Base.metadata for create_schema
+from models import (  # noqa: F401
+    ApprovalSectionModel,
+    OwnerDetailsModel,
+    assessment_rollup_model,
+    property_assessment_model,
+    table_version_model,
+    user_model,
+)
+
+MUNICIPALITIES = (
+    'BUENAVISTA', 'CARMEN', 'JABONGA', 'KITCHARAO', 'LAS NIEVES', 'MAGALLANES',
+    'NASIPIT', 'REMEDIOS T. ROMUALDEZ', 'SANTIAGO', 'TUBAY', 'CABADBARAN CITY',
+)
+BARANGAYS = (
+    'POBLACION', 'BAYABAS', 'TAGCATONG', 'SAN ISIDRO', 'SANTA ANA', 'MAHAYAHAY',
+    'CAASINAN', 'CALAMBA', 'LIBERTAD', 'MABINI', 'RIZAL', 'SAN VICENTE',
+    'SANTO NINO', 'TAGUIBO', 'TOLOSA', 'VILLA KANANGA', 'AMONTAY', 'BALANGBALANG',
+    'CAHAYAGAN', 'DOMBOY', 'GAMAY', 'HINAPUYAN', 'LUMBOCAN', 'MANAPA',
+    'PUTING BATO', 'SANGAY', 'TAGAYTAY', 'TAGUNAY', 'UNION', 'VILLANUEVA',
+)
+CLASSIFICATIONS = ('RESIDENTIAL', 'AGRICULTURAL', 'COMMERCIAL', 'INDUSTRIAL', 'TIMBERLAND')
+ASSESSMENT_LEVELS = (20, 40, 50, 50, 20)
+REVISIONS = ('5TH GENERAL REVISION', '6TH GENERAL REVISION')
+
+
+def _sql_array(values: tuple) -> str:
+    quoted = ', '.join("'" + str(value).replace("'", "''") + "'" for value in values)
+    return f'ARRAY[{quoted}]'
+
+
+def _tdn_sql(serial: str) -> str:
+    """SQL expression for the TDN of the ``serial``-th synthetic assessment."""
+    municipality = f'1 + {serial} % {len(MUNICIPALITIES)}'
+    barangay = f'1 + ({serial} / {len(MUNICIPALITIES)}) % {len(BARANGAYS)}'
+    return (
+        f"format('%s-%s-%s', lpad(({municipality})::text, 2, '0'), "
+        f"lpad(({barangay})::text, 3, '0'), lpad({serial}::text, 6, '0'))"
+    )
+
+
+def create_schema(connection: Connection, schema: str) -> Connection:
+    """(Re)create ``schema`` with every model table, translated from ``Assessor2025``.
+
+    Args:
+        connection: Connection to a PostgreSQL database.
+        schema: Scratch schema for the benchmark.
+
+    Returns:
+        Connection: ``connection`` with the schema translation applied, for use with
+        ORM statements against the scratch tables.
+    """
+    connection.execute(text(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE'))
+    connection.execute(text(f'CREATE SCHEMA "{schema}"'))
+    translated = connection.execution_options(schema_translate_map={'Assessor2025': schema})
+    Base.metadata.create_all(translated)
+    return translated
+
+
+def seed_assessments(connection: Connection, schema: str, rows: int) -> None:
+    """Insert ``rows`` synthetic assessments into ``schema``.property_assessment_clean.
+
+    Municipalities, barangays and classifications repeat with realistic cardinality,
+    market values are spread between 50,000 and 5,000,000, and assessed values follow
+    the classification's assessment level.
+
+    Args:
+        connection: Connection to a PostgreSQL database.
+        schema: Schema holding the table.
+        rows: Number of rows to generate.
+    """
+    municipality_count = len(MUNICIPALITIES)
+    barangay_count = len(BARANGAYS)
+    levels = ', '.join(str(level) for level in ASSESSMENT_LEVELS)
+    connection.execute(text(f'''
+        INSERT INTO "{schema}".property_assessment_clean (
+            tdn, market_val, ass_value, sub_class, eff_date, classification, ass_level,
+            area, taxability, gr_code, gr, mun_code, municipality, barangay_code, barangay
+        )
+        SELECT
+            {_tdn_sql('g')},
+            market_val,
+            round(market_val * level / 100, 2),
+            classification,
+            DATE '2019-01-01' + (g % 2000),
+            classification,
+            level,
+            round((20 + random() * 2000)::numeric, 2),
+            CASE WHEN g % 17 = 0 THEN 'EXEMPT' ELSE 'TAXABLE' END,
+            'GR' || (5 + g % 2),
+            ({_sql_array(REVISIONS)})[1 + g % 2],
+            'M' || lpad(mun::text, 2, '0'),
+            ({_sql_array(MUNICIPALITIES)})[mun],
+            'M' || lpad(mun::text, 2, '0') || '-B' || lpad(brgy::text, 3, '0'),
+            ({_sql_array(BARANGAYS)})[brgy]
+        FROM (
+            SELECT
+                g,
+                1 + g % {municipality_count} AS mun,
+                1 + (g / {municipality_count}) % {barangay_count} AS brgy,
+                ({_sql_array(CLASSIFICATIONS)})[1 + (g / 7) % {len(CLASSIFICATIONS)}] AS classification,
+                (ARRAY[{levels}])[1 + (g / 7) % {len(CLASSIFICATIONS)}] AS level,
+                round((50000 + random() * 4950000)::numeric, 2) AS market_val
+            FROM generate_series(1, :rows) AS g
+        ) AS seed
+    '''), {'rows': rows})
+    connection.execute(text(f'ANALYZE "{schema}".property_assessment_clean'))
+
+
+def seed_owners(connection: Connection, schema: str, rows: int) -> None:
+    """Insert ``rows`` synthetic owners, each with one approval section, into ``schema``.
+
+    The n-th owner declares the TDN of the n-th assessment generated by
+    :func:`seed_assessments`, and its approval section references that TDN.
+
+    Args:
+        connection: Connection to a PostgreSQL database.
+        schema: Schema holding the tables.
+        rows: Number of owners to generate.
+    """
+    connection.execute(text(f'''
+        INSERT INTO "{schema}".owner_details (
+            owner, owner_address, admin_ben_user, transaction_code, pin, tin, tel_no, td
+        )
+        SELECT
+            format('OWNER %s', lpad(g::text, 7, '0')),
+            format('PUROK %s, %s', 1 + g % 9, ({_sql_array(BARANGAYS)})[1 + g % {len(BARANGAYS)}]),
+            CASE WHEN g % 11 = 0 THEN format('ADMIN %s', g) END,
+            ({_sql_array(('TR', 'GR', 'SD', 'DC'))})[1 + g % 4],
+            format('160-%s-%s', lpad((g % 1000)::text, 3, '0'), lpad(g::text, 7, '0')),
+            format('%s-%s', lpad((g % 1000)::text, 3, '0'), lpad(g::text, 9, '0')),
+            format('09%s', lpad((g * 7919 % 1000000000)::text, 9, '0')),
+            {_tdn_sql('g')}
+        FROM generate_series(1, :rows) AS g
+    '''), {'rows': rows})
+    connection.execute(text(f'''
+        INSERT INTO "{schema}".approval_sections (
+            owner_id, tdn, appraised_by, appraised_date, recommending_approval,
+            municipality_assessor_date, approved_by_province, provincial_assessor_date
+        )
+        SELECT
+            id, td, 'APPRAISER ' || (1 + id % 25), DATE '2024-01-01' + (id % 500),
+            'MUNICIPAL ASSESSOR ' || (1 + id % 11), DATE '2024-01-08' + (id % 500),
+            'PROVINCIAL ASSESSOR', DATE '2024-01-15' + (id % 500)
+        FROM "{schema}".owner_details
+    '''))
+    connection.execute(text(f'ANALYZE "{schema}".owner_details'))
+    connection.execute(text(f'ANALYZE "{schema}".approval_sections'))
+
+
+def assessment_request(serial: int) -> Dict[str, Any]:
+    """Build a complete ``POST /assessment/add/`` payload with unique PIN, TIN and TDN.
+
+    Args:
+        serial: Distinguishes the payload from every other one built in the same run.
+
+    Returns:
+        Dict[str, Any]: JSON body of a ``CompleteAssessmentRequest``.
+    """
+    municipality = MUNICIPALITIES[serial % len(MUNICIPALITIES)]
+    barangay = BARANGAYS[serial % len(BARANGAYS)]
+    return {
+        'approvalSection': {
+            'appraisedBy': 'APPRAISER 1', 'appraisedDate': '2025-05-28',
+            'recommendingApproval': 'MUNICIPAL ASSESSOR 1', 'municipalityAssessorDate': '2025-05-30',
+            'approvedByProvince': 'PROVINCIAL ASSESSOR', 'provincialAssessorDate': '2025-05-30',
+        },
+        'street': '',
+        'ownerDetails': {
+            'owner': f'BENCH OWNER {serial}', 'ownerAddress': f'{barangay}, {municipality}',
+            'admin_ben_user': '', 'transactionCode': 'TR', 'pin': f'BENCH-PIN-{serial}',
+            'tin': f'BENCH-TIN-{serial}', 'telNo': '', 'td': f'BENCH-TD-{serial}',
+        },
+        'landReference': {
+            'land_owner': '', 'block_no': '', 'tdn_no': '', 'pin': '', 'lot_no': '', 'survey_no': '', 'area': '',
+        },
+        'buildingLocation': {
+            'address_municipality': municipality, 'address_barangay': barangay,
+            'street': '', 'address_province': 'AGUSAN DEL NORTE',
+        },
+        'address_municipality': municipality,
+        'address_barangay': barangay,
+        'address_province': 'AGUSAN DEL NORTE',
+        'generalDescription': {'total_floor_area': 92, 'kind_of_bldg': 'IV-B', 'unitValue': 4820},
+        'propertyAppraisal': {
+            'buildingType': 'IV-B', 'totalArea': 92, 'unitValue': 4820, 'smv': 1,
+            'baseMarketValue': 443440, 'depreciation': 53212.8, 'marketValue': 390227.2,
+        },
+        'additionalItems': {
+            'items': [{
+                'id': 1, 'label': 'Carport', 'value': {'label': 'Carport', 'percentage': 0.3},
+                'quantity': 16, 'amount': 23136,
+            }],
+            'total': 23136,
+            'subTotal': 23136,
+        },
+        'propertyAssessment': {
+            'assessmentLevel': 35, 'assessmentValue': 144677.12, 'totalArea': 92, 'marketValue': 413363.2,
+            'buildingCategory': 'commercial', 'effectivityOfAssessment': {'quarter': ''}, 'items': [],
+        },
+        'assessmentValue': 144677.12,
+        'buildingCategory': 'commercial',
+        'taxableValue': ['on'],
+        'effectivityOfAssessment': '2025',
+        'assessmentLevel': 35,
+        'memoranda': [],
+        'recordOfSupersededAssessment': {'records': []},
+    }
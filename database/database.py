@@ -1,16 +1,71 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 import os
 
+from database.diagnostics import install_diagnostics
+from database.pool_metrics import TimedAsyncAdaptedQueuePool, TimedQueuePool
+from database.query_stats import install_query_timing
+
 load_dotenv()
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
+# The async engine talks to the same database through asyncpg unless a separate URL is given
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or make_url(SQLALCHEMY_DATABASE_URL).set(
+    drivername="postgresql+asyncpg"
+)
+
+# Pool sizing applies to each engine of each worker process
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() in ("1", "true", "yes")
+# Per-statement timeout in milliseconds, 0 disables it
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+# Slow-query log and N+1 detector, see database/diagnostics.py for its settings
+DB_DIAGNOSTICS = os.getenv("DB_DIAGNOSTICS", "false").lower() in ("1", "true", "yes")
+
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
+sync_connect_args = {}
+async_connect_args = {}
+if DB_STATEMENT_TIMEOUT_MS:
+    sync_connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+    async_connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    poolclass=TimedQueuePool,
+    connect_args=sync_connect_args,
+    **POOL_OPTIONS,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=TimedAsyncAdaptedQueuePool,
+    connect_args=async_connect_args,
+    **POOL_OPTIONS,
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Attribute statement time to the request being served, see api/metrics.py
+install_query_timing(engine)
+install_query_timing(async_engine.sync_engine)
+if DB_DIAGNOSTICS:
+    install_diagnostics(engine)
+    install_diagnostics(async_engine.sync_engine)
+
 Base = declarative_base()
 
 def get_db():
@@ -18,4 +73,8 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
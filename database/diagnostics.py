@@ -0,0 +1,176 @@
+"""Opt-in statement diagnostics: a slow-query log and a repeated-statement (N+1) detector.
+
+Enabled for the application engines with ``DB_DIAGNOSTICS=true``. Statements slower than
+``DB_SLOW_QUERY_MS`` are logged with their parameters and the plan PostgreSQL chooses
+for them. Statements sharing the same SQL text are counted per request, in the
+:class:`~database.query_stats.QueryStats` installed by the metrics middleware; once one
+shape runs more than ``DB_REPEATED_STATEMENT_LIMIT`` times the request is flagged with a
+warning, or fails with :class:`RepeatedStatementError` when ``DB_DIAGNOSTICS_RAISE`` is
+set. A lazy-loaded relationship read in a loop, such as
+``OwnerDetailsModel.approval_sections``, shows up this way.
+
+Tests can turn the detector on around a block with :func:`detect_repeated_statements`.
+"""
+import logging
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from typing import Iterator, Optional, Sequence
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from database.query_stats import QueryStats, current_query_stats
+
+logger = logging.getLogger(__name__)
+
+EXPLAINABLE = ('select', 'insert', 'update', 'delete', 'with')
+MAX_LOGGED_PARAMETERS = 2000
+
+
+class RepeatedStatementError(RuntimeError):
+    """Raised when one statement shape runs more often than allowed in a single request."""
+
+    def __init__(self, statement: str, count: int, limit: int):
+        super().__init__(f'Statement executed {count} times in one request (limit {limit}): {statement}')
+        self.statement = statement
+        self.count = count
+        self.limit = limit
+
+
+@dataclass
+class DiagnosticsSettings:
+    slow_query_ms: float
+    repeated_statement_limit: int
+    raise_on_repeated: bool
+
+
+settings = DiagnosticsSettings(
+    slow_query_ms=float(os.getenv('DB_SLOW_QUERY_MS', '200')),
+    repeated_statement_limit=int(os.getenv('DB_REPEATED_STATEMENT_LIMIT', '10')),
+    raise_on_repeated=os.getenv('DB_DIAGNOSTICS_RAISE', 'false').lower() in ('1', 'true', 'yes'),
+)
+
+
+def _explain(conn, statement: str, parameters) -> str:
+    """Return the plan of ``statement`` from a fresh cursor on the same DBAPI connection.
+
+    The ``EXPLAIN`` runs inside a savepoint so that a failure cannot abort the
+    transaction the statement belongs to.
+    """
+    explain_cursor = conn.connection.cursor()
+    try:
+        explain_cursor.execute('SAVEPOINT diagnostics_explain')
+        try:
+            explain_cursor.execute(f'EXPLAIN {statement}', parameters)
+            plan = '\n'.join(row[0] for row in explain_cursor.fetchall())
+        except Exception as e:
+            explain_cursor.execute('ROLLBACK TO SAVEPOINT diagnostics_explain')
+            plan = f'EXPLAIN failed: {e}'
+        explain_cursor.execute('RELEASE SAVEPOINT diagnostics_explain')
+        return plan
+    finally:
+        explain_cursor.close()
+
+
+def _log_slow_statement(conn, statement: str, parameters, elapsed_ms: float, executemany: bool) -> None:
+    plan = None
+    if not executemany and conn.dialect.name == 'postgresql' and statement.lstrip().lower().startswith(EXPLAINABLE):
+        plan = _explain(conn, statement, parameters)
+    logger.warning(
+        'Slow statement (%.1f ms): %s\nParameters: %.*s%s',
+        elapsed_ms, statement, MAX_LOGGED_PARAMETERS, repr(parameters),
+        f'\nPlan:\n{plan}' if plan else '',
+    )
+
+
+def _count_shape(stats: QueryStats, statement: str) -> None:
+    stats.shapes[statement] += 1
+    count = stats.shapes[statement]
+    limit = settings.repeated_statement_limit
+    if count != limit + 1:
+        return
+    if settings.raise_on_repeated:
+        raise RepeatedStatementError(statement, count, limit)
+    logger.warning('Statement executed more than %d times in one request, likely N+1: %s', limit, statement)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._diagnostics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_diagnostics_started', None)
+    if started is not None:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms >= settings.slow_query_ms:
+            _log_slow_statement(conn, statement, parameters, elapsed_ms, executemany)
+    stats = current_query_stats.get()
+    if stats is not None:
+        _count_shape(stats, statement)
+
+
+def diagnostics_installed(engine: Engine) -> bool:
+    return event.contains(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def install_diagnostics(engine: Engine) -> None:
+    """Log slow statements and count repeated ones on ``engine``.
+
+    Args:
+        engine: A sync engine, or the ``sync_engine`` of an async engine.
+    """
+    if diagnostics_installed(engine):
+        return
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def uninstall_diagnostics(engine: Engine) -> None:
+    if not diagnostics_installed(engine):
+        return
+    event.remove(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.remove(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+@contextmanager
+def detect_repeated_statements(
+    limit: Optional[int] = None,
+    engines: Optional[Sequence[Engine]] = None,
+) -> Iterator[QueryStats]:
+    """Fail any request that repeats a statement shape more than ``limit`` times.
+
+    Meant for tests: requests served inside the block raise
+    :class:`RepeatedStatementError`, which the test client re-raises. Statements run
+    directly in the block are counted in the yielded :class:`QueryStats`. Settings are
+    process-wide, so blocks must not run concurrently.
+
+    Args:
+        limit: Allowed executions of one shape, defaults to ``DB_REPEATED_STATEMENT_LIMIT``.
+        engines: Engines to watch, defaults to both application engines.
+
+    Yields:
+        QueryStats: Statements executed in the block outside of a request.
+    """
+    if engines is None:
+        from database.database import async_engine, engine
+        engines = [engine, async_engine.sync_engine]
+    installed = [e for e in engines if not diagnostics_installed(e)]
+    for e in installed:
+        install_diagnostics(e)
+    previous = replace(settings)
+    settings.raise_on_repeated = True
+    if limit is not None:
+        settings.repeated_statement_limit = limit
+    stats = QueryStats()
+    token = current_query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_query_stats.reset(token)
+        settings.repeated_statement_limit = previous.repeated_statement_limit
+        settings.raise_on_repeated = previous.raise_on_repeated
+        for e in installed:
+            uninstall_diagnostics(e)
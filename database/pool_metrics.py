@@ -0,0 +1,97 @@
+"""Connection pool instrumentation for the database engines.
+
+The pools below time every checkout, including the time spent waiting for a free
+connection when the pool is exhausted, so the pool can be sized against the number of
+workers from live data.
+"""
+import threading
+import time
+from typing import Dict, List, Sequence
+
+from sqlalchemy import exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+CHECKOUT_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """A thread-safe histogram with fixed upper bucket bounds."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """Record one observation."""
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> Dict:
+        """Return cumulative bucket counts keyed by upper bound, with the sum and count."""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative: List[int] = []
+        running = 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+        return {'buckets': dict(zip(bounds, cumulative)), 'sum': total, 'count': running}
+
+
+class _CheckoutTimingMixin:
+    """Record the duration of each checkout and the number of checkout timeouts."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_wait = Histogram(CHECKOUT_WAIT_BUCKETS)
+        self.checkout_timeouts = 0
+        self._timeouts_lock = threading.Lock()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self._timeouts_lock:
+                self.checkout_timeouts += 1
+            raise
+        finally:
+            self.checkout_wait.observe(time.perf_counter() - started)
+
+
+class TimedQueuePool(_CheckoutTimingMixin, QueuePool):
+    """``QueuePool`` recording checkout wait times."""
+
+
+class TimedAsyncAdaptedQueuePool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    """``AsyncAdaptedQueuePool`` recording checkout wait times."""
+
+
+def pool_status(engine: Engine) -> Dict:
+    """Return live statistics of an engine's connection pool.
+
+    Args:
+        engine: A sync engine, or the ``sync_engine`` of an async engine.
+
+    Returns:
+        Dict: Pool size and occupancy, checkout timeouts and the checkout wait histogram.
+    """
+    pool = engine.pool
+    status = {
+        'size': pool.size(),
+        'max_overflow': pool._max_overflow,
+        'checked_in': pool.checkedin(),
+        'checked_out': pool.checkedout(),
+        'overflow': max(pool.overflow(), 0),
+    }
+    if isinstance(pool, _CheckoutTimingMixin):
+        status['checkout_timeouts'] = pool.checkout_timeouts
+        status['checkout_wait_seconds'] = pool.checkout_wait.snapshot()
+    return status
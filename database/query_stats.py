@@ -0,0 +1,51 @@
+"""Per-request accounting of database statements.
+
+The request middleware installs a :class:`QueryStats` in ``current_query_stats``; the
+cursor hooks below add the duration of every statement executed while handling that
+request, on either engine and from either the event loop or the threadpool.
+"""
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+@dataclass
+class QueryStats:
+    """Database work done on behalf of one request."""
+
+    statements: int = 0
+    seconds: float = 0.0
+    # Executions per statement text, filled in when diagnostics are on (database/diagnostics.py)
+    shapes: Counter = field(default_factory=Counter)
+
+
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar('current_query_stats', default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_query_stats.get()
+    started = getattr(context, '_query_started', None)
+    if stats is None or started is None:
+        return
+    stats.statements += 1
+    stats.seconds += time.perf_counter() - started
+
+
+def install_query_timing(engine: Engine) -> None:
+    """Time every statement executed through ``engine``.
+
+    Args:
+        engine: A sync engine, or the ``sync_engine`` of an async engine.
+    """
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
@@ -0,0 +1,127 @@
+"""Helpers for reading and bumping per-table change versions."""
+import os
+from typing import Iterable, Optional, Set
+
+from sqlalchemy import String, bindparam, delete, func, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models.table_version_model import TableChange, TableVersion
+
+# Versions of changed keys kept per table; older changes are pruned every
+# CHANGE_PRUNE_INTERVAL versions and copies that far behind reload instead
+CHANGE_LOG_RETENTION = int(os.getenv('CHANGE_LOG_RETENTION', '1000'))
+CHANGE_PRUNE_INTERVAL = 100
+# Logged for a version that changed no rows, so that it is not mistaken for one
+# whose keys are unknown; never a valid primary key
+NO_ROW_CHANGES = ''
+
+
+def _version_query(table_name: str):
+    return select(TableVersion.version).where(TableVersion.table_name == table_name)
+
+
+def _bump_statement(table_name: str):
+    statement = insert(TableVersion).values(table_name=table_name, version=1)
+    return statement.on_conflict_do_update(
+        index_elements=[TableVersion.table_name],
+        set_={'version': TableVersion.version + 1},
+    ).returning(TableVersion.version)
+
+
+def _log_statement(table_name: str, version: int, keys: Iterable[str]):
+    keys = list(dict.fromkeys(keys)) or [NO_ROW_CHANGES]
+    unnested = func.unnest(bindparam('keys', keys, type_=ARRAY(String)))
+    return insert(TableChange).from_select(
+        ['table_name', 'version', 'key'],
+        select(literal(table_name), literal(version), unnested),
+    )
+
+
+def _prune_statement(table_name: str, version: int):
+    return delete(TableChange).where(
+        TableChange.table_name == table_name,
+        TableChange.version <= version - CHANGE_LOG_RETENTION,
+    )
+
+
+def get_table_version(db: Session, table_name: str) -> int:
+    """Return the current change version of a table.
+
+    Args:
+        db: Database session.
+        table_name: Name of the versioned table.
+
+    Returns:
+        int: The version, or 0 if the table has never been written through the API.
+    """
+    return db.execute(_version_query(table_name)).scalar() or 0
+
+
+async def get_table_version_async(db: AsyncSession, table_name: str) -> int:
+    """Async counterpart of :func:`get_table_version`."""
+    return (await db.execute(_version_query(table_name))).scalar() or 0
+
+
+def bump_table_version(db: Session, table_name: str, keys: Optional[Iterable[str]] = None) -> int:
+    """Increment the change version of a table in the current transaction.
+
+    Args:
+        db: Database session holding the write being versioned.
+        table_name: Name of the modified table.
+        keys: Primary keys of every row the write inserted, updated or deleted, to
+            record in table_changes. Leave out when they are not known, pass an empty
+            list when the version changed no rows.
+
+    Returns:
+        int: The new version.
+    """
+    version = db.execute(_bump_statement(table_name)).scalar_one()
+    if keys is not None:
+        db.execute(_log_statement(table_name, version, keys))
+        if version % CHANGE_PRUNE_INTERVAL == 0:
+            db.execute(_prune_statement(table_name, version))
+    return version
+
+
+async def bump_table_version_async(db: AsyncSession, table_name: str, keys: Optional[Iterable[str]] = None) -> int:
+    """Async counterpart of :func:`bump_table_version`."""
+    version = (await db.execute(_bump_statement(table_name))).scalar_one()
+    if keys is not None:
+        await db.execute(_log_statement(table_name, version, keys))
+        if version % CHANGE_PRUNE_INTERVAL == 0:
+            await db.execute(_prune_statement(table_name, version))
+    return version
+
+
+def get_changed_keys(
+    db: Session, table_name: str, since: int, until: int, limit: Optional[int] = None
+) -> Optional[Set[str]]:
+    """Return the keys written by the versions after ``since`` up to ``until``.
+
+    Args:
+        db: Database session.
+        table_name: Name of the versioned table.
+        since: Version the caller's copy of the table reflects.
+        until: Version to catch up to.
+        limit: Number of keys above which reloading is cheaper for the caller than
+            applying them; they are then not read.
+
+    Returns:
+        Optional[Set[str]]: The changed keys, or ``None`` when one of the versions did
+        not record its keys, or more than ``limit`` keys changed, and the caller must
+        reload the table.
+    """
+    where = (
+        TableChange.table_name == table_name,
+        TableChange.version > since,
+        TableChange.version <= until,
+    )
+    versions, keys = db.execute(
+        select(func.count(TableChange.version.distinct()), func.count()).where(*where)
+    ).one()
+    if versions != until - since or (limit is not None and keys > limit):
+        return None
+    rows = db.execute(select(TableChange.key).where(*where, TableChange.key != NO_ROW_CHANGES)).scalars()
+    return set(rows)
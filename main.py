@@ -2,7 +2,17 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from api import add_assessment_api, auth, property_assessment_api
+from api import (
+    add_assessment_api,
+    analytics_api,
+    assessment_export_api,
+    auth,
+    internal_api,
+    metrics,
+    property_assessment_api,
+    suggest_api,
+)
+from api.metrics import MetricsMiddleware
 from database.database import engine
 from models import user_model as models
 
@@ -24,9 +34,16 @@ app.add_middleware(
     allow_methods=['*'],
     allow_headers=['*'],
 )
+app.add_middleware(MetricsMiddleware)
 
 # Include routers
 app.include_router(auth.router)
+app.include_router(internal_api.router)
+app.include_router(metrics.router)
+app.include_router(assessment_export_api.router, tags=['Property Assessment'])
+app.include_router(property_assessment_api.router, tags=['Property Assessment'])
+app.include_router(suggest_api.router, tags=['Search'])
+app.include_router(analytics_api.router, tags=['Analytics'])
 app.include_router(
     add_assessment_api.router,
     prefix='/assessment',
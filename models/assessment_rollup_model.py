@@ -0,0 +1,29 @@
+"""Module containing the AssessmentRollup model definition for the Real Property Tax Assessment System."""
+from sqlalchemy import BigInteger, Column, Numeric, String
+
+from database.database import Base
+
+
+class AssessmentRollup(Base):
+    """Model holding the totals of property_assessment_clean per reporting group.
+
+    A group is a combination of municipality code, barangay code, classification and
+    taxability, the finest grain the dashboards report on; coarser totals are sums of
+    these rows. Missing values of the grouping columns are stored as an empty string
+    so that they can be part of the primary key.
+
+    The rows are maintained by ``services/assessment_rollup.py`` in the same
+    transaction as every write to property_assessment_clean made through the API.
+    """
+
+    __tablename__ = 'assessment_rollup'
+    __table_args__ = {'schema': 'Assessor2025'}
+
+    mun_code = Column(String(20), primary_key=True)
+    barangay_code = Column(String(20), primary_key=True)
+    classification = Column(String(50), primary_key=True)
+    taxability = Column(String(20), primary_key=True)
+    parcels = Column(BigInteger, nullable=False, default=0)
+    market_val = Column(Numeric(20, 2), nullable=False, default=0)
+    ass_value = Column(Numeric(20, 2), nullable=False, default=0)
+    area = Column(Numeric(20, 2), nullable=False, default=0)
@@ -0,0 +1,23 @@
+"""Module adding the indexes used by keyset pagination of property_assessment_clean."""
+from alembic import op
+
+
+def upgrade() -> None:
+    """Create expression indexes matching the municipality and barangay sort orders.
+
+    The ``tdn`` sort order is already served by the primary key.
+    """
+    op.execute("""
+    CREATE INDEX IF NOT EXISTS ix_property_assessment_clean_mun_tdn
+    ON "Assessor2025".property_assessment_clean (COALESCE(municipality, ''), tdn)
+    """)
+    op.execute("""
+    CREATE INDEX IF NOT EXISTS ix_property_assessment_clean_mun_brgy_tdn
+    ON "Assessor2025".property_assessment_clean (COALESCE(municipality, ''), COALESCE(barangay, ''), tdn)
+    """)
+
+
+def downgrade() -> None:
+    """Drop the keyset pagination indexes."""
+    op.execute('DROP INDEX IF EXISTS "Assessor2025".ix_property_assessment_clean_mun_brgy_tdn')
+    op.execute('DROP INDEX IF EXISTS "Assessor2025".ix_property_assessment_clean_mun_tdn')
@@ -0,0 +1,40 @@
+"""Module adding the assessment_rollup table behind the assessment summary endpoint."""
+from alembic import op
+
+
+def upgrade() -> None:
+    """Create assessment_rollup and fill it from property_assessment_clean.
+
+    The write endpoints keep the table up to date from then on; after loading data
+    outside of the API, run ``python -m services.assessment_rollup`` instead.
+    """
+    op.execute("""
+    CREATE TABLE IF NOT EXISTS "Assessor2025".assessment_rollup (
+        mun_code VARCHAR(20) NOT NULL,
+        barangay_code VARCHAR(20) NOT NULL,
+        classification VARCHAR(50) NOT NULL,
+        taxability VARCHAR(20) NOT NULL,
+        parcels BIGINT NOT NULL DEFAULT 0,
+        market_val NUMERIC(20, 2) NOT NULL DEFAULT 0,
+        ass_value NUMERIC(20, 2) NOT NULL DEFAULT 0,
+        area NUMERIC(20, 2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (mun_code, barangay_code, classification, taxability)
+    )
+    """)
+    op.execute('DELETE FROM "Assessor2025".assessment_rollup')
+    op.execute("""
+    INSERT INTO "Assessor2025".assessment_rollup (
+        mun_code, barangay_code, classification, taxability, parcels, market_val, ass_value, area
+    )
+    SELECT
+        COALESCE(mun_code, ''), COALESCE(barangay_code, ''),
+        COALESCE(classification, ''), COALESCE(taxability, ''),
+        count(*), COALESCE(sum(market_val), 0), COALESCE(sum(ass_value), 0), COALESCE(sum(area), 0)
+    FROM "Assessor2025".property_assessment_clean
+    GROUP BY 1, 2, 3, 4
+    """)
+
+
+def downgrade() -> None:
+    """Drop the assessment_rollup table."""
+    op.execute('DROP TABLE IF EXISTS "Assessor2025".assessment_rollup')
@@ -0,0 +1,48 @@
+"""Module adding the search indexes used by the property_assessment_clean filters."""
+from typing import List
+
+from alembic import op
+
+TRIGRAM_COLUMNS = ('municipality', 'barangay', 'classification', 'gr')
+CODE_COLUMNS = ('mun_code', 'barangay_code')
+
+
+def index_statements(schema: str = 'Assessor2025') -> List[str]:
+    """Return the DDL creating the search indexes in ``schema``.
+
+    The substring filters use ``ILIKE '%value%'``, which a btree cannot serve, so the
+    name columns get pg_trgm GIN indexes. The code columns are filtered by equality and
+    get plain btrees.
+
+    Args:
+        schema: Schema holding property_assessment_clean.
+
+    Returns:
+        List[str]: SQL statements, to be run in order.
+    """
+    statements = ['CREATE EXTENSION IF NOT EXISTS pg_trgm']
+    for column in TRIGRAM_COLUMNS:
+        statements.append(
+            f'CREATE INDEX IF NOT EXISTS ix_property_assessment_clean_{column}_trgm '
+            f'ON "{schema}".property_assessment_clean USING gin ({column} gin_trgm_ops)'
+        )
+    for column in CODE_COLUMNS:
+        statements.append(
+            f'CREATE INDEX IF NOT EXISTS ix_property_assessment_clean_{column} '
+            f'ON "{schema}".property_assessment_clean ({column})'
+        )
+    return statements
+
+
+def upgrade() -> None:
+    """Upgrade the database by creating the trigram and code indexes."""
+    for statement in index_statements():
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    """Drop the search indexes, leaving the pg_trgm extension installed."""
+    for column in CODE_COLUMNS:
+        op.execute(f'DROP INDEX IF EXISTS "Assessor2025".ix_property_assessment_clean_{column}')
+    for column in TRIGRAM_COLUMNS:
+        op.execute(f'DROP INDEX IF EXISTS "Assessor2025".ix_property_assessment_clean_{column}_trgm')
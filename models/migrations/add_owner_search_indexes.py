@@ -0,0 +1,24 @@
+"""Module adding the indexes used by the owner search of GET /assessment/owners/."""
+from alembic import op
+
+
+def upgrade() -> None:
+    """Create the owner-name prefix and td indexes.
+
+    ``text_pattern_ops`` lets ``lower(owner) LIKE 'prefix%'`` use the index regardless
+    of the database collation. pin and tin are served by their unique constraints.
+    """
+    op.execute("""
+    CREATE INDEX IF NOT EXISTS ix_owner_details_owner_lower
+    ON "Assessor2025".owner_details (lower(owner) text_pattern_ops)
+    """)
+    op.execute("""
+    CREATE INDEX IF NOT EXISTS ix_owner_details_td
+    ON "Assessor2025".owner_details (td)
+    """)
+
+
+def downgrade() -> None:
+    """Drop the owner search indexes."""
+    op.execute('DROP INDEX IF EXISTS "Assessor2025".ix_owner_details_td')
+    op.execute('DROP INDEX IF EXISTS "Assessor2025".ix_owner_details_owner_lower')
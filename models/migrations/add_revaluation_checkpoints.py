@@ -0,0 +1,23 @@
+"""Module adding the revaluation_checkpoints table used by the revaluation job."""
+from alembic import op
+
+
+def upgrade() -> None:
+    """Create revaluation_checkpoints."""
+    op.execute("""
+    CREATE TABLE IF NOT EXISTS "Assessor2025".revaluation_checkpoints (
+        job VARCHAR(100) PRIMARY KEY,
+        schedule_hash VARCHAR(64) NOT NULL,
+        last_tdn VARCHAR(50),
+        rows_scanned BIGINT NOT NULL DEFAULT 0,
+        rows_changed BIGINT NOT NULL DEFAULT 0,
+        started_at TIMESTAMP NOT NULL,
+        updated_at TIMESTAMP NOT NULL,
+        finished_at TIMESTAMP
+    )
+    """)
+
+
+def downgrade() -> None:
+    """Drop the revaluation_checkpoints table."""
+    op.execute('DROP TABLE IF EXISTS "Assessor2025".revaluation_checkpoints')
@@ -0,0 +1,27 @@
+"""Module adding the tax_rates table read by the tax roll generator."""
+from alembic import op
+
+
+def upgrade() -> None:
+    """Create tax_rates.
+
+    No rates are seeded; insert the rates of the tax ordinance before generating a
+    roll, for example a province-wide default::
+
+        INSERT INTO "Assessor2025".tax_rates (tax_year, mun_code, basic_rate, sef_rate)
+        VALUES (2027, '', 1, 1)
+    """
+    op.execute("""
+    CREATE TABLE IF NOT EXISTS "Assessor2025".tax_rates (
+        tax_year INTEGER NOT NULL,
+        mun_code VARCHAR(20) NOT NULL DEFAULT '',
+        basic_rate NUMERIC(6, 4) NOT NULL,
+        sef_rate NUMERIC(6, 4) NOT NULL,
+        PRIMARY KEY (tax_year, mun_code)
+    )
+    """)
+
+
+def downgrade() -> None:
+    """Drop the tax_rates table."""
+    op.execute('DROP TABLE IF EXISTS "Assessor2025".tax_rates')
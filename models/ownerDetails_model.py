@@ -1,5 +1,5 @@
 """Module containing the OwnerDetails model definition for the Real Property Tax Assessment System."""
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Index, Integer, String, func
 from sqlalchemy.orm import relationship
 
 from database.database import Base
@@ -13,7 +13,6 @@ class OwnerDetailsModel(Base):
     """
 
     __tablename__ = 'owner_details'
-    __table_args__ = {'schema': 'Assessor2025'}
     
     # Simple auto-incrementing ID
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -26,6 +25,19 @@ class OwnerDetailsModel(Base):
     tin = Column(String, unique=True)
     tel_no = Column(String)
     td = Column(String)
+    
+    # pin and tin lookups use their unique constraints; the owner-name prefix search
+    # needs text_pattern_ops so that LIKE 'prefix%' can use the index in any collation.
+    # Existing databases get these from the add_owner_search_indexes migration.
+    __table_args__ = (
+        Index(
+            'ix_owner_details_owner_lower',
+            func.lower(owner).label('owner_lower'),
+            postgresql_ops={'owner_lower': 'text_pattern_ops'},
+        ),
+        Index('ix_owner_details_td', td),
+        {'schema': 'Assessor2025'},
+    )
 
     # Relationship with approval sections
     approval_sections = relationship('ApprovalSectionModel', back_populates='owner_details')
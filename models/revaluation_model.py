@@ -0,0 +1,26 @@
+"""Module containing the RevaluationCheckpoint model definition for the Real Property Tax Assessment System."""
+from sqlalchemy import BigInteger, Column, DateTime, String
+
+from database.database import Base
+
+
+class RevaluationCheckpoint(Base):
+    """Model recording the progress of a revaluation job over property_assessment_clean.
+
+    The row is updated in the same transaction as each chunk of revalued assessments,
+    so after a crash the job resumes after ``last_tdn`` without revaluing or skipping
+    any row.
+    """
+
+    __tablename__ = 'revaluation_checkpoints'
+    __table_args__ = {'schema': 'Assessor2025'}
+
+    job = Column(String(100), primary_key=True)
+    # SHA-256 of the schedule the job runs with, so a resume cannot mix schedules
+    schedule_hash = Column(String(64), nullable=False)
+    last_tdn = Column(String(50))
+    rows_scanned = Column(BigInteger, nullable=False, default=0)
+    rows_changed = Column(BigInteger, nullable=False, default=0)
+    started_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime)
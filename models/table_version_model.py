@@ -0,0 +1,40 @@
+"""Module containing the TableVersion and TableChange model definitions for the Real Property Tax Assessment System."""
+from sqlalchemy import BigInteger, Column, Index, String
+
+from database.database import Base
+
+
+class TableVersion(Base):
+    """Model representing the change version of a data table.
+
+    Every write handler increments the version of the table it modifies in the same
+    transaction, so caches keyed on the version are invalidated exactly when the
+    table changes.
+    """
+
+    __tablename__ = 'table_versions'
+    __table_args__ = {'schema': 'Assessor2025'}
+
+    table_name = Column(String(100), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+
+class TableChange(Base):
+    """Model recording the keys of the rows written under a table version.
+
+    Written by ``bump_table_version`` when the caller passes the keys it changed, so
+    that in-process copies of a table can apply the changes since the version they
+    hold instead of reloading. A version with no rows here changed an unknown set of
+    rows, and copies older than it must reload.
+    """
+
+    __tablename__ = 'table_changes'
+    __table_args__ = (
+        Index('ix_table_changes_table_version', 'table_name', 'version'),
+        {'schema': 'Assessor2025'},
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    table_name = Column(String(100), nullable=False)
+    version = Column(BigInteger, nullable=False)
+    key = Column(String(100), nullable=False)
@@ -0,0 +1,22 @@
+"""Module containing the TaxRate model definition for the Real Property Tax Assessment System."""
+from sqlalchemy import Column, Integer, Numeric, String
+
+from database.database import Base
+
+
+class TaxRate(Base):
+    """Model holding the real property tax rates levied on assessed values.
+
+    Rates are percentages of the assessed value, per tax year and municipality: the
+    basic real property tax and the additional levy for the Special Education Fund.
+    The row with an empty ``mun_code`` applies to every municipality of the year that
+    has no row of its own.
+    """
+
+    __tablename__ = 'tax_rates'
+    __table_args__ = {'schema': 'Assessor2025'}
+
+    tax_year = Column(Integer, primary_key=True)
+    mun_code = Column(String(20), primary_key=True, default='')
+    basic_rate = Column(Numeric(6, 4), nullable=False)
+    sef_rate = Column(Numeric(6, 4), nullable=False)
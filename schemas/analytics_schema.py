@@ -0,0 +1,62 @@
+from enum import Enum
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+class AnalyticsColumn(str, Enum):
+    market_val = "market_val"
+    ass_value = "ass_value"
+    ass_level = "ass_level"
+    area = "area"
+
+class AnalyticsDimension(str, Enum):
+    mun_code = "mun_code"
+    barangay_code = "barangay_code"
+    classification = "classification"
+    taxability = "taxability"
+
+class PercentileGroup(BaseModel):
+    # Value of the grouping dimension, null without by= or for rows where it is missing
+    group: Optional[str] = None
+    count: int
+    percentiles: Dict[str, float]
+
+class PercentileResponse(BaseModel):
+    column: AnalyticsColumn
+    by: Optional[AnalyticsDimension] = None
+    groups: List[PercentileGroup]
+
+class AggregateGroup(BaseModel):
+    group: Optional[str] = None
+    count: int
+    sum: float
+    mean: float
+    min: float
+    max: float
+
+class AggregateResponse(BaseModel):
+    column: AnalyticsColumn
+    by: Optional[AnalyticsDimension] = None
+    groups: List[AggregateGroup]
+
+class HistogramResponse(BaseModel):
+    column: AnalyticsColumn
+    counts: List[int]
+    edges: List[float]
+
+class ValueBand(BaseModel):
+    group: Optional[str] = None
+    lower: float
+    # Null for the open-ended last band
+    upper: Optional[float] = None
+    count: int
+    sum: float
+
+class ValueBandResponse(BaseModel):
+    column: AnalyticsColumn
+    by: Optional[AnalyticsDimension] = None
+    bands: List[ValueBand]
+
+class AnalyticsFilterResponse(BaseModel):
+    count: int
+    tdns: List[str]
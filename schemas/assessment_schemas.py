@@ -174,4 +174,22 @@ class CompleteAssessmentRequest(BaseModel):
     recordOfSupersededAssessment: RecordOfSupersededAssessment
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+class BatchAssessmentResult(BaseModel):
+    index: int
+    status: str
+    assessment_id: Optional[int] = None
+    owner_id: Optional[int] = None
+    error: Optional[str] = None
+    # Submitted figures that differ from the server-side valuation
+    warnings: List[str] = Field(default_factory=list)
+
+class BatchAssessmentResponse(BaseModel):
+    status: str
+    message: str
+    results: List[BatchAssessmentResult]
+
+class PaginatedOwnersResponse(BaseModel):
+    data: List[OwnerDetails]
+    limit: int
+    next_cursor: Optional[str] = None
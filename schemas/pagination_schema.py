@@ -0,0 +1,6 @@
+from enum import Enum
+
+class CountStrategy(str, Enum):
+    exact = "exact"
+    estimated = "estimated"
+    none = "none"
@@ -1,7 +1,13 @@
-from pydantic import BaseModel
+from enum import Enum
+from decimal import Decimal
+from pydantic import BaseModel, Field, field_validator
 from datetime import date
 from typing import Optional
 from typing import List
+from .pagination_schema import CountStrategy
+
+# Largest magnitude that fits the Numeric(15, 2) columns of property_assessment_clean
+MAX_AMOUNT = Decimal("1e13")
 
 class EffectivityOfAssessment(BaseModel):
     quarter: Optional[str] = None
@@ -33,19 +39,125 @@ class PropertyAssessment(BaseModel):
     municipality: Optional[str]
     barangay_code: Optional[str]
     barangay: Optional[str]
-    assessmentLevel: float
-    assessmentValue: float
-    totalArea: float
-    marketValue: float
-    buildingCategory: str
-    effectivityOfAssessment: EffectivityOfAssessment
-    items: List[AssessmentItem]
 
     class Config:
         from_attributes = True
 
+class SparsePropertyAssessment(BaseModel):
+    """An assessment in a list page, holding only the fields requested with ``fields=``.
+
+    Every field is optional because it is left out of the item unless requested; with
+    no ``fields=`` the items carry all of them.
+    """
+    tdn: Optional[str] = None
+    market_val: Optional[float] = None
+    ass_value: Optional[float] = None
+    sub_class: Optional[str] = None
+    eff_date: Optional[date] = None
+    classification: Optional[str] = None
+    ass_level: Optional[float] = None
+    area: Optional[float] = None
+    taxability: Optional[str] = None
+    gr_code: Optional[str] = None
+    gr: Optional[str] = None
+    mun_code: Optional[str] = None
+    municipality: Optional[str] = None
+    barangay_code: Optional[str] = None
+    barangay: Optional[str] = None
+
+class AssessmentSort(str, Enum):
+    tdn = "tdn"
+    municipality = "municipality"
+    barangay = "barangay"
+
 class PaginatedAssessmentResponse(BaseModel):
-    data: List[PropertyAssessment]
-    total: int
+    data: List[SparsePropertyAssessment]
+    total: Optional[int] = None
+    count: CountStrategy = CountStrategy.exact
     skip: int
-    limit: int
\ No newline at end of file
+    limit: int
+    sort: AssessmentSort = AssessmentSort.tdn
+    next_cursor: Optional[str] = None
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+    arrow = "arrow"
+    parquet = "parquet"
+
+class IngestFormat(str, Enum):
+    csv = "csv"
+    ndjson = "ndjson"
+
+class AssessmentFields(BaseModel):
+    """Columns of property_assessment_clean with the limits of their database types."""
+    tdn: str = Field(min_length=1, max_length=50)
+    market_val: Optional[Decimal] = Field(None, gt=-MAX_AMOUNT, lt=MAX_AMOUNT)
+    ass_value: Optional[Decimal] = Field(None, gt=-MAX_AMOUNT, lt=MAX_AMOUNT)
+    sub_class: Optional[str] = Field(None, max_length=50)
+    eff_date: Optional[date] = None
+    classification: Optional[str] = Field(None, max_length=50)
+    ass_level: Optional[Decimal] = Field(None, ge=0, lt=1000)
+    area: Optional[Decimal] = Field(None, gt=-MAX_AMOUNT, lt=MAX_AMOUNT)
+    taxability: Optional[str] = Field(None, max_length=20)
+    gr_code: Optional[str] = Field(None, max_length=20)
+    gr: Optional[str] = Field(None, max_length=100)
+    mun_code: Optional[str] = Field(None, max_length=20)
+    municipality: Optional[str] = Field(None, max_length=100)
+    barangay_code: Optional[str] = Field(None, max_length=20)
+    barangay: Optional[str] = Field(None, max_length=100)
+
+class AssessmentIngestRow(AssessmentFields):
+    """A record of a bulk upload; blank values stand for NULL."""
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def blank_to_none(cls, value):
+        if isinstance(value, str) and not value.strip():
+            return None
+        return value
+
+    class Config:
+        str_strip_whitespace = True
+
+class IngestReject(BaseModel):
+    line: int
+    tdn: Optional[str] = None
+    errors: List[str]
+
+class IngestReport(BaseModel):
+    received: int = 0
+    inserted: int = 0
+    updated: int = 0
+    rejected: int = 0
+    rejects: List[IngestReject] = Field(default_factory=list)
+
+class AssessmentPatch(AssessmentFields):
+    """Partial update of one assessment; fields left out of the request are not changed."""
+
+class AssessmentPatchReport(BaseModel):
+    updated: int
+    not_found: List[str] = Field(default_factory=list)
+
+class SummaryDimension(str, Enum):
+    mun_code = "mun_code"
+    barangay_code = "barangay_code"
+    classification = "classification"
+    taxability = "taxability"
+
+class SummaryTotals(BaseModel):
+    parcels: int
+    market_val: float
+    ass_value: float
+    area: float
+
+class SummaryGroup(SummaryTotals):
+    """Totals of one group; only the dimensions grouped by are set."""
+    mun_code: Optional[str] = None
+    barangay_code: Optional[str] = None
+    classification: Optional[str] = None
+    taxability: Optional[str] = None
+
+class AssessmentSummaryResponse(BaseModel):
+    group_by: List[SummaryDimension]
+    groups: List[SummaryGroup]
+    totals: SummaryTotals
@@ -0,0 +1,35 @@
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple, Union
+
+from pydantic import BaseModel, Field
+
+class ScheduledUnitValue(BaseModel):
+    """Market value per square meter of a classification, optionally for one place only."""
+    classification: str = Field(min_length=1, max_length=50)
+    mun_code: Optional[str] = Field(None, max_length=20)
+    barangay_code: Optional[str] = Field(None, max_length=20)
+    unit_value: Decimal = Field(gt=0)
+
+class RevaluationSchedule(BaseModel):
+    unit_values: List[ScheduledUnitValue] = Field(default_factory=list)
+    # A flat level in percent, or (market value up to, level) brackets with null for
+    # the open-ended last bracket
+    assessment_levels: Dict[str, Union[float, List[Tuple[Optional[float], float]]]] = Field(default_factory=dict)
+
+class MunicipalityDelta(BaseModel):
+    mun_code: Optional[str] = None
+    rows: int = 0
+    changed: int = 0
+    market_val_before: float = 0
+    market_val_after: float = 0
+    ass_value_before: float = 0
+    ass_value_after: float = 0
+
+class RevaluationReport(BaseModel):
+    job: str
+    dry_run: bool
+    resumed_after: Optional[str] = None
+    chunks: int = 0
+    rows_scanned: int = 0
+    rows_changed: int = 0
+    municipalities: List[MunicipalityDelta] = Field(default_factory=list)
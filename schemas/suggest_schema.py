@@ -0,0 +1,19 @@
+from enum import Enum
+from typing import List, Union
+
+from pydantic import BaseModel
+
+class SuggestSource(str, Enum):
+    owner = "owner"
+    pin = "pin"
+    tdn = "tdn"
+
+class Suggestion(BaseModel):
+    source: SuggestSource
+    value: str
+    # Owner ID for owner and pin suggestions, the TDN itself for tdn suggestions
+    ref: Union[int, str]
+
+class SuggestResponse(BaseModel):
+    query: str
+    suggestions: List[Suggestion]
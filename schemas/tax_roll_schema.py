@@ -0,0 +1,32 @@
+from enum import Enum
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+class TaxRollFormat(str, Enum):
+    csv = "csv"
+    parquet = "parquet"
+
+class ParcelStatus(str, Enum):
+    taxable = "taxable"
+    exempt = "exempt"
+    # No rate for the municipality in the tax year; the levies are left empty
+    unrated = "unrated"
+
+class MunicipalityLevy(BaseModel):
+    mun_code: Optional[str] = None
+    parcels: int = 0
+    taxable: int = 0
+    exempt: int = 0
+    unrated: int = 0
+    taxable_ass_value: float = 0
+    exempt_ass_value: float = 0
+    basic_tax: float = 0
+    sef_tax: float = 0
+    total_tax: float = 0
+
+class TaxRollReport(BaseModel):
+    tax_year: int
+    format: TaxRollFormat
+    parcels: int = 0
+    municipalities: List[MunicipalityLevy] = Field(default_factory=list)
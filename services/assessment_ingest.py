@@ -0,0 +1,302 @@
+"""Bulk ingest of property assessments from CSV or NDJSON into property_assessment_clean.
+
+Records are parsed and validated one at a time and loaded in batches: each batch is
+copied into a temporary staging table with ``COPY`` and merged into the target with
+``INSERT ... ON CONFLICT (tdn) DO UPDATE``. Only one batch is held in memory, and each
+batch is committed on its own so a general revision of tens of thousands of TDNs loads
+in a handful of round trips per batch instead of three per row.
+
+Usage:
+    python -m services.assessment_ingest revision.csv --rejects rejects.ndjson
+"""
+import argparse
+import codecs
+import csv
+import io
+import os
+import sys
+from typing import IO, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import orjson
+from pydantic import ValidationError
+from sqlalchemy import column, select, table, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from database.database import SessionLocal
+from database.table_versions import bump_table_version
+from models.property_assessment_model import PropertyAssessmentClean
+from schemas.property_assessment_schema import (
+    AssessmentIngestRow,
+    IngestFormat,
+    IngestReject,
+    IngestReport,
+)
+from services.assessment_rollup import ROLLUP_COLUMNS, apply_changes, current_rows
+
+STAGING_TABLE = 'assessment_ingest_staging'
+COLUMNS = [c.name for c in PropertyAssessmentClean.__table__.columns]
+# Bind parameter limit of asyncpg, pg8000 and psycopg 3
+MAX_BIND_PARAMETERS = 32767
+
+
+def _decoded_lines(stream: IO[bytes], invalid: Set[int]) -> Iterator[str]:
+    """Decode an upload line by line, adding the numbers of lines that are not UTF-8 to ``invalid``.
+
+    Invalid lines are still yielded, with replacement characters, so that a CSV reader
+    keeps its place in the file.
+    """
+    for line_number, raw in enumerate(stream, start=1):
+        if line_number == 1 and raw.startswith(codecs.BOM_UTF8):
+            raw = raw[len(codecs.BOM_UTF8):]
+        try:
+            yield raw.decode('utf-8')
+        except UnicodeDecodeError:
+            invalid.add(line_number)
+            yield raw.decode('utf-8', errors='replace')
+
+
+def read_records(stream: IO[bytes], format: IngestFormat) -> Iterator[Tuple[int, object]]:
+    """Yield ``(line number, raw record)`` pairs from an upload.
+
+    Records that cannot be decoded, as UTF-8, CSV or JSON, are yielded as the exception
+    raised while decoding them, so that they are reported as rejects rather than
+    aborting the ingest. A CSV header that is not UTF-8 rejects the whole upload.
+
+    Args:
+        stream: Binary file object positioned at the start of the upload.
+        format: Format of the upload.
+
+    Yields:
+        Tuple[int, object]: The 1-based line number and a dict or an exception.
+    """
+    invalid: Set[int] = set()
+    lines = _decoded_lines(stream, invalid)
+    if format == IngestFormat.csv:
+        reader = csv.DictReader(lines)
+        try:
+            reader.fieldnames
+        except csv.Error as e:
+            yield reader.line_num, e
+            return
+        if invalid:
+            yield 1, ValueError('header: not valid UTF-8')
+            return
+        end = reader.line_num
+        while True:
+            start = end + 1
+            try:
+                record = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                end = reader.line_num
+                yield end, e
+                continue
+            end = reader.line_num
+            # A quoted value can span several lines of the file
+            if invalid.intersection(range(start, end + 1)):
+                yield end, ValueError('record: not valid UTF-8')
+                continue
+            yield end, record
+    for line_number, line in enumerate(lines, start=1):
+        if line_number in invalid:
+            yield line_number, ValueError('record: not valid UTF-8')
+            continue
+        if not line.strip():
+            continue
+        try:
+            record = orjson.loads(line)
+        except orjson.JSONDecodeError as e:
+            yield line_number, e
+            continue
+        yield line_number, record
+
+
+def _reject_reasons(error: Exception) -> List[str]:
+    if isinstance(error, ValidationError):
+        return [
+            f"{'.'.join(str(part) for part in detail['loc']) or 'record'}: {detail['msg']}"
+            for detail in error.errors()
+        ]
+    return [str(error)]
+
+
+def _ensure_staging_table(db: Session) -> None:
+    target = db.get_bind().dialect.identifier_preparer.format_table(PropertyAssessmentClean.__table__)
+    db.execute(text(
+        f'CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} '
+        f'(LIKE {target} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS'
+    ))
+
+
+def _copy_into_staging(db: Session, rows: List[dict]) -> None:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerows([row[name] for name in COLUMNS] for row in rows)
+    buffer.seek(0)
+    cursor = db.connection().connection.driver_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {STAGING_TABLE} ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+def load_batch(db: Session, rows: List[dict], columns: Optional[Sequence[str]] = None) -> Tuple[int, int]:
+    """Upsert one batch of validated rows, refresh the totals they affect, and commit.
+
+    Args:
+        db: Database session.
+        rows: Validated rows with unique ``tdn`` values.
+        columns: Columns the upload provided. Existing rows keep their values of the
+            other columns; every column is written by default.
+
+    Returns:
+        Tuple[int, int]: Number of inserted and of updated rows.
+    """
+    target = PropertyAssessmentClean.__table__
+    updated_columns = [name for name in (columns or COLUMNS) if name != 'tdn']
+    # Totals move by the difference between the rows overwritten and the rows written
+    previous = current_rows(db, [row['tdn'] for row in rows])
+    if db.get_bind().dialect.driver == 'psycopg2':
+        _ensure_staging_table(db)
+        _copy_into_staging(db, rows)
+        staging = table(STAGING_TABLE, *[column(name) for name in COLUMNS])
+        statements = [insert(target).from_select(COLUMNS, select(*staging.c))]
+    else:
+        # Without COPY the rows are bound as parameters, of which drivers accept 32767
+        step = MAX_BIND_PARAMETERS // len(COLUMNS)
+        statements = [insert(target).values(rows[start:start + step]) for start in range(0, len(rows), step)]
+    flags = []
+    written = []
+    for statement in statements:
+        statement = statement.on_conflict_do_update(
+            index_elements=[target.c.tdn],
+            # A batch of TDNs alone still reports which of them exist
+            set_={name: statement.excluded[name] for name in updated_columns or ['tdn']},
+        ).returning(text('(xmax = 0) AS inserted'), *(target.c[name] for name in ROLLUP_COLUMNS))
+        for row in db.execute(statement).mappings():
+            flags.append(row['inserted'])
+            written.append(row)
+    apply_changes(db, added=written, removed=previous)
+    bump_table_version(db, PropertyAssessmentClean.__tablename__, [row['tdn'] for row in rows])
+    db.commit()
+    inserted = sum(1 for flag in flags if flag)
+    return inserted, len(flags) - inserted
+
+
+def ingest_assessments(
+    db: Session,
+    stream: IO[bytes],
+    format: IngestFormat,
+    batch_size: int = 5000,
+    reject_limit: Optional[int] = 1000,
+    on_reject: Optional[Callable[[IngestReject], None]] = None,
+) -> IngestReport:
+    """Validate and upsert every record of an upload into property_assessment_clean.
+
+    Invalid records are skipped and reported. When a TDN appears more than once in the
+    same batch only its last occurrence is loaded and the earlier ones are reported as
+    superseded. Batches already committed stay loaded if a later batch fails.
+
+    Only the columns present in a record are written: a CSV with the header
+    ``tdn,market_val`` updates the market values of existing TDNs and leaves their
+    other columns alone.
+
+    Args:
+        db: Database session.
+        stream: Binary file object with the upload.
+        format: Format of the upload.
+        batch_size: Number of rows loaded per COPY and commit.
+        reject_limit: Maximum number of rejects listed in the report, or ``None`` to
+            list all of them. ``rejected`` always holds the full count.
+        on_reject: Called with every reject as it is found, so that they can be
+            written out without holding them in the report.
+
+    Returns:
+        IngestReport: Counts of received, inserted, updated and rejected records.
+    """
+    report = IngestReport()
+    batch: Dict[str, Tuple[int, dict, Tuple[str, ...]]] = {}
+
+    def reject(line: int, tdn: Optional[str], errors: List[str]) -> None:
+        report.rejected += 1
+        rejected = IngestReject(line=line, tdn=tdn, errors=errors)
+        if on_reject is not None:
+            on_reject(rejected)
+        if reject_limit is None or len(report.rejects) < reject_limit:
+            report.rejects.append(rejected)
+
+    def flush() -> None:
+        shapes: Dict[Tuple[str, ...], List[dict]] = {}
+        for _, row, columns in batch.values():
+            shapes.setdefault(columns, []).append(row)
+        for columns, rows in shapes.items():
+            inserted, updated = load_batch(db, rows, columns)
+            report.inserted += inserted
+            report.updated += updated
+        batch.clear()
+
+    for line, record in read_records(stream, format):
+        report.received += 1
+        if isinstance(record, Exception):
+            reject(line, None, _reject_reasons(record))
+            continue
+        if not isinstance(record, dict):
+            reject(line, None, ['record: expected an object'])
+            continue
+        try:
+            validated = AssessmentIngestRow.model_validate(record)
+        except ValidationError as e:
+            tdn = record.get('tdn')
+            reject(line, tdn if isinstance(tdn, str) else None, _reject_reasons(e))
+            continue
+        row = validated.model_dump()
+        previous = batch.pop(row['tdn'], None)
+        if previous is not None:
+            reject(previous[0], row['tdn'], [f'tdn: superseded by line {line}'])
+        batch[row['tdn']] = (line, row, tuple(name for name in COLUMNS if name in validated.model_fields_set))
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help='CSV or NDJSON file to load')
+    parser.add_argument('--format', choices=[f.value for f in IngestFormat], help='defaults to the file extension')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--rejects', help='write every rejected record to this NDJSON file')
+    args = parser.parse_args()
+
+    format = IngestFormat(args.format or os.path.splitext(args.path)[1].lstrip('.').lower())
+    db = SessionLocal()
+    rejects_file = open(args.rejects, 'wb') if args.rejects else None
+
+    def write_reject(rejected: IngestReject) -> None:
+        rejects_file.write(orjson.dumps(rejected.model_dump(), option=orjson.OPT_APPEND_NEWLINE))
+
+    try:
+        with open(args.path, 'rb') as stream:
+            report = ingest_assessments(
+                db, stream, format, args.batch_size, reject_limit=0,
+                on_reject=write_reject if rejects_file else None,
+            )
+    finally:
+        db.close()
+        if rejects_file:
+            rejects_file.close()
+
+    print(
+        f'received={report.received} inserted={report.inserted} '
+        f'updated={report.updated} rejected={report.rejected}'
+    )
+    sys.exit(1 if report.rejected else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""Totals of property_assessment_clean per reporting group, kept in assessment_rollup.
+
+Writes adjust the totals incrementally: they pass the rows they inserted and the
+previous values of the rows they changed or deleted to :func:`apply_changes`, which
+adds the differences to the affected groups in one upsert. Bulk writes, which cannot
+join the previous values into their statement, read them first with
+:func:`current_rows`. The changes run in the transaction of the write, so the totals
+commit together with it.
+
+Incremental changes commute and take a shared advisory lock; a rebuild takes it
+exclusively, so a rebuilt group never misses a concurrent change, nor counts it twice.
+
+After the table is changed outside of the API, recompute every group with the command
+below; ``--check`` only lists the groups whose totals drifted.
+
+Usage:
+    python -m services.assessment_rollup
+    python -m services.assessment_rollup --check
+"""
+import argparse
+import sys
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Mapping, Sequence, Tuple
+
+from sqlalchemy import Subquery, delete, func, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, aliased
+
+from database.database import SessionLocal
+from database.table_versions import bump_table_version
+from models.assessment_rollup_model import AssessmentRollup
+from models.property_assessment_model import PropertyAssessmentClean
+
+GROUP_COLUMNS = ('mun_code', 'barangay_code', 'classification', 'taxability')
+MEASURE_COLUMNS = ('market_val', 'ass_value', 'area')
+ROLLUP_COLUMNS = GROUP_COLUMNS + MEASURE_COLUMNS
+
+# Advisory lock serializing recomputations against incremental changes
+ROLLUP_LOCK_ID = 0x524F4C4C
+
+GroupKey = Tuple[str, ...]
+
+
+def group_key(row: Mapping[str, Any], prefix: str = '') -> GroupKey:
+    """Return the assessment_rollup key of an assessment row."""
+    return tuple(row[prefix + name] or '' for name in GROUP_COLUMNS)
+
+
+def locked_previous(tdns: Sequence[str]) -> Subquery:
+    """Return a subquery of the rollup columns of ``tdns``, locking their rows.
+
+    Joined into an ``UPDATE`` of the same rows, it exposes the values they had before
+    the update to ``RETURNING``. The lock makes it read the latest committed version
+    of each row, the one the update applies to.
+    """
+    previous = aliased(PropertyAssessmentClean)
+    return (
+        select(previous.tdn, *(getattr(previous, name) for name in ROLLUP_COLUMNS))
+        .where(previous.tdn.in_(tdns))
+        .with_for_update()
+        .subquery('previous')
+    )
+
+
+def previous_columns(previous: Subquery) -> List:
+    """Columns of :func:`locked_previous` labeled ``previous_<name>`` for ``RETURNING``."""
+    return [previous.c[name].label(f'previous_{name}') for name in ROLLUP_COLUMNS]
+
+
+def apply_changes(
+    db: Session,
+    added: Iterable[Mapping[str, Any]] = (),
+    removed: Iterable[Mapping[str, Any]] = (),
+    removed_prefix: str = '',
+) -> None:
+    """Add the totals of ``added`` rows and subtract those of ``removed`` rows.
+
+    An updated row is passed in both, with its new and its previous values. Groups whose
+    totals do not change are left alone, so updates of other columns cost nothing.
+
+    Args:
+        db: Database session holding the write.
+        added: Rows as they are after the write, with at least the rollup columns.
+        removed: Rows as they were before the write.
+        removed_prefix: Prefix of the rollup columns in ``removed``, such as
+            ``'previous_'`` for rows returned with :func:`previous_columns`.
+    """
+    deltas: Dict[GroupKey, List] = {}
+
+    def accumulate(row: Mapping[str, Any], prefix: str, sign: int) -> None:
+        delta = deltas.setdefault(group_key(row, prefix), [0, Decimal(0), Decimal(0), Decimal(0)])
+        delta[0] += sign
+        for position, name in enumerate(MEASURE_COLUMNS, start=1):
+            delta[position] += sign * Decimal(row[prefix + name] or 0)
+
+    for row in removed:
+        accumulate(row, removed_prefix, -1)
+    for row in added:
+        accumulate(row, '', 1)
+    # Concurrent writers lock the groups they change in the same order, so two
+    # multi-row upserts cannot deadlock on each other's groups
+    values = [
+        dict(zip(GROUP_COLUMNS, key), parcels=delta[0], **dict(zip(MEASURE_COLUMNS, delta[1:])))
+        for key, delta in sorted(deltas.items(), key=lambda item: tuple((v is None, v or '') for v in item[0]))
+        if any(delta)
+    ]
+    if not values:
+        return
+
+    db.execute(select(func.pg_advisory_xact_lock_shared(ROLLUP_LOCK_ID)))
+    rollup = AssessmentRollup.__table__
+    statement = insert(rollup).values(values)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[rollup.c[name] for name in GROUP_COLUMNS],
+        set_={name: rollup.c[name] + statement.excluded[name] for name in ('parcels',) + MEASURE_COLUMNS},
+    ))
+    # Groups left without parcels are dropped rather than reported as zeros
+    db.execute(delete(rollup).where(
+        rollup.c.parcels == 0,
+        tuple_(*(rollup.c[name] for name in GROUP_COLUMNS)).in_(list(deltas)),
+    ))
+
+
+def current_rows(db: Session, tdns: Sequence[str]) -> List[Mapping[str, Any]]:
+    """Return the rollup columns of the existing rows among ``tdns``, locking those rows.
+
+    A bulk write calls this before overwriting the rows, and passes the result to
+    :func:`apply_changes` as the removed rows, with the rows it wrote as the added ones.
+    """
+    table = PropertyAssessmentClean.__table__
+    return db.execute(
+        select(*(table.c[name] for name in ROLLUP_COLUMNS)).where(table.c.tdn.in_(tdns)).with_for_update()
+    ).mappings().all()
+
+
+def _aggregate(*where) -> Any:
+    table = PropertyAssessmentClean.__table__
+    keys = [func.coalesce(table.c[name], '').label(name) for name in GROUP_COLUMNS]
+    return (
+        select(
+            *keys,
+            func.count().label('parcels'),
+            *(func.coalesce(func.sum(table.c[name]), 0).label(name) for name in MEASURE_COLUMNS),
+        )
+        .where(*where)
+        .group_by(*keys)
+    )
+
+
+def rebuild_rollup(db: Session) -> int:
+    """Recompute every group from property_assessment_clean and commit.
+
+    Bumps the table version of property_assessment_clean so that cached summaries are
+    revalidated, logging that no row of it changed so in-process copies of the table
+    do not reload.
+
+    Returns:
+        int: Number of groups.
+    """
+    db.execute(select(func.pg_advisory_xact_lock(ROLLUP_LOCK_ID)))
+    rollup = AssessmentRollup.__table__
+    db.execute(delete(rollup))
+    db.execute(insert(rollup).from_select(
+        list(GROUP_COLUMNS) + ['parcels'] + list(MEASURE_COLUMNS),
+        _aggregate(),
+    ))
+    groups = db.execute(select(func.count()).select_from(rollup)).scalar_one()
+    bump_table_version(db, PropertyAssessmentClean.__tablename__, keys=[])
+    db.commit()
+    return groups
+
+
+def find_drift(db: Session) -> List[GroupKey]:
+    """Return the groups whose stored totals differ from the table."""
+    expected = {
+        group_key(row): tuple(row[name] for name in ('parcels',) + MEASURE_COLUMNS)
+        for row in db.execute(_aggregate()).mappings()
+    }
+    stored = {
+        group_key(row): tuple(row[name] for name in ('parcels',) + MEASURE_COLUMNS)
+        for row in db.execute(select(AssessmentRollup.__table__)).mappings()
+    }
+    return sorted(key for key in expected.keys() | stored.keys() if expected.get(key) != stored.get(key))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--check', action='store_true', help='report groups that drifted instead of rebuilding')
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.check:
+            drift = find_drift(db)
+            for key in drift:
+                print('drift: ' + ' | '.join(key))
+            print(f'groups_drifted={len(drift)}')
+            sys.exit(1 if drift else 0)
+        print(f'groups={rebuild_rollup(db)}')
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,384 @@
+"""Columnar in-process snapshot of property_assessment_clean for distribution queries.
+
+Percentiles, histograms and value bands over the whole roll are answered from NumPy
+arrays held by each worker rather than by Postgres. Text columns are stored as int32
+codes into per-column category lists (code 0 stands for NULL) and numeric columns as
+float64 arrays (NaN stands for NULL): 57 bytes per row for the arrays, plus the TDN
+strings and their index, about 16 MB per 100k rows in all.
+
+The snapshot is loaded on first use and then kept in step with the table version
+(``database/table_versions.py``): the keys logged in table_changes by the versions it
+missed are re-read and patched into a copy of the arrays, which then replaces the
+current snapshot, so requests never see a half-applied change. A missing log entry,
+from a write that did not record its keys, makes it reload instead, and so do more
+changed keys than :data:`PATCH_MAX_RATIO` of the rows, which a bulk load or a
+revaluation produces and which a reload applies faster.
+
+Requires NumPy, and can be turned off with ``ASSESSMENT_SNAPSHOT=false``.
+"""
+import os
+import sys
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import Float, cast, select
+from sqlalchemy.orm import Session
+
+from database.table_versions import get_changed_keys, get_table_version
+from models.property_assessment_model import PropertyAssessmentClean
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - the analytics snapshot is optional
+    np = None
+
+SNAPSHOT_ENABLED = os.getenv('ASSESSMENT_SNAPSHOT', 'true').lower() in ('1', 'true', 'yes')
+
+CATEGORY_COLUMNS = ('tdn', 'mun_code', 'barangay_code', 'classification', 'taxability')
+NUMERIC_COLUMNS = ('market_val', 'ass_value', 'ass_level', 'area')
+LOAD_CHUNK_ROWS = 50000
+# Slots of deleted rows are compacted away once they exceed this share of the arrays
+COMPACT_RATIO = 0.25
+# Share of the rows above which missed changes are reloaded rather than applied
+PATCH_MAX_RATIO = 0.05
+
+
+class Categories:
+    """Append-only mapping between the values of a text column and their int32 codes."""
+
+    def __init__(self):
+        self.values: List[Optional[str]] = [None]
+        self.codes: Dict[Optional[str], int] = {None: 0}
+
+    def code(self, value: Optional[str]) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def nbytes(self) -> int:
+        return (
+            sys.getsizeof(self.values)
+            + sys.getsizeof(self.codes)
+            + sum(sys.getsizeof(value) for value in self.values if value is not None)
+        )
+
+
+class Snapshot:
+    """Immutable arrays of every row of property_assessment_clean at one table version.
+
+    Rows live in slots; ``alive`` is false for the slots of deleted rows until the
+    next compaction. ``slots`` maps the code of each TDN to its slot, or -1 once the
+    row is deleted.
+    """
+
+    def __init__(self, version: int, categories: Dict[str, Categories], codes: Dict[str, 'np.ndarray'],
+                 numbers: Dict[str, 'np.ndarray'], alive: 'np.ndarray', slots: 'np.ndarray'):
+        self.version = version
+        self.categories = categories
+        self.codes = codes
+        self.numbers = numbers
+        self.alive = alive
+        self.slots = slots
+        self.rows = int(np.count_nonzero(alive))
+        self._orders: Dict[str, 'np.ndarray'] = {}
+
+    def nbytes(self) -> Dict[str, int]:
+        """Return the memory held by the arrays and by the category indexes."""
+        arrays = sum(a.nbytes for a in (self.alive, self.slots, *self.codes.values(), *self.numbers.values()))
+        indexes = sum(c.nbytes() for c in self.categories.values())
+        return {'arrays': arrays, 'indexes': indexes}
+
+    def value_order(self, column: str) -> 'np.ndarray':
+        """Return the slots sorted by the value of ``column``, NULLs last.
+
+        Computed on first use and kept for the lifetime of the snapshot.
+        """
+        order = self._orders.get(column)
+        if order is None:
+            order = self._orders[column] = np.argsort(self.numbers[column]).astype(np.int32)
+        return order
+
+    def mask(self, filters: Dict[str, Optional[str]], column: Optional[str] = None,
+             minimum: Optional[float] = None, maximum: Optional[float] = None) -> 'np.ndarray':
+        """Return the live rows matching exact category filters and an inclusive value range.
+
+        Args:
+            filters: Category column to value; ``None`` values are ignored.
+            column: Numeric column the range applies to; rows where it is NULL are
+                excluded whenever ``column`` is given.
+            minimum: Lowest value kept.
+            maximum: Highest value kept.
+        """
+        selected = self.alive.copy()
+        for name, value in filters.items():
+            if value is None:
+                continue
+            code = self.categories[name].codes.get(value)
+            if code is None:
+                return np.zeros_like(selected)
+            selected &= self.codes[name] == code
+        if column is not None:
+            values = self.numbers[column]
+            selected &= ~np.isnan(values)
+            if minimum is not None:
+                selected &= values >= minimum
+            if maximum is not None:
+                selected &= values <= maximum
+        return selected
+
+    def _groups(self, column: str, by: Optional[str], selected: 'np.ndarray'):
+        """Sort the selected values by group, then by value.
+
+        The slots are taken in value order and then stably sorted by group code, which
+        for up to 65536 categories NumPy does with a radix sort.
+
+        Returns:
+            The group codes, the start and length of each group in the sorted values,
+            and the sorted values.
+        """
+        order = self.value_order(column)
+        values = self.numbers[column]
+        order = order[selected[order] & ~np.isnan(values[order])]
+        values = values[order]
+        if by:
+            codes = self.codes[by][order]
+            if len(self.categories[by].values) <= 65536:
+                codes = codes.astype(np.uint16)
+            regroup = np.argsort(codes, kind='stable')
+            values, codes = values[regroup], codes[regroup]
+        else:
+            codes = np.zeros(len(values), dtype=np.uint16)
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.zeros(0, dtype=np.intp)
+        counts = np.diff(np.r_[starts, len(codes)])
+        return codes[starts], starts, counts, values
+
+    def _label(self, by: Optional[str], code: int) -> Optional[str]:
+        return self.categories[by].values[code] if by else None
+
+    def percentiles(self, column: str, by: Optional[str], quantiles: Sequence[float],
+                    selected: 'np.ndarray') -> List[dict]:
+        """Return the linearly interpolated percentiles of ``column`` per group."""
+        group_codes, starts, counts, values = self._groups(column, by, selected)
+        if not len(values):
+            return []
+        # Fractional position of each percentile within each group, as np.percentile
+        positions = starts[:, None] + (counts[:, None] - 1) * (np.asarray(quantiles) / 100)[None, :]
+        lower = np.floor(positions).astype(np.intp)
+        upper = np.ceil(positions).astype(np.intp)
+        results = values[lower] + (values[upper] - values[lower]) * (positions - lower)
+        return [
+            {
+                'group': self._label(by, code),
+                'count': int(count),
+                'percentiles': dict(zip((f'{q:g}' for q in quantiles), row)),
+            }
+            for code, count, row in zip(group_codes.tolist(), counts.tolist(), results.tolist())
+        ]
+
+    def aggregate(self, column: str, by: Optional[str], selected: 'np.ndarray') -> List[dict]:
+        """Return the count, sum, mean, minimum and maximum of ``column`` per group."""
+        selected = selected & ~np.isnan(self.numbers[column])
+        values = self.numbers[column][selected]
+        codes = self.codes[by][selected] if by else np.zeros(len(values), dtype=np.int32)
+        size = len(self.categories[by].values) if by else 1
+        counts = np.bincount(codes, minlength=size)
+        sums = np.bincount(codes, weights=values, minlength=size)
+        minimums = np.full(size, np.inf)
+        maximums = np.full(size, -np.inf)
+        np.minimum.at(minimums, codes, values)
+        np.maximum.at(maximums, codes, values)
+        return [
+            {'group': self._label(by, code), 'count': int(counts[code]), 'sum': float(sums[code]),
+             'mean': float(sums[code] / counts[code]), 'min': float(minimums[code]), 'max': float(maximums[code])}
+            for code in np.flatnonzero(counts).tolist()
+        ]
+
+    def histogram(self, column: str, bins: int, value_range: Optional[tuple], selected: 'np.ndarray') -> dict:
+        """Return ``bins`` equal-width bin counts of ``column`` and their edges."""
+        values = self.numbers[column][selected]
+        counts, edges = np.histogram(values[~np.isnan(values)], bins=bins, range=value_range)
+        return {'counts': counts.tolist(), 'edges': edges.tolist()}
+
+    def bands(self, column: str, edges: Sequence[float], by: Optional[str], selected: 'np.ndarray') -> List[dict]:
+        """Return the count and sum of ``column`` per group and value band.
+
+        Band ``i`` holds values from ``edges[i]`` up to, but excluding, ``edges[i + 1]``;
+        the last band is open-ended and values below ``edges[0]`` are left out.
+        """
+        selected = selected & ~np.isnan(self.numbers[column])
+        values = self.numbers[column][selected]
+        codes = self.codes[by][selected] if by else np.zeros(len(values), dtype=np.int32)
+        band = np.searchsorted(np.asarray(edges), values, side='right') - 1
+        kept = band >= 0
+        cells = codes[kept].astype(np.int64) * len(edges) + band[kept]
+        size = (len(self.categories[by].values) if by else 1) * len(edges)
+        counts = np.bincount(cells, minlength=size)
+        sums = np.bincount(cells, weights=values[kept], minlength=size)
+        bands = []
+        for cell in np.flatnonzero(counts).tolist():
+            code, position = divmod(cell, len(edges))
+            bands.append({
+                'group': self._label(by, code),
+                'lower': edges[position],
+                'upper': edges[position + 1] if position + 1 < len(edges) else None,
+                'count': int(counts[cell]),
+                'sum': float(sums[cell]),
+            })
+        return bands
+
+    def tdns(self, selected: 'np.ndarray', limit: int) -> List[str]:
+        """Return up to ``limit`` TDNs of the selected rows, in slot order."""
+        values = self.categories['tdn'].values
+        return [values[code] for code in self.codes['tdn'][np.flatnonzero(selected)[:limit]].tolist()]
+
+
+def _row_query():
+    table = PropertyAssessmentClean.__table__
+    return select(
+        *(table.c[name] for name in CATEGORY_COLUMNS),
+        *(cast(table.c[name], Float).label(name) for name in NUMERIC_COLUMNS),
+    )
+
+
+def load_snapshot(db: Session) -> Snapshot:
+    """Read every row of property_assessment_clean into a new snapshot."""
+    version = get_table_version(db, PropertyAssessmentClean.__tablename__)
+    categories = {name: Categories() for name in CATEGORY_COLUMNS}
+    codes = {name: [] for name in CATEGORY_COLUMNS}
+    numbers = {name: [] for name in NUMERIC_COLUMNS}
+    result = db.execute(_row_query().execution_options(yield_per=LOAD_CHUNK_ROWS))
+    for rows in result.partitions():
+        columns = list(zip(*rows))
+        for position, name in enumerate(CATEGORY_COLUMNS):
+            code = categories[name].code
+            codes[name].append(np.fromiter((code(value) for value in columns[position]), np.int32, len(rows)))
+        for position, name in enumerate(NUMERIC_COLUMNS, start=len(CATEGORY_COLUMNS)):
+            numbers[name].append(np.array(columns[position], dtype=np.float64))
+
+    def join(chunks: List['np.ndarray'], dtype) -> 'np.ndarray':
+        return np.concatenate(chunks) if chunks else np.zeros(0, dtype=dtype)
+
+    codes = {name: join(chunks, np.int32) for name, chunks in codes.items()}
+    numbers = {name: join(chunks, np.float64) for name, chunks in numbers.items()}
+    rows = len(codes['tdn'])
+    return Snapshot(version, categories, codes, numbers, np.ones(rows, dtype=bool), _slots(categories, codes['tdn']))
+
+
+def _slots(categories: Dict[str, Categories], tdn_codes: 'np.ndarray') -> 'np.ndarray':
+    slots = np.full(len(categories['tdn'].values), -1, dtype=np.int32)
+    slots[tdn_codes] = np.arange(len(tdn_codes), dtype=np.int32)
+    return slots
+
+
+def apply_changes(db: Session, snapshot: Snapshot, keys: Iterable[str], version: int) -> Snapshot:
+    """Return a copy of ``snapshot`` with the current state of the rows of ``keys``.
+
+    Categories are append-only and shared with the copy; arrays are copied, so the
+    original snapshot stays valid for the requests still reading it.
+    """
+    keys = list(keys)
+    table = PropertyAssessmentClean.__table__
+    fetched = {}
+    for start in range(0, len(keys), LOAD_CHUNK_ROWS):
+        chunk = keys[start:start + LOAD_CHUNK_ROWS]
+        fetched.update((row.tdn, row) for row in db.execute(_row_query().where(table.c.tdn.in_(chunk))))
+
+    tdn_categories = snapshot.categories['tdn']
+    alive = snapshot.alive.copy()
+    slots = snapshot.slots.copy()
+    for key in keys:
+        code = tdn_categories.codes.get(key)
+        if key not in fetched and code is not None and code < len(slots) and slots[code] >= 0:
+            alive[slots[code]] = False
+            slots[code] = -1
+    tdn_codes = {key: tdn_categories.code(key) for key in fetched}
+    slots = np.concatenate([slots, np.full(len(tdn_categories.values) - len(slots), -1, dtype=np.int32)])
+    appended = [key for key, code in tdn_codes.items() if slots[code] < 0]
+    size = len(alive)
+    slots[[tdn_codes[key] for key in appended]] = np.arange(size, size + len(appended), dtype=np.int32)
+    alive = np.concatenate([alive, np.ones(len(appended), dtype=bool)])
+
+    targets = slots[[tdn_codes[key] for key in fetched]]
+    codes = {}
+    for name in CATEGORY_COLUMNS:
+        column = np.concatenate([snapshot.codes[name], np.zeros(len(appended), dtype=np.int32)])
+        code = snapshot.categories[name].code
+        column[targets] = [code(getattr(row, name)) for row in fetched.values()]
+        codes[name] = column
+    numbers = {}
+    for name in NUMERIC_COLUMNS:
+        column = np.concatenate([snapshot.numbers[name], np.full(len(appended), np.nan)])
+        column[targets] = np.array([getattr(row, name) for row in fetched.values()], dtype=np.float64)
+        numbers[name] = column
+
+    updated = Snapshot(version, snapshot.categories, codes, numbers, alive, slots)
+    if len(alive) - updated.rows > COMPACT_RATIO * len(alive):
+        updated = _compact(updated)
+    return updated
+
+
+def _compact(snapshot: Snapshot) -> Snapshot:
+    keep = np.flatnonzero(snapshot.alive)
+    codes = {name: column[keep] for name, column in snapshot.codes.items()}
+    numbers = {name: column[keep] for name, column in snapshot.numbers.items()}
+    slots = _slots(snapshot.categories, codes['tdn'])
+    return Snapshot(snapshot.version, snapshot.categories, codes, numbers, np.ones(len(keep), dtype=bool), slots)
+
+
+class SnapshotStore:
+    """The snapshot of one worker process, brought up to date on each use."""
+
+    def __init__(self):
+        self.current: Optional[Snapshot] = None
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        return SNAPSHOT_ENABLED and np is not None
+
+    def get(self, db: Session) -> Snapshot:
+        """Return a snapshot at the current table version.
+
+        While another request is updating the snapshot, the previous one is returned
+        rather than waiting; its ``version`` says which table version it reflects.
+        """
+        table_name = PropertyAssessmentClean.__tablename__
+        snapshot = self.current
+        if snapshot is not None and snapshot.version == get_table_version(db, table_name):
+            return snapshot
+        if not self._lock.acquire(blocking=snapshot is None):
+            return snapshot
+        try:
+            snapshot = self.current
+            version = get_table_version(db, table_name)
+            if snapshot is None:
+                snapshot = load_snapshot(db)
+            elif snapshot.version != version:
+                limit = int(PATCH_MAX_RATIO * snapshot.rows)
+                keys = get_changed_keys(db, table_name, snapshot.version, version, limit)
+                snapshot = load_snapshot(db) if keys is None else apply_changes(db, snapshot, keys, version)
+            self.current = snapshot
+            return snapshot
+        finally:
+            self._lock.release()
+
+    def stats(self) -> Dict:
+        """Return the size of the current snapshot, including its memory per 100k rows."""
+        snapshot = self.current
+        if snapshot is None:
+            return {'loaded': False}
+        nbytes = snapshot.nbytes()
+        total = nbytes['arrays'] + nbytes['indexes']
+        return {
+            'loaded': True,
+            'version': snapshot.version,
+            'rows': snapshot.rows,
+            'slots': len(snapshot.alive),
+            'array_bytes': nbytes['arrays'],
+            'index_bytes': nbytes['indexes'],
+            'bytes_per_100k_rows': round(total * 100000 / snapshot.rows) if snapshot.rows else 0,
+        }
+
+
+assessment_snapshot = SnapshotStore()
@@ -0,0 +1,332 @@
+"""Revaluation of property_assessment_clean against a new schedule of market values.
+
+The job walks the table in ``tdn`` order, one chunk at a time. Each chunk is read with
+a keyset query (``tdn > last tdn of the previous chunk``) and revalued in bulk:
+
+- ``market_val = area * unit_value``, with the unit value of the classification in
+  the barangay, else in the municipality, else province-wide; rows without a unit
+  value keep their market value;
+- ``ass_level`` from the assessment levels of the classification for the new market
+  value, the current level when the schedule has none;
+- ``ass_value = market_val * ass_level / 100``.
+
+The rows whose figures change are written with one ``UPDATE ... FROM (VALUES ...)``
+per chunk, together with their assessment_rollup totals, the change version of the
+table and the job checkpoint, and committed. A job that stops resumes after the last
+committed chunk when run again with the same name and schedule; ``--restart`` starts
+it over.
+
+``--dry-run`` writes nothing and reports how the totals of every municipality would
+change.
+
+The schedule is a JSON file such as::
+
+    {
+        "unit_values": [
+            {"classification": "Residential", "unit_value": 1200},
+            {"classification": "Residential", "mun_code": "01", "unit_value": 1500},
+            {"classification": "Residential", "mun_code": "01", "barangay_code": "001",
+             "unit_value": 2100}
+        ],
+        "assessment_levels": {
+            "Residential": [[175000, 5], [null, 20]],
+            "Agricultural": 40
+        }
+    }
+
+Usage:
+    python -m services.revaluation schedule.json --dry-run
+    python -m services.revaluation schedule.json --job revision-2026
+"""
+import argparse
+import hashlib
+import sys
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from sqlalchemy import cast, column, select, update
+from sqlalchemy import values as values_clause
+from sqlalchemy.orm import Session
+
+from database.database import SessionLocal
+from database.table_versions import bump_table_version
+from models.property_assessment_model import PropertyAssessmentClean
+from models.revaluation_model import RevaluationCheckpoint
+from schemas.revaluation_schema import MunicipalityDelta, RevaluationReport, RevaluationSchedule
+from services.assessment_rollup import ROLLUP_COLUMNS, apply_changes
+from services.valuation import LevelTable, assessment_levels
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - the job refuses to run without NumPy
+    np = None
+
+CHUNK_SIZE = 5000
+READ_COLUMNS = ('tdn',) + ROLLUP_COLUMNS + ('ass_level',)
+WRITE_COLUMNS = ('market_val', 'ass_level', 'ass_value')
+# Differences below half a centavo are rounding, not changes
+EPSILON = 0.005
+
+# Per municipality: rows, changed, market_val before and after, ass_value before and after
+_DELTA_FIELDS = ('rows', 'changed', 'market_val_before', 'market_val_after', 'ass_value_before', 'ass_value_after')
+
+
+def schedule_hash(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _key(value: Optional[str]) -> str:
+    return (value or '').strip().lower()
+
+
+class Schedule:
+    """Lookup tables of a :class:`RevaluationSchedule`."""
+
+    def __init__(self, schedule: RevaluationSchedule):
+        self.unit_values: Dict[Tuple[str, str, str], float] = {
+            (_key(entry.classification), _key(entry.mun_code), _key(entry.barangay_code)): float(entry.unit_value)
+            for entry in schedule.unit_values
+        }
+        self.levels: LevelTable = {
+            name: (
+                [(float('inf'), float(brackets))]
+                if isinstance(brackets, (int, float))
+                else [(float('inf') if bound is None else bound, level) for bound, level in brackets]
+            )
+            for name, brackets in schedule.assessment_levels.items()
+        }
+
+    def unit_value(self, classification: Optional[str], mun_code: Optional[str], barangay_code: Optional[str]) -> float:
+        """Most specific unit value of a place and classification, NaN if there is none."""
+        name, mun, barangay = _key(classification), _key(mun_code), _key(barangay_code)
+        for place in ((mun, barangay), (mun, ''), ('', '')):
+            value = self.unit_values.get((name,) + place)
+            if value is not None:
+                return value
+        return np.nan
+
+
+def _array(rows: Sequence[Mapping], name: str) -> 'np.ndarray':
+    return np.fromiter((np.nan if row[name] is None else row[name] for row in rows), np.float64, len(rows))
+
+
+def revalue(rows: Sequence[Mapping], schedule: Schedule) -> Dict[str, 'np.ndarray']:
+    """Compute the new figures of a chunk of rows.
+
+    Returns:
+        Dict[str, np.ndarray]: ``market_val``, ``ass_level`` and ``ass_value`` after
+        the revaluation, and ``changed``, the mask of rows whose figures differ.
+    """
+    places = [(row['classification'], row['mun_code'], row['barangay_code']) for row in rows]
+    # Each distinct place and classification is looked up once per chunk
+    lookup = {place: schedule.unit_value(*place) for place in dict.fromkeys(places)}
+    unit_values = np.fromiter((lookup[place] for place in places), np.float64, len(rows))
+
+    market_val, ass_level, ass_value = (_array(rows, name) for name in WRITE_COLUMNS)
+    area = _array(rows, 'area')
+    priced = ~np.isnan(unit_values) & ~np.isnan(area)
+    new_market = np.where(priced, np.round(area * unit_values, 2), market_val)
+    levels = assessment_levels([row['classification'] for row in rows], np.nan_to_num(new_market), schedule.levels)
+    new_level = np.where(np.isnan(levels), ass_level, levels)
+    valued = ~np.isnan(new_market) & ~np.isnan(new_level)
+    new_value = np.where(valued, np.round(np.nan_to_num(new_market) * np.nan_to_num(new_level) / 100, 2), ass_value)
+
+    changed = np.zeros(len(rows), bool)
+    for before, after in ((market_val, new_market), (ass_level, new_level), (ass_value, new_value)):
+        # NaN never equals itself, so compare the missing values separately
+        changed |= np.isnan(before) != np.isnan(after)
+        changed |= np.abs(np.nan_to_num(before) - np.nan_to_num(after)) >= EPSILON
+    return {'market_val': new_market, 'ass_level': new_level, 'ass_value': new_value, 'changed': changed}
+
+
+def _accumulate(totals: Dict[str, 'np.ndarray'], rows: Sequence[Mapping], result: Dict[str, 'np.ndarray']) -> None:
+    """Add the per-municipality deltas of a chunk to ``totals``."""
+    municipalities, inverse = np.unique(np.array([row['mun_code'] or '' for row in rows], dtype=object),
+                                        return_inverse=True)
+    columns = (
+        np.ones(len(rows)),
+        result['changed'].astype(np.float64),
+        np.nan_to_num(_array(rows, 'market_val')),
+        np.nan_to_num(result['market_val']),
+        np.nan_to_num(_array(rows, 'ass_value')),
+        np.nan_to_num(result['ass_value']),
+    )
+    sums = np.stack([np.bincount(inverse, weights=values, minlength=len(municipalities)) for values in columns], 1)
+    for municipality, row in zip(municipalities, sums):
+        totals[municipality] = totals.get(municipality, 0) + row
+
+
+def _read_chunk(db: Session, after: Optional[str], size: int, lock: bool) -> List[Mapping]:
+    table = PropertyAssessmentClean.__table__
+    statement = select(*(table.c[name] for name in READ_COLUMNS)).order_by(table.c.tdn).limit(size)
+    if after is not None:
+        statement = statement.where(table.c.tdn > after)
+    if lock:
+        statement = statement.with_for_update()
+    return db.execute(statement).mappings().all()
+
+
+def _write_chunk(db: Session, rows: Sequence[Mapping], result: Dict[str, 'np.ndarray']) -> List[str]:
+    """Update the changed rows of a chunk and their rollup totals; return their TDNs."""
+    table = PropertyAssessmentClean.__table__
+    positions = np.flatnonzero(result['changed'])
+    if not len(positions):
+        return []
+
+    def number(value: float) -> Optional[Decimal]:
+        return None if np.isnan(value) else Decimal(f'{value:.2f}')
+
+    data = [
+        (rows[position]['tdn'],) + tuple(number(result[name][position]) for name in WRITE_COLUMNS)
+        for position in positions
+    ]
+    new_rows = values_clause(
+        *(column(name, table.c[name].type) for name in ('tdn',) + WRITE_COLUMNS), name='revalued'
+    ).data(data)
+    db.execute(
+        update(table)
+        .where(table.c.tdn == new_rows.c.tdn)
+        # Casts give the VALUES columns their types even when every value is NULL
+        .values({name: cast(new_rows.c[name], table.c[name].type) for name in WRITE_COLUMNS})
+    )
+    before = [rows[position] for position in positions]
+    after = [{**row, **dict(zip(WRITE_COLUMNS, values[1:]))} for row, values in zip(before, data)]
+    apply_changes(db, added=after, removed=before)
+    return [row[0] for row in data]
+
+
+def _start(db: Session, job: str, digest: str, restart: bool) -> RevaluationCheckpoint:
+    """Return the checkpoint of ``job``, creating or resetting it as needed."""
+    checkpoint = db.get(RevaluationCheckpoint, job, with_for_update=True)
+    now = datetime.now()
+    if checkpoint is not None and checkpoint.schedule_hash != digest and not restart:
+        raise ValueError(f'Job {job} was started with a different schedule; pass --restart to start it over')
+    if checkpoint is None:
+        checkpoint = RevaluationCheckpoint(job=job)
+        db.add(checkpoint)
+    if restart or checkpoint.started_at is None:
+        checkpoint.schedule_hash = digest
+        checkpoint.last_tdn = None
+        checkpoint.rows_scanned = 0
+        checkpoint.rows_changed = 0
+        checkpoint.started_at = now
+        checkpoint.finished_at = None
+    checkpoint.updated_at = now
+    db.commit()
+    return checkpoint
+
+
+def run_revaluation(
+    db: Session,
+    schedule: RevaluationSchedule,
+    job: str,
+    digest: str,
+    chunk_size: int = CHUNK_SIZE,
+    dry_run: bool = False,
+    restart: bool = False,
+) -> RevaluationReport:
+    """Revalue property_assessment_clean chunk by chunk.
+
+    Args:
+        db: Database session.
+        schedule: Unit values and assessment levels to apply.
+        job: Name of the job, the key of its checkpoint.
+        digest: Hash of the schedule, see :func:`schedule_hash`.
+        chunk_size: Rows read, written and committed at a time.
+        dry_run: Only compute the deltas, without writing or checkpointing.
+        restart: Start the job over instead of resuming it.
+
+    Returns:
+        RevaluationReport: Rows revalued and the deltas per municipality of this run;
+        ``rows_scanned`` and ``rows_changed`` count the whole job when it resumed.
+
+    Raises:
+        ValueError: If the job was started with a different schedule.
+    """
+    if np is None:
+        raise RuntimeError('Revaluation requires NumPy')
+    lookup = Schedule(schedule)
+    report = RevaluationReport(job=job, dry_run=dry_run)
+    checkpoint = None
+    after = None
+    if not dry_run:
+        checkpoint = _start(db, job, digest, restart)
+        if checkpoint.finished_at is not None:
+            report.rows_scanned, report.rows_changed = checkpoint.rows_scanned, checkpoint.rows_changed
+            return report
+        after = report.resumed_after = checkpoint.last_tdn
+        report.rows_scanned, report.rows_changed = checkpoint.rows_scanned, checkpoint.rows_changed
+
+    totals: Dict[str, 'np.ndarray'] = {}
+    table_name = PropertyAssessmentClean.__tablename__
+    while True:
+        rows = _read_chunk(db, after, chunk_size, lock=not dry_run)
+        if not rows:
+            break
+        result = revalue(rows, lookup)
+        _accumulate(totals, rows, result)
+        after = rows[-1]['tdn']
+        report.chunks += 1
+        report.rows_scanned += len(rows)
+        report.rows_changed += int(result['changed'].sum())
+        if dry_run:
+            continue
+        changed = _write_chunk(db, rows, result)
+        if changed:
+            bump_table_version(db, table_name, changed)
+        checkpoint.last_tdn = after
+        checkpoint.rows_scanned = report.rows_scanned
+        checkpoint.rows_changed = report.rows_changed
+        checkpoint.updated_at = datetime.now()
+        db.commit()
+
+    if not dry_run:
+        checkpoint.finished_at = datetime.now()
+        db.commit()
+    else:
+        db.rollback()
+    report.municipalities = [
+        MunicipalityDelta(mun_code=municipality or None, **dict(zip(_DELTA_FIELDS, sums.tolist())))
+        for municipality, sums in sorted(totals.items())
+    ]
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('schedule', help='JSON file with the unit values and assessment levels')
+    parser.add_argument('--job', help='name of the job to start or resume, defaults to the schedule file name')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--dry-run', action='store_true', help='report the deltas per municipality without writing')
+    parser.add_argument('--restart', action='store_true', help='start the job over instead of resuming it')
+    args = parser.parse_args()
+
+    with open(args.schedule, 'rb') as stream:
+        raw = stream.read()
+    schedule = RevaluationSchedule.model_validate_json(raw)
+    job = args.job or args.schedule
+    db = SessionLocal()
+    try:
+        report = run_revaluation(db, schedule, job, schedule_hash(raw), args.chunk_size, args.dry_run, args.restart)
+    except ValueError as error:
+        sys.exit(str(error))
+    finally:
+        db.close()
+
+    for delta in report.municipalities:
+        print(
+            f'mun_code={delta.mun_code or "-"} rows={delta.rows} changed={delta.changed} '
+            f'market_val={delta.market_val_before:.2f}->{delta.market_val_after:.2f} '
+            f'({delta.market_val_after - delta.market_val_before:+.2f}) '
+            f'ass_value={delta.ass_value_before:.2f}->{delta.ass_value_after:.2f} '
+            f'({delta.ass_value_after - delta.ass_value_before:+.2f})'
+        )
+    print(
+        f'job={report.job} dry_run={report.dry_run} resumed_after={report.resumed_after or "-"} '
+        f'chunks={report.chunks} rows_scanned={report.rows_scanned} rows_changed={report.rows_changed}'
+    )
+
+
+if __name__ == '__main__':
+    main()
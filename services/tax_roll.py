@@ -0,0 +1,321 @@
+"""Annual real property tax roll generated from property_assessment_clean.
+
+Every assessment is levied on its assessed value at the rates of its municipality for
+the tax year in tax_rates, falling back to the province-wide row (empty ``mun_code``):
+
+- ``basic_tax = ass_value * basic_rate / 100``, the basic real property tax;
+- ``sef_tax = ass_value * sef_rate / 100``, the Special Education Fund levy;
+- ``total_tax = basic_tax + sef_tax``.
+
+Parcels whose taxability is one of :data:`EXEMPT_TAXABILITY` are listed with no levy,
+and parcels of a municipality without rates are listed as ``unrated`` with empty
+levies rather than stopping the roll.
+
+The assessments are read through a server-side cursor in chunks and each chunk is
+levied with NumPy and appended to the roll (one row group per chunk for Parquet), so
+the whole province is written in one pass with at most one chunk in memory. The totals
+per municipality are written next to the roll.
+
+Usage:
+    python -m services.tax_roll 2027 roll-2027.csv
+    python -m services.tax_roll 2027 roll-2027.parquet --totals totals-2027.csv
+"""
+import argparse
+import csv
+import os
+import sys
+from typing import IO, Dict, Iterator, List, Mapping, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database.database import SessionLocal
+from models.property_assessment_model import PropertyAssessmentClean
+from models.tax_rate_model import TaxRate
+from schemas.tax_roll_schema import MunicipalityLevy, ParcelStatus, TaxRollFormat, TaxRollReport
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - the roll refuses to run without NumPy
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - Parquet rolls are optional
+    pa = None
+    pq = None
+
+CHUNK_SIZE = 20000
+# Taxability values, compared case-insensitively, of parcels exempt from the levy
+EXEMPT_TAXABILITY = frozenset({'exempt', 'exempted', 'non-taxable', 'nontaxable'})
+
+READ_COLUMNS = (
+    'tdn', 'mun_code', 'municipality', 'barangay_code', 'barangay', 'classification', 'taxability', 'ass_value',
+)
+LEVY_COLUMNS = ('basic_rate', 'sef_rate', 'basic_tax', 'sef_tax', 'total_tax')
+ROLL_COLUMNS = READ_COLUMNS + LEVY_COLUMNS + ('status',)
+
+# Per municipality: parcels, taxable, exempt, unrated, assessed values, levies
+_TOTAL_FIELDS = (
+    'parcels', 'taxable', 'exempt', 'unrated', 'taxable_ass_value', 'exempt_ass_value',
+    'basic_tax', 'sef_tax', 'total_tax',
+)
+
+Rates = Dict[str, Tuple[float, float]]
+
+
+def load_rates(db: Session, tax_year: int) -> Rates:
+    """Return the (basic, SEF) rates of ``tax_year`` by municipality code."""
+    rows = db.execute(
+        select(TaxRate.mun_code, TaxRate.basic_rate, TaxRate.sef_rate).where(TaxRate.tax_year == tax_year)
+    )
+    return {mun_code or '': (float(basic), float(sef)) for mun_code, basic, sef in rows}
+
+
+def iter_assessments(db: Session, chunk_size: int) -> Iterator[Sequence[Tuple]]:
+    """Yield the roll columns of every assessment in ``tdn`` order, a chunk at a time."""
+    table = PropertyAssessmentClean.__table__
+    statement = (
+        select(*(table.c[name] for name in READ_COLUMNS))
+        .order_by(table.c.tdn)
+        .execution_options(yield_per=chunk_size)
+    )
+    yield from db.execute(statement).partitions()
+
+
+def _cents(values: 'np.ndarray') -> 'np.ndarray':
+    return np.rint(values * 100).astype(np.int64)
+
+
+def _levy_cents(ass_cents: 'np.ndarray', rate: 'np.ndarray') -> 'np.ndarray':
+    """Levy in centavos of assessed values in centavos at a rate in percent, rounded half up."""
+    # The rate in millionths of the value, and the value split so no product overflows
+    millionths = np.rint(np.nan_to_num(rate) * 10000).astype(np.int64)
+    quotient, remainder = np.divmod(ass_cents, 1000000)
+    return quotient * millionths + (remainder * millionths + 500000) // 1000000
+
+
+def levy(rows: Sequence[Sequence], rates: Rates) -> Dict[str, 'np.ndarray']:
+    """Compute the levies of a chunk of rows read with :data:`READ_COLUMNS`.
+
+    The levies are computed in whole centavos and rounded half up like ``ROUND`` in
+    SQL, rather than in floating point pesos.
+
+    Returns:
+        Dict[str, np.ndarray]: ``ass_value`` and the :data:`LEVY_COLUMNS` in pesos
+        (NaN for unrated parcels), the levies in centavos as ``<levy>_cents``, and the
+        ``taxable``, ``exempt`` and ``unrated`` masks.
+    """
+    mun_column, taxability_column, value_column = (READ_COLUMNS.index(name) for name in
+                                                   ('mun_code', 'taxability', 'ass_value'))
+    municipalities = [row[mun_column] or '' for row in rows]
+    # Each municipality is looked up once per chunk
+    lookup = {mun: rates.get(mun, rates.get('', (np.nan, np.nan))) for mun in dict.fromkeys(municipalities)}
+    basic_rate, sef_rate = (
+        np.fromiter((lookup[mun][position] for mun in municipalities), np.float64, len(rows)) for position in (0, 1)
+    )
+    ass_value = np.fromiter((row[value_column] or 0 for row in rows), np.float64, len(rows))
+    exempt = np.fromiter(
+        ((row[taxability_column] or '').strip().lower() in EXEMPT_TAXABILITY for row in rows), bool, len(rows)
+    )
+    unrated = ~exempt & np.isnan(basic_rate)
+    taxable = ~exempt & ~unrated
+
+    ass_cents = np.where(taxable, _cents(ass_value), 0)
+    result = {
+        'ass_value': ass_value,
+        'basic_rate': np.where(exempt, np.nan, basic_rate),
+        'sef_rate': np.where(exempt, np.nan, sef_rate),
+        'basic_tax_cents': _levy_cents(ass_cents, basic_rate),
+        'sef_tax_cents': _levy_cents(ass_cents, sef_rate),
+        'taxable': taxable,
+        'exempt': exempt,
+        'unrated': unrated,
+    }
+    result['total_tax_cents'] = result['basic_tax_cents'] + result['sef_tax_cents']
+    for name in ('basic_tax', 'sef_tax', 'total_tax'):
+        # Unrated parcels have no levy rather than a zero one
+        result[name] = np.where(unrated, np.nan, result[name + '_cents'] / 100)
+    return result
+
+
+def _status(result: Mapping[str, 'np.ndarray']) -> List[str]:
+    codes = np.where(result['exempt'], 1, np.where(result['unrated'], 2, 0))
+    names = [ParcelStatus.taxable.value, ParcelStatus.exempt.value, ParcelStatus.unrated.value]
+    return [names[code] for code in codes.tolist()]
+
+
+def _accumulate(totals: Dict[str, 'np.ndarray'], rows: Sequence[Sequence], result: Mapping[str, 'np.ndarray']) -> None:
+    """Add the per-municipality totals of a chunk to ``totals``."""
+    mun_column = READ_COLUMNS.index('mun_code')
+    municipalities, inverse = np.unique(
+        np.array([row[mun_column] or '' for row in rows], dtype=object), return_inverse=True
+    )
+    taxable = result['taxable'].astype(np.int64)
+    exempt = result['exempt'].astype(np.int64)
+    columns = (
+        np.ones(len(rows), np.int64),
+        taxable,
+        exempt,
+        result['unrated'].astype(np.int64),
+        _cents(result['ass_value']) * taxable,
+        _cents(result['ass_value']) * exempt,
+        *(result[name + '_cents'] for name in ('basic_tax', 'sef_tax', 'total_tax')),
+    )
+    # Counts and amounts in centavos, summed as integers so totals are exact
+    sums = np.zeros((len(municipalities), len(columns)), np.int64)
+    for position, values in enumerate(columns):
+        np.add.at(sums[:, position], inverse, values)
+    for municipality, row in zip(municipalities, sums):
+        totals[municipality] = totals.get(municipality, 0) + row
+
+
+class _CsvRoll:
+    def __init__(self, stream: IO[str]):
+        self.writer = csv.writer(stream)
+        self.writer.writerow(ROLL_COLUMNS)
+
+    def write(self, rows: Sequence[Sequence], result: Mapping[str, 'np.ndarray']) -> None:
+        def formatted(name: str, places: int) -> List[str]:
+            return [f'{value:.{places}f}' if value == value else '' for value in result[name].tolist()]
+
+        levies = [formatted(name, 4 if name.endswith('_rate') else 2) for name in LEVY_COLUMNS]
+        self.writer.writerows(
+            tuple(row) + levy_values + (status,)
+            for row, levy_values, status in zip(rows, zip(*levies), _status(result))
+        )
+
+    def close(self) -> None:
+        pass
+
+
+class _ParquetRoll:
+    def __init__(self, stream: IO[bytes]):
+        money = pa.decimal128(15, 2)
+        rate = pa.decimal128(6, 4)
+        self.schema = pa.schema(
+            [pa.field(name, pa.string()) for name in READ_COLUMNS[:-1]]
+            + [pa.field('ass_value', money)]
+            + [pa.field(name, rate if name.endswith('_rate') else money) for name in LEVY_COLUMNS]
+            + [pa.field('status', pa.string())]
+        )
+        self.writer = pq.ParquetWriter(stream, self.schema)
+
+    def write(self, rows: Sequence[Sequence], result: Mapping[str, 'np.ndarray']) -> None:
+        columns = list(zip(*rows))
+        arrays = [pa.array(values, type=field.type) for values, field in zip(columns, self.schema)]
+        arrays += [
+            pa.array(result[name], from_pandas=True).cast(self.schema.field(name).type) for name in LEVY_COLUMNS
+        ]
+        arrays.append(pa.array(_status(result), type=pa.string()))
+        self.writer.write_batch(pa.record_batch(arrays, schema=self.schema))
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+def generate_tax_roll(
+    db: Session,
+    tax_year: int,
+    stream: IO,
+    format: TaxRollFormat = TaxRollFormat.csv,
+    chunk_size: int = CHUNK_SIZE,
+) -> TaxRollReport:
+    """Write the tax roll of ``tax_year`` to ``stream``.
+
+    Args:
+        db: Database session.
+        tax_year: Year whose rates apply.
+        stream: Text stream for CSV, binary stream for Parquet.
+        format: Format of the roll.
+        chunk_size: Rows read, levied and written at a time.
+
+    Returns:
+        TaxRollReport: Parcel counts, assessed values and levies per municipality.
+
+    Raises:
+        ValueError: If the tax year has no rates at all.
+        RuntimeError: If NumPy, or pyarrow for Parquet, is not installed.
+    """
+    if np is None:
+        raise RuntimeError('The tax roll requires NumPy')
+    if format == TaxRollFormat.parquet and pa is None:
+        raise RuntimeError('Parquet tax rolls require pyarrow')
+    rates = load_rates(db, tax_year)
+    if not rates:
+        raise ValueError(f'No tax rates for {tax_year}')
+
+    roll = _ParquetRoll(stream) if format == TaxRollFormat.parquet else _CsvRoll(stream)
+    report = TaxRollReport(tax_year=tax_year, format=format)
+    totals: Dict[str, 'np.ndarray'] = {}
+    try:
+        for rows in iter_assessments(db, chunk_size):
+            result = levy(rows, rates)
+            roll.write(rows, result)
+            _accumulate(totals, rows, result)
+            report.parcels += len(rows)
+    finally:
+        roll.close()
+    report.municipalities = [
+        MunicipalityLevy(
+            mun_code=municipality or None,
+            **dict(zip(_TOTAL_FIELDS[:4], sums[:4].tolist())),
+            **dict(zip(_TOTAL_FIELDS[4:], (sums[4:] / 100).tolist())),
+        )
+        for municipality, sums in sorted(totals.items())
+    ]
+    return report
+
+
+def write_totals(stream: IO[str], report: TaxRollReport) -> None:
+    """Write the per-municipality totals of a roll as CSV."""
+    writer = csv.writer(stream)
+    writer.writerow(('mun_code',) + _TOTAL_FIELDS)
+    for totals in report.municipalities:
+        values = totals.model_dump()
+        writer.writerow([totals.mun_code or ''] + [
+            values[name] if isinstance(values[name], int) else f'{values[name]:.2f}' for name in _TOTAL_FIELDS
+        ])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('tax_year', type=int)
+    parser.add_argument('output', help='CSV or Parquet file to write the roll to')
+    parser.add_argument('--format', choices=[f.value for f in TaxRollFormat], help='defaults to the file extension')
+    parser.add_argument('--totals', help='CSV file for the totals per municipality, defaults to <output>.totals.csv')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    format = TaxRollFormat(args.format or os.path.splitext(args.output)[1].lstrip('.').lower())
+    partial_path = f'{args.output}.{os.getpid()}.partial'
+    db = SessionLocal()
+    try:
+        if format == TaxRollFormat.parquet:
+            stream = open(partial_path, 'wb')
+        else:
+            stream = open(partial_path, 'w', newline='', encoding='utf-8')
+        with stream:
+            report = generate_tax_roll(db, args.tax_year, stream, format, args.chunk_size)
+        os.replace(partial_path, args.output)
+    except (ValueError, RuntimeError) as error:
+        sys.exit(str(error))
+    finally:
+        db.close()
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+    with open(args.totals or f'{args.output}.totals.csv', 'w', newline='', encoding='utf-8') as stream:
+        write_totals(stream, report)
+    for totals in report.municipalities:
+        print(
+            f'mun_code={totals.mun_code or "-"} parcels={totals.parcels} exempt={totals.exempt} '
+            f'unrated={totals.unrated} basic_tax={totals.basic_tax:.2f} sef_tax={totals.sef_tax:.2f} '
+            f'total_tax={totals.total_tax:.2f}'
+        )
+    print(f'tax_year={report.tax_year} parcels={report.parcels}')
+
+
+if __name__ == '__main__':
+    main()
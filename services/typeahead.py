@@ -0,0 +1,219 @@
+"""In-process prefix index over owner names, PINs and TDNs for search-as-you-type.
+
+Each kind of key is kept in a sorted array of normalized keys searched with
+``bisect``, so a suggestion costs a binary search and a short scan instead of a
+database query per keystroke. The arrays are built from the database on first use.
+They are then maintained in place by the API write handlers, through :meth:`Typeahead.note_write`
+calls made after their commits.
+
+Every worker process keeps its own index, so writes made by other workers or outside
+the API are picked up by comparing the per-table change versions
+(``database/table_versions.py``) at most every ``TYPEAHEAD_REFRESH_SECONDS``. A source
+whose version moved by more than the writes this process applied itself is rebuilt.
+"""
+import bisect
+import os
+import threading
+import time
+import unicodedata
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database.database import SessionLocal
+from database.table_versions import get_table_version
+from models.ownerDetails_model import OwnerDetailsModel
+from models.property_assessment_model import PropertyAssessmentClean
+from schemas.suggest_schema import SuggestSource
+
+TYPEAHEAD_REFRESH_SECONDS = float(os.getenv('TYPEAHEAD_REFRESH_SECONDS', '30'))
+
+# An entry's display text and what it refers to: an owner ID or a TDN
+Entry = Tuple[str, object]
+
+
+# The table each source is read from, whose change version tells when it is stale
+SOURCE_TABLES = {
+    SuggestSource.owner: OwnerDetailsModel.__tablename__,
+    SuggestSource.pin: OwnerDetailsModel.__tablename__,
+    SuggestSource.tdn: PropertyAssessmentClean.__tablename__,
+}
+
+
+def normalize(value: str) -> str:
+    """Fold case, accents and whitespace so that ``'  Peña,  Juan'`` matches ``'pena, j'``."""
+    decomposed = unicodedata.normalize('NFKD', value)
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
+class PrefixIndex:
+    """Sorted array of ``(normalized key, display value, ref)`` searched by prefix.
+
+    Items live in one list so that each insert or delete is a single list operation,
+    letting searches run without a lock while a write handler updates the index.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, Entry]] = ()):
+        self.items: List[Tuple[str, str, object]] = sorted(
+            (key, value, ref) for key, (value, ref) in entries if key
+        )
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def search(self, prefix: str, limit: int) -> List[Entry]:
+        """Return up to ``limit`` entries whose key starts with ``prefix``, in key order."""
+        items = self.items
+        position = bisect.bisect_left(items, prefix, key=itemgetter(0))
+        matches = []
+        for key, value, ref in items[position:position + limit]:
+            if not key.startswith(prefix):
+                break
+            matches.append((value, ref))
+        return matches
+
+    def _find(self, key: str, ref: object) -> Optional[int]:
+        position = bisect.bisect_left(self.items, key, key=itemgetter(0))
+        while position < len(self.items) and self.items[position][0] == key:
+            if self.items[position][2] == ref:
+                return position
+            position += 1
+        return None
+
+    def add(self, key: str, entry: Entry) -> None:
+        if not key or self._find(key, entry[1]) is not None:
+            return
+        position = bisect.bisect_right(self.items, key, key=itemgetter(0))
+        self.items.insert(position, (key, entry[0], entry[1]))
+
+    def remove(self, key: str, ref: object) -> None:
+        position = self._find(key, ref) if key else None
+        if position is not None:
+            del self.items[position]
+
+
+def _load(db: Session, source: SuggestSource) -> PrefixIndex:
+    if source == SuggestSource.tdn:
+        rows = db.execute(select(PropertyAssessmentClean.tdn)).scalars()
+        return PrefixIndex((normalize(tdn), (tdn, tdn)) for tdn in rows)
+    column = OwnerDetailsModel.owner if source == SuggestSource.owner else OwnerDetailsModel.pin
+    rows = db.execute(select(OwnerDetailsModel.id, column).where(column.isnot(None)))
+    return PrefixIndex((normalize(value), (value, owner_id)) for owner_id, value in rows)
+
+
+class Typeahead:
+    """The prefix indexes of one worker process and the table versions they reflect."""
+
+    def __init__(self, refresh_seconds: float = TYPEAHEAD_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._indexes: Dict[SuggestSource, PrefixIndex] = {}
+        self._versions: Dict[SuggestSource, int] = {}
+        self._checked_at = float('-inf')
+        # Serializes rebuilds; _lock guards in-place updates and is never held while
+        # reading from the database
+        self._refresh_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+    def due(self) -> bool:
+        """Return whether :meth:`refresh` should run before serving a suggestion."""
+        return len(self._indexes) < len(SuggestSource) or time.monotonic() - self._checked_at >= self.refresh_seconds
+
+    def refresh(self) -> None:
+        """Build missing indexes and rebuild those whose table changed elsewhere.
+
+        Requests arriving while a rebuild runs keep using the previous arrays.
+        """
+        with self._refresh_lock:
+            if not self.due():
+                return
+            self._checked_at = time.monotonic()
+            db = SessionLocal()
+            try:
+                versions = {table: get_table_version(db, table) for table in set(SOURCE_TABLES.values())}
+                for source, table in SOURCE_TABLES.items():
+                    if source in self._indexes and self._versions.get(source) == versions[table]:
+                        continue
+                    # The version is read before the rows, so a write landing in between
+                    # only makes the next check rebuild again
+                    index = _load(db, source)
+                    with self._lock:
+                        self._indexes[source] = index
+                        self._versions[source] = versions[table]
+            finally:
+                db.close()
+
+    def suggest(self, query: str, sources: Iterable[SuggestSource], limit: int) -> List[dict]:
+        """Return up to ``limit`` matches per source for ``query``.
+
+        Args:
+            query: Text typed so far.
+            sources: Kinds of keys to search.
+            limit: Maximum number of matches per source.
+
+        Returns:
+            List[dict]: ``source``, display ``value`` and ``ref`` (owner ID or TDN) of
+            each match.
+        """
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        return [
+            {'source': source.value, 'value': value, 'ref': ref}
+            for source in sources
+            if source in self._indexes
+            for value, ref in self._indexes[source].search(prefix, limit)
+        ]
+
+    def note_write(
+        self,
+        source: SuggestSource,
+        version: int,
+        added: Iterable[Entry] = (),
+        removed: Iterable[Entry] = (),
+    ) -> None:
+        """Apply a committed write to an index.
+
+        Args:
+            source: The index the write affects.
+            version: Table version returned by the write's ``bump_table_version``.
+            added: Entries created by the write.
+            removed: Entries deleted by the write.
+        """
+        with self._lock:
+            index = self._indexes.get(source)
+            if index is None:
+                return
+            for value, ref in removed:
+                index.remove(normalize(value or ''), ref)
+            for value, ref in added:
+                index.add(normalize(value or ''), (value, ref))
+            # Only advance when no other writer's version was skipped, otherwise leave
+            # the gap for the next refresh to rebuild
+            if version == self._versions.get(source, 0) + 1:
+                self._versions[source] = version
+
+    def note_owners_added(self, owners: Iterable[Tuple[int, Optional[str], Optional[str]]], version: int) -> None:
+        """Apply owners created by the API.
+
+        Args:
+            owners: ``(owner ID, owner name, PIN)`` of each created owner.
+            version: owner_details version returned by the write's ``bump_table_version``.
+        """
+        owners = list(owners)
+        self.note_write(SuggestSource.owner, version, added=[(name, id) for id, name, _ in owners if name])
+        self.note_write(SuggestSource.pin, version, added=[(pin, id) for id, _, pin in owners if pin])
+
+    def invalidate(self, source: SuggestSource) -> None:
+        """Force a rebuild of ``source`` at the next request, after a bulk write."""
+        with self._lock:
+            self._versions.pop(source, None)
+            self._checked_at = float('-inf')
+
+    def size(self) -> Dict[str, int]:
+        return {source.value: len(index) for source, index in self._indexes.items()}
+
+
+typeahead = Typeahead()
@@ -0,0 +1,272 @@
+"""Server-side valuation of building assessment forms.
+
+Recomputes the figures a ``CompleteAssessmentRequest`` arrives with and lists those
+that differ from what the browser sent:
+
+- building items: ``baseMarketValue = area * unitValue * smv``, ``depreciatorCost =
+  baseMarketValue * depreciationPercentage / 100`` and ``marketValue = baseMarketValue
+  - depreciatorCost``;
+- property appraisal: ``baseMarketValue = totalArea * unitValue * smv`` and
+  ``marketValue = baseMarketValue - depreciation``, the depreciation being an amount;
+- additional items: ``amount = quantity * ratePerSqM`` for items priced per square
+  meter, otherwise ``quantity * unitValue * percentage`` with the unit value of the
+  appraisal, and ``subTotal`` and ``total`` as their sum;
+- assessment: the building value (the sum of the items when there are any, the
+  appraisal market value otherwise) plus the additional items, and the assessment
+  level of that value in :data:`ASSESSMENT_LEVELS` for the building category.
+
+The forms of a batch are flattened into one array per figure, so validating a sync
+of hundreds of forms is a handful of NumPy operations rather than a loop per form.
+
+``VALUATION_MODE`` decides what the add endpoints do with discrepancies: ``warn``
+(default) logs them and returns them with the result, ``enforce`` rejects the form and
+``off`` skips the valuation. Differences up to ``VALUATION_TOLERANCE`` pesos are
+accepted, for the rounding done by the browser.
+"""
+import logging
+import os
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from schemas.assessment_schemas import CompleteAssessmentRequest
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - valuation is skipped without NumPy
+    np = None
+
+logger = logging.getLogger(__name__)
+
+
+class ValuationMode(str, Enum):
+    off = 'off'
+    warn = 'warn'
+    enforce = 'enforce'
+
+
+VALUATION_MODE = ValuationMode(os.getenv('VALUATION_MODE', 'warn').lower())
+VALUATION_TOLERANCE = float(os.getenv('VALUATION_TOLERANCE', '0.05'))
+
+# (market value up to, level in percent) brackets by category
+LevelTable = Dict[str, List[Tuple[float, float]]]
+
+# Assessment levels of buildings in percent, by category, as (market value up to,
+# level) brackets; the level of the bracket applies to the whole market value. These
+# are the maximum rates of Sec. 218 of the Local Government Code, adjust them to the
+# provincial ordinance.
+ASSESSMENT_LEVELS: LevelTable = {
+    'residential': [
+        (175000, 0), (300000, 10), (500000, 20), (750000, 25), (1000000, 30),
+        (2000000, 35), (5000000, 40), (10000000, 50), (float('inf'), 60),
+    ],
+    'agricultural': [
+        (300000, 25), (500000, 30), (750000, 35), (1000000, 40), (2000000, 45), (float('inf'), 50),
+    ],
+    'commercial': [
+        (300000, 30), (500000, 35), (750000, 40), (1000000, 50), (2000000, 60),
+        (5000000, 70), (10000000, 75), (float('inf'), 80),
+    ],
+    'industrial': [
+        (300000, 30), (500000, 35), (750000, 40), (1000000, 50), (2000000, 60),
+        (5000000, 70), (10000000, 75), (float('inf'), 80),
+    ],
+    'timberland': [
+        (300000, 45), (500000, 50), (750000, 55), (1000000, 60), (2000000, 65), (float('inf'), 70),
+    ],
+}
+
+
+@dataclass
+class BatchValuation:
+    """Recomputed figures of a batch of forms, one entry per form."""
+
+    market_value: 'np.ndarray'
+    assessment_level: 'np.ndarray'
+    assessment_value: 'np.ndarray'
+    # Description of every figure that differs from the one sent, per form
+    discrepancies: List[List[str]]
+
+
+def valuation_enabled() -> bool:
+    return VALUATION_MODE != ValuationMode.off and np is not None
+
+
+def _level_tables(table: LevelTable) -> Tuple[Dict[str, int], 'np.ndarray', 'np.ndarray']:
+    """Stack a level table into padded bound and level matrices."""
+    categories = {name.strip().lower(): position for position, name in enumerate(table)}
+    width = max((len(brackets) for brackets in table.values()), default=1)
+    bounds = np.full((len(categories), width), np.inf)
+    levels = np.full((len(categories), width), np.nan)
+    for name, brackets in table.items():
+        row = categories[name.strip().lower()]
+        bounds[row, :len(brackets)] = [bound for bound, _ in brackets]
+        levels[row, :len(brackets)] = [level for _, level in brackets]
+    return categories, bounds, levels
+
+
+def assessment_levels(categories: Sequence[Optional[str]], market_values: 'np.ndarray',
+                      table: Optional[LevelTable] = None) -> 'np.ndarray':
+    """Return the assessment level of each market value, NaN for unknown categories.
+
+    Args:
+        categories: Category of each value, matched case-insensitively.
+        market_values: Market values.
+        table: Brackets by category, :data:`ASSESSMENT_LEVELS` by default.
+
+    Returns:
+        np.ndarray: Levels in percent.
+    """
+    codes, bounds, levels = _level_tables(ASSESSMENT_LEVELS if table is None else table)
+    rows = np.fromiter(
+        (codes.get((name or '').strip().lower(), -1) for name in categories), np.intp, len(categories)
+    )
+    known = rows >= 0
+    result = np.full(len(rows), np.nan)
+    # Index of the first bracket whose upper bound is not below the value
+    brackets = (bounds[rows[known]] < market_values[known, None]).sum(axis=1)
+    result[known] = levels[rows[known], brackets]
+    return result
+
+
+def _array(values, count: int) -> 'np.ndarray':
+    """Float array of ``values``, with ``None`` read as NaN."""
+    return np.fromiter((np.nan if value is None else value for value in values), np.float64, count)
+
+
+class _Checker:
+    """Collects the figures of a batch that differ from the ones sent."""
+
+    def __init__(self, forms: int, tolerance: float):
+        self.discrepancies: List[List[str]] = [[] for _ in range(forms)]
+        self.tolerance = tolerance
+
+    def compare(self, forms: 'np.ndarray', sent: 'np.ndarray', computed: 'np.ndarray',
+                label: Callable[[int], str]) -> None:
+        """Record each position where ``sent`` is given and differs from ``computed``.
+
+        Args:
+            forms: Index of the form each position belongs to.
+            sent: Figures sent by the browser, NaN where none was sent.
+            computed: Figures computed here.
+            label: Name of the figure at a position, for the message.
+        """
+        different = ~np.isnan(sent) & ~(np.abs(sent - computed) <= self.tolerance)
+        for position in np.flatnonzero(different).tolist():
+            self.discrepancies[forms[position]].append(
+                f'{label(position)}: sent {sent[position]:.2f}, computed {computed[position]:.2f}'
+            )
+
+
+def value_requests(requests: Sequence[CompleteAssessmentRequest],
+                   tolerance: float = VALUATION_TOLERANCE) -> BatchValuation:
+    """Recompute the valuation of every form of a batch.
+
+    Args:
+        requests: The forms.
+        tolerance: Largest accepted difference, in pesos and percentage points.
+
+    Returns:
+        BatchValuation: The recomputed totals and the discrepancies of each form.
+    """
+    count = len(requests)
+    forms = np.arange(count)
+    checker = _Checker(count, tolerance)
+
+    # Building items of every form, flattened
+    items = [(index, item) for index, request in enumerate(requests) for item in request.propertyAssessment.items]
+    item_forms = np.fromiter((index for index, _ in items), np.intp, len(items))
+    item_positions = [position for request in requests for position in range(len(request.propertyAssessment.items))]
+
+    def item_array(name: str) -> 'np.ndarray':
+        return _array((getattr(item, name) for _, item in items), len(items))
+
+    item_base = item_array('area') * item_array('unitValue') * item_array('smv')
+    item_depreciation = item_base * item_array('depreciationPercentage') / 100
+    item_market = item_base - item_depreciation
+    for name, computed in (
+        ('baseMarketValue', item_base), ('depreciatorCost', item_depreciation), ('marketValue', item_market),
+    ):
+        checker.compare(item_forms, item_array(name), computed,
+                        lambda position, name=name: f'propertyAssessment.items[{item_positions[position]}].{name}')
+
+    # Property appraisal
+    appraisals = [request.propertyAppraisal for request in requests]
+
+    def appraisal_array(name: str) -> 'np.ndarray':
+        return _array((getattr(appraisal, name) for appraisal in appraisals), count)
+
+    unit_value = np.nan_to_num(appraisal_array('unitValue'))
+    smv = appraisal_array('smv')
+    appraisal_base = np.nan_to_num(appraisal_array('totalArea')) * unit_value * np.where(np.isnan(smv), 1, smv)
+    depreciation = np.nan_to_num(appraisal_array('depreciation'))
+    appraisal_market = appraisal_base - depreciation
+    checker.compare(forms, appraisal_array('baseMarketValue'), appraisal_base,
+                    lambda position: 'propertyAppraisal.baseMarketValue')
+    checker.compare(forms, appraisal_array('marketValue'), appraisal_market,
+                    lambda position: 'propertyAppraisal.marketValue')
+    for position in np.flatnonzero((depreciation < 0) | (depreciation > appraisal_base + tolerance)).tolist():
+        checker.discrepancies[position].append(
+            'propertyAppraisal.depreciation: must be between 0 and the base market value'
+        )
+
+    # Additional items, priced per square meter or as a percentage of the unit value
+    extras = [(index, entry) for index, request in enumerate(requests) for entry in request.additionalItems.items]
+    extra_forms = np.fromiter((index for index, _ in extras), np.intp, len(extras))
+    extra_positions = [position for request in requests for position in range(len(request.additionalItems.items))]
+    quantity = _array((entry.quantity for _, entry in extras), len(extras))
+    rate = _array((entry.value.ratePerSqM for _, entry in extras), len(extras))
+    percentage = _array((entry.value.percentage for _, entry in extras), len(extras))
+    extra_amount = np.where(
+        ~np.isnan(rate), quantity * rate, quantity * unit_value[extra_forms] * np.nan_to_num(percentage)
+    )
+    checker.compare(extra_forms, _array((entry.amount for _, entry in extras), len(extras)), extra_amount,
+                    lambda position: f'additionalItems.items[{extra_positions[position]}].amount')
+    for position in np.flatnonzero(np.isnan(rate) & np.isnan(percentage)).tolist():
+        checker.discrepancies[extra_forms[position]].append(
+            f'additionalItems.items[{extra_positions[position]}].value: needs ratePerSqM or percentage'
+        )
+    extras_total = np.bincount(extra_forms, weights=extra_amount, minlength=count)
+    for name in ('subTotal', 'total'):
+        checker.compare(forms, _array((getattr(request.additionalItems, name) for request in requests), count),
+                        extras_total, lambda position, name=name: f'additionalItems.{name}')
+
+    # Assessment of the whole building
+    has_items = np.bincount(item_forms, minlength=count) > 0
+    items_market = np.bincount(item_forms, weights=item_market, minlength=count)
+    building_market = np.where(has_items, items_market, appraisal_market)
+    market_value = building_market + extras_total
+    categories = [request.propertyAssessment.buildingCategory for request in requests]
+    level = assessment_levels(categories, market_value)
+    assessment_value = market_value * level / 100
+    for position in np.flatnonzero(np.isnan(level)).tolist():
+        checker.discrepancies[position].append(
+            f'propertyAssessment.buildingCategory: unknown category {categories[position]!r}'
+        )
+    known = ~np.isnan(level)
+    checker.compare(forms, _array((request.propertyAssessment.marketValue for request in requests), count),
+                    market_value, lambda position: 'propertyAssessment.marketValue')
+    for name, sent, computed in (
+        ('propertyAssessment.assessmentLevel', (r.propertyAssessment.assessmentLevel for r in requests), level),
+        ('propertyAssessment.assessmentValue',
+         (r.propertyAssessment.assessmentValue for r in requests), assessment_value),
+        ('assessmentLevel', (r.assessmentLevel for r in requests), level),
+        ('assessmentValue', (r.assessmentValue for r in requests), assessment_value),
+    ):
+        # Forms with an unknown category are already reported
+        sent = np.where(known, _array(sent, count), np.nan)
+        checker.compare(forms, sent, computed, lambda position, name=name: name)
+
+    return BatchValuation(market_value, level, assessment_value, checker.discrepancies)
+
+
+def check_requests(requests: Sequence[CompleteAssessmentRequest]) -> List[List[str]]:
+    """Return the valuation discrepancies of each form, empty when valuation is off."""
+    if not valuation_enabled() or not requests:
+        return [[] for _ in requests]
+    discrepancies = value_requests(requests).discrepancies
+    for index, issues in enumerate(discrepancies):
+        if issues:
+            logger.warning('Valuation of form %d (td %s) differs: %s',
+                           index, requests[index].ownerDetails.td, '; '.join(issues))
+    return discrepancies